@@ -48,6 +48,34 @@ bool validBreathCycle = false;         // Indicador de ciclo válido
 unsigned long lastRpmUpdateTime = 0;
 int rpm = 0;
 
+// Protocolo de telemetría
+// 0: JSON de texto una vez por segundo (compatible con versiones anteriores)
+// 1: trama binaria de 38 bytes en cada lectura (ver respira_protocol.py)
+#define BINARY_PROTOCOL 0
+#define LOOP_DELAY_MS 50           // Periodo de lectura del sensor (ms)
+
+#define FRAME_SYNC_0 0xA5
+#define FRAME_SYNC_1 0x5A
+#define FRAME_VERSION 1
+
+struct __attribute__((packed)) BinaryFrame {
+  uint8_t sync[2];
+  uint8_t version;
+  uint16_t seq;
+  uint32_t millis;
+  float acceleration;
+  float delta;
+  float filtered;
+  float threshold;
+  float noise;
+  uint16_t rpm;
+  uint32_t breathCount;
+  uint8_t status;      // 0 ESPERANDO, 1 NORMAL, 2 ALTO, 3 BAJO
+  uint16_t crc;        // CRC-16/CCITT-FALSE de version..status
+};
+
+uint16_t frameSeq = 0;
+
 // Variables para mensajes y feedback
 bool alertActive = false;
 unsigned long lastAnimationTime = 0;
@@ -141,6 +169,7 @@ void loop() {
     checkAlerts();
     lastRpmUpdateTime = millis();
     
+#if !BINARY_PROTOCOL
     // Enviar datos en formato JSON para la GUI
     Serial.print("{");
     Serial.print("\"acceleration\":");
@@ -171,14 +200,62 @@ void loop() {
     }
     Serial.print("\"");
     Serial.println("}");
+#endif
   }
   
+#if BINARY_PROTOCOL
+  // Enviar cada lectura en formato binario compacto
+  sendBinaryFrame(zAccel, zDelta, filteredDelta);
+#endif
+  
   // Animación de respiración si está activa
   if (breathPromptActive) {
     updateBreathingAnimation();
   }
   
-  delay(50); // Pequeño retraso para estabilidad
+  delay(LOOP_DELAY_MS); // Pequeño retraso para estabilidad
+}
+
+// Código de estado para la trama binaria (mismo criterio que el JSON)
+uint8_t statusCode() {
+  if (rpm > ALERT_HIGH) return 2;
+  if (rpm < ALERT_LOW && rpm > 0) return 3;
+  if (rpm > 0) return 1;
+  return 0;
+}
+
+// CRC-16/CCITT-FALSE (polinomio 0x1021, valor inicial 0xFFFF)
+uint16_t crc16(const uint8_t* data, size_t length) {
+  uint16_t crc = 0xFFFF;
+  for (size_t i = 0; i < length; i++) {
+    crc ^= (uint16_t)data[i] << 8;
+    for (int bit = 0; bit < 8; bit++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+// Envía una trama binaria con sincronía, secuencia y CRC
+void sendBinaryFrame(float zAccel, float zDelta, float filteredDelta) {
+  BinaryFrame frame;
+  frame.sync[0] = FRAME_SYNC_0;
+  frame.sync[1] = FRAME_SYNC_1;
+  frame.version = FRAME_VERSION;
+  frame.seq = frameSeq++;
+  frame.millis = millis();
+  frame.acceleration = zAccel;
+  frame.delta = zDelta;
+  frame.filtered = filteredDelta;
+  frame.threshold = threshold;
+  frame.noise = noiseLevel;
+  frame.rpm = rpm;
+  frame.breathCount = breathCount;
+  frame.status = statusCode();
+
+  const uint8_t* raw = (const uint8_t*)&frame;
+  frame.crc = crc16(raw + 2, sizeof(frame) - 4);
+  Serial.write(raw, sizeof(frame));
 }
 
 // Aplica un filtro de media móvil ponderada para reducir el ruido
@@ -0,0 +1,400 @@
+"""Benchmarks reproducibles del camino de monitoreo.
+
+Usa el código real (``MonitorCore`` y los métodos de dibujo de
+``RespiraMonitorApp``) con un flujo sintético del firmware, sin pantalla
+(matplotlib con Agg):
+
+    parse    process_line() y decodificador por bloques (JSON y binario)
+    buffer   handle_frame(): históricos, tendencias y detección
+    render   update_respiration_graph() y update_rpm_graph() por cuadro
+    soak     memoria (RSS) y objetos de Python tras horas simuladas
+    startup  importación de la GUI y del núcleo en un proceso nuevo
+    devices  CPU de ``DeviceManager`` con N sensores simulados en pseudoterminales
+
+Escribe los resultados en JSON y puede compararlos con una línea base:
+
+    python benchmarks/bench.py --output base.json
+    python benchmarks/bench.py --baseline base.json --tolerance 0.25
+"""
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import types
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import matplotlib
+matplotlib.use("Agg")
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+import respira_gui
+from respira_core import MonitorCore
+from respira_decoder import TelemetryFrame
+from respira_devices import DeviceManager
+from respira_protocol import encode_binary_frame
+from respira_render import BlitRenderer
+from respira_sources import SyntheticSource
+
+BENCHMARKS = ("parse", "buffer", "render", "soak", "startup", "devices")
+
+# Segundos de lectura por cada cantidad de dispositivos
+DEVICE_SECONDS = 5.0
+
+# Sufijos de las métricas donde un valor mayor es mejor
+HIGHER_IS_BETTER = ("_per_s",)
+
+
+def synthetic_lines(seconds, rate_hz, binary=False, seed=1):
+    """Pares (t, bytes) del simulador, incluidos los mensajes de texto"""
+    source = SyntheticSource(rate_hz=rate_hz, duration=seconds, seed=seed, binary=binary)
+    return list(source.lines())
+
+
+def chunks(lines, size=4096):
+    """Agrupar las líneas en bloques de ~``size`` bytes, como llegan del puerto"""
+    block, total = [], 0
+    for t, data in lines:
+        block.append(data)
+        total += len(data)
+        if total >= size:
+            yield t, b"".join(block)
+            block, total = [], 0
+    if block:
+        yield t, b"".join(block)
+
+
+def best_of(repeat, func):
+    """Menor tiempo de ``repeat`` ejecuciones (s)"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def rss_mb():
+    """Memoria residente actual (MB); None si no se puede medir"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def bench_parse(args):
+    results = {}
+    for protocol in ("json", "binary"):
+        lines = synthetic_lines(args.seconds, args.rate, binary=protocol == "binary")
+        frames = sum(1 for _, data in lines if not data.startswith(b"Resp"))
+        nbytes = sum(len(data) for _, data in lines)
+        blocks = [data for _, data in chunks(lines)]
+
+        def feed():
+            core = MonitorCore(record=False)
+            for data in blocks:
+                core.decoder.feed(data, 0.0)
+
+        elapsed = best_of(args.repeat, feed)
+        results[f"{protocol}_feed_frames_per_s"] = frames / elapsed
+        results[f"{protocol}_feed_mb_per_s"] = nbytes / elapsed / 2**20
+
+        if protocol == "json":
+            # Camino línea a línea (process_line), sin el fin de línea
+            text = [data.rstrip() for _, data in lines]
+
+            def process():
+                core = MonitorCore(record=False)
+                for line in text:
+                    core.process_line(line)
+
+            elapsed = best_of(args.repeat, process)
+            results["process_line_per_s"] = len(text) / elapsed
+    return results
+
+
+def bench_buffer(args):
+    lines = synthetic_lines(args.seconds, args.rate)
+    core = MonitorCore(record=False)
+    frames = []
+    for t, data in lines:
+        frames.extend(core.decoder.feed(data, t))
+
+    def store():
+        core = MonitorCore(record=False)
+        for frame in frames:
+            core.handle_frame(frame)
+
+    elapsed = best_of(args.repeat, store)
+    history = core.history
+    row = frames[0].as_row()
+    append = best_of(args.repeat, lambda: [history.append(*row) for _ in range(len(frames))])
+    trend = core.rpm_trend
+    pyramid = best_of(args.repeat, lambda: [trend.append(i * 0.05, 15.0) for i in range(len(frames))])
+    return {
+        "handle_frame_us": elapsed / len(frames) * 1e6,
+        "history_append_us": append / len(frames) * 1e6,
+        "trend_append_us": pyramid / len(frames) * 1e6,
+    }
+
+
+def graph_harness(core, size=(9, 2.5)):
+    """Objeto con lo que usan los métodos de dibujo de la GUI, sobre Agg"""
+    app = types.SimpleNamespace(
+        is_connected=True, metrics=None, history=core.history, rpm_trend=core.rpm_trend,
+        signal_window=respira_gui.SIGNAL_WINDOW_S, rpm_span=60, rpm_view_end=None,
+        render_var=types.SimpleNamespace(set=lambda text: None),
+    )
+
+    resp_fig = Figure(figsize=size, dpi=100)
+    resp_canvas = FigureCanvasAgg(resp_fig)
+    app.resp_ax = resp_fig.add_subplot(111)
+    app.resp_ax.grid(True, linestyle='--', alpha=0.7)
+    resp_lines = [app.resp_ax.plot([], [])[0] for _ in range(2)]
+    app.resp_renderer = BlitRenderer(resp_canvas, app.resp_ax, resp_lines, y_floor=0)
+
+    rpm_fig = Figure(figsize=size, dpi=100)
+    rpm_canvas = FigureCanvasAgg(rpm_fig)
+    app.rpm_ax = rpm_fig.add_subplot(111)
+    app.rpm_ax.grid(True, linestyle='--', alpha=0.7)
+    app.rpm_ax.set_ylim(0, 40)
+    rpm_lines = [app.rpm_ax.plot([], [])[0] for _ in range(3)]
+    app.rpm_renderer = BlitRenderer(rpm_canvas, app.rpm_ax, rpm_lines, autoscale_y=False)
+
+    for name in ("update_respiration_graph", "update_rpm_graph", "set_signal_window", "set_rpm_span"):
+        setattr(app, name, types.MethodType(getattr(respira_gui.RespiraMonitorApp, name), app))
+    app.set_signal_window(app.signal_window)
+    resp_canvas.draw()
+    rpm_canvas.draw()
+    return app
+
+
+def timed_frames(func, frames):
+    times = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return statistics.mean(times) * 1000, times[int(len(times) * 0.95)] * 1000
+
+
+def bench_render(args):
+    # Una hora de datos para que la tendencia tenga historia (cada línea con su hora)
+    core = MonitorCore(record=False)
+    core.feed_timed(synthetic_lines(3600, args.rate))
+    app = graph_harness(core)
+
+    results = {}
+    results["resp_frame_ms"], results["resp_frame_p95_ms"] = timed_frames(
+        app.update_respiration_graph, args.frames)
+    # Ventana larga: una hora de señal diezmada por píxel
+    app.set_signal_window(3600)
+    results["resp_1h_frame_ms"], results["resp_1h_frame_p95_ms"] = timed_frames(
+        app.update_respiration_graph, args.frames)
+    for label, span in (("1min", 60), ("1h", 3600)):
+        app.set_rpm_span(span)
+        results[f"rpm_{label}_frame_ms"], results[f"rpm_{label}_frame_p95_ms"] = timed_frames(
+            app.update_rpm_graph, args.frames)
+    results["full_draws"] = app.resp_renderer.full_draws + app.rpm_renderer.full_draws
+    return results
+
+
+def bench_soak(args):
+    """Alimentar horas simuladas y seguir la memoria y los objetos vivos"""
+    core = MonitorCore(record=False)
+    app = graph_harness(core)
+    interval = 600   # Muestra cada 10 minutos simulados
+    samples = []
+    start = time.perf_counter()
+    source = SyntheticSource(rate_hz=args.rate, duration=args.soak_hours * 3600, seed=2)
+    next_sample = interval
+    for t, data in chunks(source.lines()):
+        core.feed(data, t)
+        if t >= next_sample:
+            next_sample += interval
+            app.update_respiration_graph()
+            app.update_rpm_graph()
+            gc.collect()
+            samples.append({"hours": round(t / 3600, 3), "rss_mb": rss_mb(), "objects": len(gc.get_objects())})
+
+    # Crecimiento desde que los buffers se llenan (descartar la primera hora)
+    steady = [s for s in samples if s["hours"] >= min(1.0, args.soak_hours / 2)] or samples
+    first, last = steady[0], steady[-1]
+    results = {
+        "simulated_hours": args.soak_hours,
+        "wall_s": time.perf_counter() - start,
+        "objects_growth": last["objects"] - first["objects"],
+        "samples": samples,
+    }
+    if first["rss_mb"] is not None:
+        results["rss_growth_mb"] = last["rss_mb"] - first["rss_mb"]
+        results["rss_final_mb"] = last["rss_mb"]
+    return results
+
+
+def bench_startup(args):
+    """Importar los módulos en un intérprete nuevo (sin cachés de este proceso)"""
+    results = {}
+    for label, module in (("gui", "respira_gui"), ("core", "respira_core")):
+        code = ("import time; start = time.perf_counter(); "
+                f"import {module}; print(time.perf_counter() - start)")
+        times = [float(subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True,
+                                      capture_output=True, text=True).stdout)
+                 for _ in range(args.repeat)]
+        results[f"{label}_import_ms"] = min(times) * 1000
+    return results
+
+
+def _pty_writer(masters, rate_hz, seconds):
+    """Firmware de cada sensor: una trama binaria por dispositivo a ``rate_hz``"""
+    frame = TelemetryFrame(9.81, 0.1, 0.1, 0.3, 0.03, 15, 0, "NORMAL")
+    interval = 1.0 / rate_hz
+    start = time.monotonic()
+    for seq in range(int(seconds * rate_hz)):
+        delay = start + seq * interval - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        data = encode_binary_frame(frame, seq, int(seq * interval * 1000))
+        for fd in masters:
+            os.write(fd, data)
+
+
+def bench_devices(args):
+    """Un solo hilo del gestor leyendo N pseudoterminales: la CPU debe crecer poco con N.
+
+    El firmware simulado escribe desde otro proceso, así que ``process_time``
+    mide solo el gestor (y el hilo principal, que espera).
+    """
+    if not hasattr(os, "openpty"):
+        print("  sin pseudoterminales en esta plataforma")
+        return {}
+    results = {}
+    fork = multiprocessing.get_context("fork")
+    for count in (int(n) for n in args.devices.split(",")):
+        ptys = [os.openpty() for _ in range(count)]
+        manager = DeviceManager()
+        manager.start()
+        try:
+            for _, slave in ptys:
+                manager.connect(os.ttyname(slave))
+            time.sleep(0.2)   # El gestor registra los puertos
+
+            writer = fork.Process(target=_pty_writer, args=([m for m, _ in ptys], args.rate, DEVICE_SECONDS))
+            cpu, wall = time.process_time(), time.perf_counter()
+            writer.start()
+            writer.join()
+            time.sleep(0.2)   # Lo que quede en los puertos
+            cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+
+            stats = manager.stats().values()
+            frames = sum(device["frames"] for device in stats)
+            results[f"devices_{count}_cpu_pct"] = cpu / wall * 100
+            results[f"devices_{count}_frames_per_s"] = frames / wall
+            results[f"devices_{count}_missing"] = count * int(DEVICE_SECONDS * args.rate) - frames
+            results[f"devices_{count}_errors"] = sum(device["errors"] for device in stats)
+        finally:
+            manager.stop()
+            for master, slave in ptys:
+                os.close(master)
+                os.close(slave)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Listar las métricas que empeoraron más que ``tolerance`` (fracción)"""
+    regressions = []
+    for name, metrics in results["results"].items():
+        base_metrics = baseline.get("results", {}).get(name, {})
+        for key, value in metrics.items():
+            base = base_metrics.get(key)
+            if not isinstance(value, (int, float)) or not isinstance(base, (int, float)):
+                continue
+            higher = key.endswith(HIGHER_IS_BETTER)
+            if key.endswith("growth") or key.endswith("growth_mb"):
+                # Crecimiento: comparar contra un margen absoluto
+                worse = value > max(base, 0) * (1 + tolerance) + (5 if "mb" in key else 1000)
+            elif key.endswith(("_missing", "_errors")):
+                # Tramas perdidas o errores: cualquier aumento es una regresión
+                worse = value > base
+            elif base == 0:
+                continue
+            elif higher:
+                worse = value < base * (1 - tolerance)
+            else:
+                worse = value > base * (1 + tolerance)
+            change = (value - base) / abs(base) * 100 if base else 0.0
+            print(f"  {'REGRESIÓN' if worse else 'ok':9s} {name}.{key}: {base:.4g} -> {value:.4g} ({change:+.1f}%)")
+            if worse:
+                regressions.append(f"{name}.{key}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks del monitor de respiración")
+    parser.add_argument("--only", default=",".join(BENCHMARKS),
+                        help=f"Benchmarks a ejecutar, separados por comas ({', '.join(BENCHMARKS)})")
+    parser.add_argument("--rate", type=float, default=20, help="Tramas por segundo del firmware simulado")
+    parser.add_argument("--seconds", type=float, default=600, help="Segundos de datos para parse/buffer")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones (se toma la mejor)")
+    parser.add_argument("--frames", type=int, default=200, help="Cuadros por prueba de dibujo")
+    parser.add_argument("--soak-hours", type=float, default=4, help="Horas simuladas de la prueba de memoria")
+    parser.add_argument("--devices", default="1,8,32,64",
+                        help="Cantidades de dispositivos de la prueba devices, separadas por comas")
+    parser.add_argument("--output", help="Archivo JSON de resultados")
+    parser.add_argument("--baseline", help="Resultados anteriores para comparar")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Empeoramiento permitido respecto de la línea base (fracción)")
+    args = parser.parse_args(argv)
+
+    selected = [name.strip() for name in args.only.split(",") if name.strip()]
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"Benchmarks desconocidos: {', '.join(sorted(unknown))}")
+
+    results = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "matplotlib": matplotlib.__version__,
+            "args": vars(args),
+        },
+        "results": {},
+    }
+    for name in selected:
+        print(f"{name}...", flush=True)
+        results["results"][name] = globals()[f"bench_{name}"](args)
+        for key, value in results["results"][name].items():
+            if isinstance(value, (int, float)):
+                print(f"  {key}: {value:.4g}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"Comparación con {args.baseline}:")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regresiones: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""Motor de alertas en el host, por paciente y con costo constante por trama.
+
+Reglas (configurables por paciente con ``AlertConfig``):
+
+    ALTO     RPM por encima de ``high`` durante ``sustain_s`` segundos
+    BAJO     RPM por debajo de ``low`` durante ``sustain_s`` segundos
+    APNEA    ``apnea_s`` segundos sin que aumente breathCount (desde la
+             primera trama, aunque no haya habido ninguna respiración)
+    CAMBIO   la RPM se aleja ``change_rpm`` o más del mínimo o el máximo de
+             los últimos ``change_window_s`` segundos
+
+"Durante N segundos" no necesita recorrer una ventana: basta con recordar la
+última vez que la condición no se cumplía. La regla de cambio guarda el mínimo
+y el máximo de la ventana en colas monótonas (cada muestra entra y sale una
+sola vez: O(1) amortizado). Una
+alerta activa se cierra solo después de ``clear_s`` segundos sin cumplirse,
+para no parpadear en el límite.
+"""
+import json
+from collections import deque
+from typing import NamedTuple
+
+from respira_decoder import ALERT_HIGH, ALERT_LOW
+
+ALERT_KINDS = ("ALTO", "BAJO", "APNEA", "CAMBIO")
+
+
+class AlertConfig(NamedTuple):
+    low: float = ALERT_LOW
+    high: float = ALERT_HIGH
+    sustain_s: float = 10.0
+    apnea_s: float = 20.0
+    change_rpm: float = 10.0
+    change_window_s: float = 60.0
+    clear_s: float = 5.0
+
+
+class AlertEvent(NamedTuple):
+    patient: str
+    kind: str
+    active: bool       # True al empezar, False al terminar
+    timestamp: float
+    value: float       # RPM, segundos sin respirar o cambio de RPM
+    message: str
+
+    def as_dict(self):
+        return self._asdict()
+
+
+def load_configs(path):
+    """Leer ``{"paciente": {"low": 10, ...}, "*": {...}}`` de un archivo JSON"""
+    with open(path) as f:
+        data = json.load(f)
+    return {patient: AlertConfig(**values) for patient, values in data.items()}
+
+
+class _PatientState:
+    """Estado incremental de las reglas de un paciente"""
+
+    __slots__ = ("config", "last_ok_high", "last_ok_low", "last_breath", "last_count",
+                 "window_min", "window_max", "active", "clear_since")
+
+    def __init__(self, config, t):
+        self.config = config
+        self.last_ok_high = t
+        self.last_ok_low = t
+        self.last_breath = t        # La apnea se vigila desde la primera trama
+        self.last_count = None
+        # (t, rpm) de los últimos change_window_s: RPM crecientes y decrecientes
+        self.window_min = deque()
+        self.window_max = deque()
+        self.active = dict.fromkeys(ALERT_KINDS, False)
+        self.clear_since = dict.fromkeys(ALERT_KINDS)
+
+
+class AlertEngine:
+    """Evalúa las reglas de todos los pacientes en un mismo proceso.
+
+    ``update(paciente, trama)`` devuelve los eventos generados (normalmente
+    ninguno) y los pasa también a ``on_event``. Los pacientes sin
+    configuración propia usan ``configs["*"]`` o ``default``.
+    """
+
+    def __init__(self, configs=None, default=None, on_event=None):
+        self.configs = dict(configs or {})
+        self.default = default or self.configs.get("*", AlertConfig())
+        self.on_event = on_event
+        self.patients = {}
+        self.events = 0
+
+    def configure(self, patient, config):
+        """Cambiar las reglas de un paciente (se aplican desde la próxima trama)"""
+        self.configs[patient] = config
+        if patient in self.patients:
+            self.patients[patient].config = config
+
+    def reset(self, patient=None):
+        if patient is None:
+            self.patients.clear()
+        else:
+            self.patients.pop(patient, None)
+
+    def active(self, patient):
+        """Alertas activas de un paciente"""
+        state = self.patients.get(patient)
+        if state is None:
+            return ()
+        return tuple(kind for kind in ALERT_KINDS if state.active[kind])
+
+    def update(self, patient, frame):
+        t = frame.timestamp
+        state = self.patients.get(patient)
+        if state is None:
+            state = self.patients[patient] = _PatientState(self.configs.get(patient, self.default), t)
+        config = state.config
+        rpm = frame.rpm
+        events = []
+
+        # RPM sostenida fuera de rango (rpm 0 = aún sin valor válido)
+        if rpm <= config.high:
+            state.last_ok_high = t
+        if rpm <= 0 or rpm >= config.low:
+            state.last_ok_low = t
+        self._set(state, patient, "ALTO", t - state.last_ok_high >= config.sustain_s, t, rpm, events)
+        self._set(state, patient, "BAJO", t - state.last_ok_low >= config.sustain_s, t, rpm, events)
+
+        # Apnea: tiempo desde la última respiración
+        count = frame.breathCount
+        if state.last_count is not None and count != state.last_count:
+            state.last_breath = t
+        state.last_count = count
+        pause = t - state.last_breath
+        self._set(state, patient, "APNEA", pause >= config.apnea_s, t, pause, events)
+
+        # Cambio brusco: RPM actual frente al mínimo y al máximo de la ventana
+        if rpm > 0:
+            window_min = state.window_min
+            window_max = state.window_max
+            while window_min and window_min[-1][1] >= rpm:
+                window_min.pop()
+            window_min.append((t, rpm))
+            while window_max and window_max[-1][1] <= rpm:
+                window_max.pop()
+            window_max.append((t, rpm))
+            limit = t - config.change_window_s
+            while window_min[0][0] < limit:
+                window_min.popleft()
+            while window_max[0][0] < limit:
+                window_max.popleft()
+            rise = rpm - window_min[0][1]
+            fall = rpm - window_max[0][1]
+            change = rise if rise >= -fall else fall
+            self._set(state, patient, "CAMBIO", abs(change) >= config.change_rpm, t, change, events)
+
+        if events:
+            self.events += len(events)
+            if self.on_event is not None:
+                for event in events:
+                    self.on_event(event)
+        return events
+
+    @staticmethod
+    def _set(state, patient, kind, condition, t, value, events):
+        """Activar o cerrar (con retardo) una alerta"""
+        active = state.active[kind]
+        if condition:
+            state.clear_since[kind] = None
+            if not active:
+                state.active[kind] = True
+                events.append(AlertEvent(patient, kind, True, t, value, _message(kind, value, state.config)))
+        elif active:
+            since = state.clear_since[kind]
+            if since is None:
+                state.clear_since[kind] = t
+            elif t - since >= state.config.clear_s:
+                state.active[kind] = False
+                state.clear_since[kind] = None
+                events.append(AlertEvent(patient, kind, False, t, value, f"Fin de alerta {kind}"))
+
+
+def _message(kind, value, config):
+    if kind == "ALTO":
+        return f"RPM alta ({value:g}) durante más de {config.sustain_s:g} s"
+    if kind == "BAJO":
+        return f"RPM baja ({value:g}) durante más de {config.sustain_s:g} s"
+    if kind == "APNEA":
+        return f"Sin respiraciones durante {value:.0f} s"
+    return f"La RPM cambió {value:+g} en menos de {config.change_window_s:g} s"
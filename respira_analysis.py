@@ -0,0 +1,359 @@
+"""Detección de respiraciones en el host.
+
+Reimplementa ``filterSignal``, ``detectBreathRobust`` y ``calculateRPM`` de
+``Respira_code.ino`` para recalcular RPM, conteo y estado a partir de la
+serie ``delta``, tanto trama a trama (``BreathDetector``) como en lote sobre
+una sesión completa con NumPy (``analyze``). Al cambiar los parámetros de
+``DetectorConfig`` se puede volver a evaluar una sesión archivada sin
+reprogramar el dispositivo.
+
+Nota: el firmware detecta sobre todas sus lecturas (cada ~50 ms) pero solo
+envía una trama por segundo; el resultado en el host coincide con el del
+firmware en la medida en que la serie grabada tenga esa misma resolución.
+"""
+import argparse
+from collections import deque
+from typing import NamedTuple
+
+import numpy as np
+
+from respira_decoder import ALERT_HIGH, ALERT_LOW, STATUS_CODES, firmware_status
+
+
+class DetectorConfig(NamedTuple):
+    """Parámetros del detector (mismos valores por defecto que el firmware)"""
+    buffer_size: int = 10             # SIGNAL_BUFFER_SIZE
+    threshold: float = None           # None: usar el umbral calibrado de cada trama
+    noise: float = None               # None: usar el nivel de ruido de cada trama
+    min_cycle_ms: int = 1500          # MIN_CYCLE_DURATION
+    max_cycle_ms: int = 15000
+    stable_readings: int = 5          # STABLE_READINGS_THRESHOLD
+    refractory_ms: int = 1000         # Tiempo mínimo desde la última respiración
+    movement_timeout_ms: int = 2000   # Sin nuevo máximo -> fin de ciclo
+    valid_factor: float = 1.2         # Máximo > umbral * 1.2 -> ciclo válido
+    stable_factor: float = 0.3        # |señal| < umbral * 0.3 -> lectura estable
+    rpm_window: int = 5               # Duraciones promediadas para RPM
+    rpm_max: int = 60
+    rpm_reset_ms: int = 30000         # Sin respiraciones -> RPM = 0
+    alert_low: int = ALERT_LOW
+    alert_high: int = ALERT_HIGH
+
+
+class BreathDetector:
+    """Máquina de estados del firmware, trama a trama"""
+
+    def __init__(self, config=DetectorConfig()):
+        self.config = config
+        self.reset()
+
+    def reset(self):
+        size = self.config.buffer_size
+        self._buffer = [0.0] * size
+        self._index = 0
+        self._weights = [size - i for i in range(size)]
+        self._weight_sum = float(sum(self._weights))
+        self.filtered = 0.0
+
+        self.in_cycle = False
+        self.cycle_start = 0
+        self.last_breath = 0
+        self.last_movement = 0
+        self.stable = 0
+        self.max_delta = 0.0
+        self.valid = False
+
+        self.breath_times = deque(maxlen=self.config.rpm_window)
+        self.breath_count = 0
+        self.rpm = 0
+
+    def filter(self, raw, noise):
+        """Media móvil ponderada con histéresis (filterSignal)"""
+        size = self.config.buffer_size
+        self._buffer[self._index] = raw
+        self._index = (self._index + 1) % size
+        total = 0.0
+        for i, weight in enumerate(self._weights):
+            total += self._buffer[(self._index - 1 - i) % size] * weight
+        value = total / self._weight_sum
+        if abs(value - self.filtered) < noise:
+            value = self.filtered
+        self.filtered = value
+        return value
+
+    def update(self, delta, t_ms, threshold=None, noise=None):
+        """Procesar una lectura; devuelve la duración (ms) si terminó una respiración"""
+        cfg = self.config
+        threshold = cfg.threshold if cfg.threshold is not None else threshold
+        noise = cfg.noise if cfg.noise is not None else noise
+        magnitude = abs(self.filter(delta, noise or 0.0))
+        breath = None
+
+        if not self.in_cycle and magnitude > threshold:
+            if t_ms - self.last_breath > cfg.refractory_ms:
+                self.in_cycle = True
+                self.cycle_start = t_ms
+                self.max_delta = magnitude
+                self.stable = 0
+                self.valid = False
+        elif self.in_cycle:
+            if magnitude > self.max_delta:
+                self.max_delta = magnitude
+                self.last_movement = t_ms
+                if magnitude > threshold * cfg.valid_factor:
+                    self.valid = True
+
+            self.stable = self.stable + 1 if magnitude < threshold * cfg.stable_factor else 0
+
+            timeout = t_ms - self.last_movement > cfg.movement_timeout_ms
+            stable_enough = self.stable >= cfg.stable_readings
+            if (stable_enough or timeout) and t_ms - self.cycle_start > cfg.min_cycle_ms:
+                self.in_cycle = False
+                duration = t_ms - self.cycle_start
+                if self.valid and cfg.min_cycle_ms <= duration < cfg.max_cycle_ms:
+                    self.breath_times.append(duration)
+                    self.breath_count += 1
+                    self.last_breath = t_ms
+                    breath = duration
+
+        self.rpm = self.compute_rpm(t_ms)
+        return breath
+
+    def compute_rpm(self, t_ms):
+        """RPM a partir de las últimas duraciones (calculateRPM)"""
+        cfg = self.config
+        if self.breath_count and t_ms - self.last_breath > cfg.rpm_reset_ms:
+            return 0
+        if not self.breath_times:
+            return self.rpm
+        average = int(sum(self.breath_times)) // len(self.breath_times)
+        return min(cfg.rpm_max, 60000 // average) if average else cfg.rpm_max
+
+    @property
+    def status(self):
+        return firmware_status(self.rpm, self.config.alert_low, self.config.alert_high)
+
+
+class AnalysisResult(NamedTuple):
+    """Resultado del análisis en lote (un valor por muestra salvo breath_*)"""
+    filtered: np.ndarray
+    breath_index: np.ndarray      # Muestra en la que se confirmó cada respiración
+    breath_duration: np.ndarray   # Duración de cada ciclo (ms)
+    breath_count: np.ndarray
+    rpm: np.ndarray
+    status: np.ndarray            # Códigos de STATUS_CODES
+
+
+def filter_signal(delta, buffer_size=10, noise=0.05):
+    """Versión vectorizada de filterSignal (la histéresis es secuencial)"""
+    delta = np.asarray(delta, dtype=np.float64)
+    weights = np.arange(buffer_size, 0, -1, dtype=np.float64)
+    smoothed = np.convolve(delta, weights)[:len(delta)] / weights.sum()
+    if not noise:
+        return smoothed
+
+    # Histéresis: solo recorre la lista una vez, con floats nativos
+    out = smoothed.tolist()
+    last = 0.0
+    for i, value in enumerate(out):
+        if abs(value - last) < noise:
+            out[i] = last
+        else:
+            last = value
+    return np.asarray(out)
+
+
+def _stable_runs(stable):
+    """Longitud de la racha de lecturas estables que termina en cada muestra"""
+    index = np.arange(len(stable))
+    last_unstable = np.maximum.accumulate(np.where(stable, -1, index))
+    return index - last_unstable
+
+
+def analyze(delta, t_ms, config=DetectorConfig(), threshold=0.2, noise=0.05):
+    """Detectar respiraciones en una serie completa.
+
+    ``t_ms`` son los tiempos de cada muestra en milisegundos; ``threshold`` y
+    ``noise`` se usan si ``config`` no los fija (normalmente los valores
+    calibrados que reporta el firmware). En lugar de avanzar muestra a
+    muestra, salta de un inicio de ciclo al siguiente y resuelve cada ciclo
+    con operaciones de NumPy sobre una ventana.
+    """
+    cfg = config
+    threshold = cfg.threshold if cfg.threshold is not None else threshold
+    noise = cfg.noise if cfg.noise is not None else noise
+    t = np.asarray(t_ms, dtype=np.int64)
+    n = len(t)
+
+    filtered = filter_signal(delta, cfg.buffer_size, noise)
+    magnitude = np.abs(filtered)
+    above = np.flatnonzero(magnitude > threshold)
+    runs = _stable_runs(magnitude < threshold * cfg.stable_factor)
+    valid_level = threshold * cfg.valid_factor
+    span = np.searchsorted(t, t[0] + cfg.max_cycle_ms * 2) if n else 0
+    window = max(64, int(span))
+
+    breath_index = []
+    breath_duration = []
+    last_breath = 0
+    last_movement = 0
+    position = 0
+
+    while True:
+        # Próximo inicio de ciclo: señal sobre el umbral fuera del periodo refractario
+        earliest = max(position, int(np.searchsorted(t, last_breath + cfg.refractory_ms, side="right")))
+        k = np.searchsorted(above, earliest)
+        if k >= len(above):
+            break
+        s = int(above[k])
+
+        # Resolver el ciclo en ventanas crecientes hasta encontrar su fin
+        size = window
+        while True:
+            stop = min(n, s + 1 + size)
+            mag = magnitude[s + 1:stop]
+            times = t[s + 1:stop]
+            running_max = np.maximum.accumulate(np.concatenate(([magnitude[s]], mag)))
+            new_max = mag > running_max[:-1]
+            movement = np.maximum.accumulate(np.where(new_max, times, last_movement))
+            done = (((runs[s + 1:stop] >= cfg.stable_readings) |
+                     (times - movement > cfg.movement_timeout_ms)) &
+                    (times - t[s] > cfg.min_cycle_ms))
+            end = int(np.argmax(done)) if len(done) else 0
+            if (len(done) and done[end]) or stop == n:
+                break
+            size *= 2
+
+        if not (len(done) and done[end]):
+            break  # La serie termina a mitad de un ciclo
+
+        e = s + 1 + end
+        last_movement = int(movement[end])
+        valid = bool(np.any(new_max[:end + 1] & (mag[:end + 1] > valid_level)))
+        duration = int(t[e] - t[s])
+        if valid and cfg.min_cycle_ms <= duration < cfg.max_cycle_ms:
+            breath_index.append(e)
+            breath_duration.append(duration)
+            last_breath = int(t[e])
+        position = e + 1
+
+    breath_index = np.asarray(breath_index, dtype=np.int64)
+    breath_duration = np.asarray(breath_duration, dtype=np.int64)
+    breath_count, rpm = _rpm_series(t, breath_index, breath_duration, cfg)
+    status = np.select(
+        [rpm > cfg.alert_high, (rpm > 0) & (rpm < cfg.alert_low), rpm > 0],
+        [STATUS_CODES["ALTO"], STATUS_CODES["BAJO"], STATUS_CODES["NORMAL"]],
+        STATUS_CODES["ESPERANDO"],
+    ).astype(np.uint8)
+    return AnalysisResult(filtered, breath_index, breath_duration, breath_count, rpm, status)
+
+
+def _rpm_series(t, breath_index, breath_duration, cfg):
+    """Conteo y RPM por muestra a partir de las respiraciones detectadas"""
+    n = len(t)
+    count = np.zeros(n, dtype=np.int64)
+    rpm = np.zeros(n, dtype=np.int64)
+    if not len(breath_index):
+        return count, rpm
+
+    # Media de las últimas rpm_window duraciones tras cada respiración
+    cumulative = np.concatenate(([0], np.cumsum(breath_duration)))
+    k = np.arange(1, len(breath_duration) + 1)
+    first = np.maximum(0, k - cfg.rpm_window)
+    average = (cumulative[k] - cumulative[first]) // (k - first)
+    rpm_after = np.minimum(cfg.rpm_max, 60000 // np.maximum(average, 1))
+
+    # Para cada muestra, la última respiración confirmada
+    last = np.searchsorted(breath_index, np.arange(n), side="right") - 1
+    has_breath = last >= 0
+    count[has_breath] = last[has_breath] + 1
+    rpm[has_breath] = rpm_after[last[has_breath]]
+    stale = has_breath & (t - t[breath_index[np.maximum(last, 0)]] > cfg.rpm_reset_ms)
+    rpm[stale] = 0
+    return count, rpm
+
+
+class CrossCheck:
+    """Compara el conteo de respiraciones del host con el del firmware.
+
+    Ambos conteos se toman relativos a la primera respiración que detecta el
+    host: antes de eso el detector aún se está ajustando y conectar a mitad
+    de una sesión no debe contar como divergencia. El aviso queda activo
+    hasta que la divergencia vuelve a ``tolerance - 1`` o menos, para que
+    una diferencia que oscila en el límite no avise en cada respiración.
+    """
+
+    def __init__(self, tolerance=2):
+        self.tolerance = tolerance
+        self._firmware_start = None
+        self.divergence = 0
+        self.diverged = False
+
+    def update(self, host_count, firmware_count):
+        """Devolver True solo cuando la divergencia aparece (no en cada trama)"""
+        if self._firmware_start is None:
+            if not host_count:
+                return False
+            self._firmware_start = firmware_count - host_count
+        self.divergence = host_count - (firmware_count - self._firmware_start)
+        if self.diverged:
+            self.diverged = abs(self.divergence) >= self.tolerance
+            return False
+        self.diverged = abs(self.divergence) > self.tolerance
+        return self.diverged
+
+
+def cross_check(host_count, firmware_count, tolerance=2):
+    """Índices de las muestras donde host y firmware difieren más de ``tolerance``
+
+    Como en ``CrossCheck``, los conteos se comparan desde la primera
+    respiración que detecta el host.
+    """
+    host_count = np.asarray(host_count, dtype=np.int64)
+    firmware_count = np.asarray(firmware_count, dtype=np.int64)
+    started = np.flatnonzero(host_count[:len(firmware_count)] > host_count[0]) if len(firmware_count) else ()
+    if not len(started):
+        return np.empty(0, dtype=np.int64)
+    first = started[0]
+    host_relative = host_count[first:] - host_count[first]
+    firmware_relative = firmware_count[first:] - firmware_count[first]
+    return np.flatnonzero(np.abs(host_relative - firmware_relative) > tolerance) + first
+
+
+def analyze_session(path, config=DetectorConfig()):
+    """Volver a evaluar una sesión grabada (.resp)"""
+    from respira_recorder import SessionReader
+
+    reader = SessionReader(path)
+    t_ms = np.round(reader.column("timestamp") * 1000).astype(np.int64)
+    threshold = reader.column("threshold")
+    noise = reader.column("noise")
+    result = analyze(
+        reader.column("delta"), t_ms, config,
+        threshold=float(np.median(threshold)) if len(threshold) else 0.2,
+        noise=float(np.median(noise)) if len(noise) else 0.05,
+    )
+    return reader, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reevaluar sesiones grabadas con otros parámetros")
+    parser.add_argument("sessions", nargs="+", help="Archivos .resp")
+    parser.add_argument("--threshold", type=float, help="Umbral (por defecto, el calibrado)")
+    parser.add_argument("--noise", type=float, help="Nivel de ruido (por defecto, el calibrado)")
+    parser.add_argument("--min-cycle", type=int, default=1500, help="MIN_CYCLE_DURATION en ms")
+    parser.add_argument("--tolerance", type=int, default=2, help="Divergencia admitida con el firmware")
+    args = parser.parse_args(argv)
+
+    config = DetectorConfig(threshold=args.threshold, noise=args.noise, min_cycle_ms=args.min_cycle)
+    for path in args.sessions:
+        reader, result = analyze_session(path, config)
+        firmware_count = reader.column("breathCount")
+        mismatches = cross_check(result.breath_count, firmware_count, args.tolerance)
+        host_breaths = len(result.breath_index)
+        firmware_breaths = int(firmware_count[-1] - firmware_count[0]) if len(firmware_count) else 0
+        print(f"{path}: {len(result.rpm)} muestras, {host_breaths} respiraciones en el host, "
+              f"{firmware_breaths} en el firmware, {len(mismatches)} muestras divergentes")
+
+
+if __name__ == "__main__":
+    main()
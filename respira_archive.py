@@ -0,0 +1,322 @@
+"""Índice SQLite de las sesiones grabadas y de sus episodios de alerta.
+
+Por cada archivo ``.resp`` guarda el rango de tiempo, el dispositivo, la
+posición y el rango de tiempo de cada bloque, y los episodios detectados:
+
+    ALTO / BAJO   tramos continuos con ese estado del firmware
+    APNEA         más de ``APNEA_SECONDS`` sin que aumente breathCount
+
+Las consultas ("episodios BAJO de más de 30 s de la última semana") usan
+solo el índice, y ``read_range()`` abre las sesiones del intervalo leyendo
+únicamente los bloques que lo cubren.
+
+    python respira_archive.py scan
+    python respira_archive.py episodes --kind BAJO --min-duration 30 --since 7d
+    python respira_archive.py show "2025-01-01 12:00:00" --before 60 --after 60
+"""
+import argparse
+import os
+import sqlite3
+import time
+from datetime import datetime
+from typing import NamedTuple
+
+import numpy as np
+
+from respira_decoder import STATUS_CODES, STATUSES
+from respira_recorder import FILE_EXTENSION, SESSION_DIR, SessionReader
+
+ARCHIVE_NAME = "archivo.sqlite"
+
+# Segundos sin respiraciones para registrar una apnea
+APNEA_SECONDS = 20.0
+
+EPISODE_KINDS = ("ALTO", "BAJO", "APNEA")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    device TEXT,
+    start REAL,
+    end REAL,
+    rows INTEGER,
+    size INTEGER,
+    mtime REAL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    session_id INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    start REAL,
+    end REAL,
+    PRIMARY KEY (session_id, idx)
+);
+CREATE TABLE IF NOT EXISTS episodes (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    duration REAL NOT NULL,
+    min_rpm INTEGER,
+    max_rpm INTEGER,
+    chunk INTEGER
+);
+CREATE INDEX IF NOT EXISTS sessions_time ON sessions(start, end);
+CREATE INDEX IF NOT EXISTS chunks_time ON chunks(session_id, start);
+CREATE INDEX IF NOT EXISTS episodes_kind_time ON episodes(kind, start);
+CREATE INDEX IF NOT EXISTS episodes_kind_duration ON episodes(kind, duration);
+"""
+
+
+class Episode(NamedTuple):
+    kind: str
+    start: float
+    end: float
+    duration: float
+    min_rpm: int
+    max_rpm: int
+    chunk: int
+    path: str = ""
+    device: str = ""
+
+
+def _runs(mask):
+    """Pares (inicio, fin) de los tramos True de ``mask`` (fin inclusivo)"""
+    edges = np.diff(mask.astype(np.int8), prepend=0, append=0)
+    return zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1) - 1)
+
+
+def find_episodes(timestamp, status, rpm, breath_count, apnea_seconds=APNEA_SECONDS):
+    """Episodios de una sesión a partir de sus columnas (sin índice de bloque)"""
+    episodes = []
+    for kind in ("ALTO", "BAJO"):
+        for first, last in _runs(status == STATUS_CODES[kind]):
+            values = rpm[first:last + 1]
+            episodes.append(Episode(kind, float(timestamp[first]), float(timestamp[last]),
+                                    float(timestamp[last] - timestamp[first]),
+                                    int(values.min()), int(values.max()), -1))
+
+    # Apnea: intervalo entre respiraciones (o desde la última hasta el final)
+    breaths = np.flatnonzero(np.diff(breath_count) != 0) + 1
+    if len(breaths):
+        times = np.append(timestamp[breaths], timestamp[-1])
+        gaps = np.diff(times)
+        for i in np.flatnonzero(gaps > apnea_seconds):
+            first, last = breaths[i], (breaths[i + 1] if i + 1 < len(breaths) else len(timestamp) - 1)
+            values = rpm[first:last + 1]
+            episodes.append(Episode("APNEA", float(times[i]), float(times[i + 1]), float(gaps[i]),
+                                    int(values.min()), int(values.max()), -1))
+    episodes.sort(key=lambda episode: episode.start)
+    return episodes
+
+
+class SessionArchive:
+    """Índice de sesiones, bloques y episodios en un archivo SQLite"""
+
+    def __init__(self, path=None, directory=SESSION_DIR):
+        self.directory = directory
+        self.path = path or os.path.join(directory, ARCHIVE_NAME)
+        parent = os.path.dirname(self.path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.executescript(_SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def index_session(self, path, force=False):
+        """Indexar (o reindexar si cambió) un archivo .resp; devuelve su id"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        row = self.db.execute("SELECT id, size, mtime FROM sessions WHERE path = ?", (path,)).fetchone()
+        if row is not None and not force and row[1] == stat.st_size and row[2] == stat.st_mtime:
+            return row[0]
+
+        reader = SessionReader(path)
+        chunks = []
+        for index, (offset, rows) in enumerate(reader.chunks):
+            times = reader.chunk(index)["timestamp"]
+            chunks.append((index, offset, rows, float(times[0]), float(times[-1])))
+
+        timestamp = reader.column("timestamp")
+        episodes = []
+        if len(timestamp):
+            starts = np.array([chunk[3] for chunk in chunks])
+            for episode in find_episodes(timestamp, reader.column("status"), reader.column("rpm"),
+                                         reader.column("breathCount")):
+                chunk = int(np.searchsorted(starts, episode.start, side="right")) - 1
+                episodes.append(episode._replace(chunk=max(chunk, 0)))
+
+        with self.db:
+            if row is not None:
+                self.db.execute("DELETE FROM sessions WHERE id = ?", (row[0],))
+            cursor = self.db.execute(
+                "INSERT INTO sessions (path, device, start, end, rows, size, mtime) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, reader.meta.get("port"),
+                 float(timestamp[0]) if len(timestamp) else reader.meta.get("start"),
+                 float(timestamp[-1]) if len(timestamp) else reader.meta.get("start"),
+                 len(timestamp), stat.st_size, stat.st_mtime))
+            session_id = cursor.lastrowid
+            self.db.executemany(
+                "INSERT INTO chunks (session_id, idx, offset, rows, start, end) VALUES (?, ?, ?, ?, ?, ?)",
+                [(session_id, *chunk) for chunk in chunks])
+            self.db.executemany(
+                "INSERT INTO episodes (session_id, kind, start, end, duration, min_rpm, max_rpm, chunk)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(session_id, *episode[:7]) for episode in episodes])
+        return session_id
+
+    def scan(self, directory=None):
+        """Indexar los .resp nuevos o modificados y olvidar los borrados"""
+        directory = directory or self.directory
+        indexed = 0
+        seen = set()
+        for name in sorted(os.listdir(directory)) if os.path.isdir(directory) else ():
+            if not name.endswith(FILE_EXTENSION):
+                continue
+            path = os.path.abspath(os.path.join(directory, name))
+            seen.add(path)
+            try:
+                before = self.db.total_changes
+                self.index_session(path)
+                indexed += self.db.total_changes != before
+            except (OSError, ValueError) as e:
+                print(f"No se pudo indexar {name}: {e}")
+
+        prefix = os.path.join(os.path.abspath(directory), "")
+        with self.db:
+            for session_id, path in self.db.execute("SELECT id, path FROM sessions").fetchall():
+                if path.startswith(prefix) and path not in seen:
+                    self.db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        return indexed
+
+    def sessions(self, since=None, until=None, device=None):
+        """Filas (id, path, device, start, end, rows) de las sesiones en el rango"""
+        query, params = _time_filter("SELECT id, path, device, start, end, rows FROM sessions",
+                                     "end", "start", since, until)
+        if device is not None:
+            query += " AND device = ?"
+            params.append(device)
+        return self.db.execute(query + " ORDER BY start", params).fetchall()
+
+    def episodes(self, kind=None, min_duration=0.0, since=None, until=None, device=None):
+        """Episodios que cumplen los filtros, del más antiguo al más reciente"""
+        query, params = _time_filter(
+            "SELECT e.kind, e.start, e.end, e.duration, e.min_rpm, e.max_rpm, e.chunk, s.path, s.device"
+            " FROM episodes e JOIN sessions s ON s.id = e.session_id",
+            "e.end", "e.start", since, until)
+        if kind is not None:
+            query += " AND e.kind = ?"
+            params.append(kind)
+        if min_duration:
+            query += " AND e.duration >= ?"
+            params.append(min_duration)
+        if device is not None:
+            query += " AND s.device = ?"
+            params.append(device)
+        return [Episode(*row) for row in self.db.execute(query + " ORDER BY e.start", params)]
+
+    def session_at(self, timestamp):
+        """(id, path) de la sesión que contiene ``timestamp`` o None"""
+        return self.db.execute(
+            "SELECT id, path FROM sessions WHERE start <= ? AND end >= ? ORDER BY start DESC LIMIT 1",
+            (timestamp, timestamp)).fetchone()
+
+    def read_range(self, start, end):
+        """Columnas entre ``start`` y ``end`` leyendo solo sus bloques.
+
+        Si el intervalo abarca varias sesiones se concatenan en orden.
+        """
+        parts = []
+        names = None
+        sessions = self.db.execute(
+            "SELECT id, path FROM sessions WHERE end >= ? AND start <= ? ORDER BY start",
+            (start, end)).fetchall()
+        for session_id, path in sessions:
+            chunks = self.db.execute(
+                "SELECT offset, rows FROM chunks WHERE session_id = ? AND end >= ? AND start <= ? ORDER BY idx",
+                (session_id, start, end)).fetchall()
+            if not chunks:
+                continue
+            reader = SessionReader(path, chunks=chunks)
+            names = reader.names
+            parts.extend(reader.iter_chunks())
+        if not parts:
+            return None
+        times = np.concatenate([part["timestamp"] for part in parts])
+        keep = (times >= start) & (times <= end)
+        return {name: np.concatenate([part[name] for part in parts])[keep] for name in names}
+
+
+def _time_filter(query, end_column, start_column, since, until):
+    """Agregar la condición de solapamiento con [since, until]"""
+    query += " WHERE 1"
+    params = []
+    if since is not None:
+        query += f" AND {end_column} >= ?"
+        params.append(since)
+    if until is not None:
+        query += f" AND {start_column} <= ?"
+        params.append(until)
+    return query, params
+
+
+def parse_time(text):
+    """'7d', '12h', '30m' (hace ese tiempo) o fecha 'AAAA-MM-DD[ HH:MM[:SS]]'"""
+    units = {"d": 86400, "h": 3600, "m": 60, "s": 1}
+    if text[-1:] in units and text[:-1].replace(".", "", 1).isdigit():
+        return time.time() - float(text[:-1]) * units[text[-1]]
+    return datetime.fromisoformat(text).timestamp()
+
+
+def _format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Índice de sesiones grabadas y episodios de alerta")
+    parser.add_argument("--archive", help=f"Archivo del índice (por defecto {SESSION_DIR}/{ARCHIVE_NAME})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scan = commands.add_parser("scan", help="Indexar las sesiones nuevas o modificadas")
+    scan.add_argument("directory", nargs="?", default=SESSION_DIR)
+
+    episodes = commands.add_parser("episodes", help="Buscar episodios")
+    episodes.add_argument("--kind", choices=EPISODE_KINDS)
+    episodes.add_argument("--min-duration", type=float, default=0, help="Duración mínima (s)")
+    episodes.add_argument("--since", type=parse_time, help="Desde: 7d, 12h o AAAA-MM-DD")
+    episodes.add_argument("--until", type=parse_time, help="Hasta: 7d, 12h o AAAA-MM-DD")
+    episodes.add_argument("--device", help="Puerto o nombre del dispositivo")
+
+    show = commands.add_parser("show", help="Mostrar los datos alrededor de un instante")
+    show.add_argument("time", type=parse_time)
+    show.add_argument("--before", type=float, default=30, help="Segundos antes")
+    show.add_argument("--after", type=float, default=30, help="Segundos después")
+    args = parser.parse_args(argv)
+
+    directory = getattr(args, "directory", SESSION_DIR)
+    archive = SessionArchive(args.archive, directory)
+    if args.command == "scan":
+        print(f"{archive.scan(directory)} sesiones indexadas, {len(archive.sessions())} en total")
+    elif args.command == "episodes":
+        for episode in archive.episodes(args.kind, args.min_duration, args.since, args.until, args.device):
+            print(f"{_format_time(episode.start)}  {episode.kind:5s} {episode.duration:7.1f} s  "
+                  f"RPM {episode.min_rpm}-{episode.max_rpm}  {os.path.basename(episode.path)}")
+    else:
+        data = archive.read_range(args.time - args.before, args.time + args.after)
+        if data is None:
+            print("No hay datos en ese intervalo")
+        else:
+            for t, rpm, count, status in zip(data["timestamp"], data["rpm"], data["breathCount"], data["status"]):
+                state = STATUSES[status] if status < len(STATUSES) else "?"
+                print(f"{_format_time(t)}  RPM {rpm:3d}  respiraciones {count}  estado {state}")
+    archive.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""Análisis por lotes de las sesiones grabadas, en paralelo.
+
+Cada archivo ``.resp`` se procesa en un proceso del pool recorriendo sus
+bloques uno a uno (sin cargar la sesión completa) y produce un resumen:
+distribución de RPM, tiempo en cada estado, variabilidad del intervalo
+entre respiraciones y nivel de ruido. Los resúmenes se agregan a un archivo
+de estado a medida que terminan, así que una ejecución interrumpida continúa
+donde quedó; al final se escribe un informe consolidado (JSON o CSV).
+
+También se resumen las exportaciones ``.json`` (``resp_data_*.json``), con
+dos limitaciones: se leen completas, porque son una única lista JSON, y no
+guardan la hora de cada trama, así que, igual que al reproducirlas, se
+toma una trama por segundo (``DEFAULT_FRAME_INTERVAL``). La distribución de
+RPM, las respiraciones y el ruido son exactos; las duraciones, el tiempo en
+cada estado y los intervalos entre respiraciones son aproximados.
+
+    python respira_batch.py datos_respiracion --output informe.json --jobs 8
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from respira_decoder import FRAME_CHANNELS, STATUSES, TelemetryFrame
+from respira_recorder import FILE_EXTENSION, SESSION_DIR, SessionReader
+from respira_sources import DEFAULT_FRAME_INTERVAL
+
+# RPM máximo de la distribución (valores mayores van a la última cubeta)
+RPM_BINS = 61
+
+# Huecos mayores entre tramas (desconexión) no cuentan como tiempo en un estado
+MAX_GAP = 5.0
+
+STATE_FILE = "batch_estado.jsonl"
+
+# Exportaciones JSON (lista de tramas del firmware)
+EXPORT_EXTENSION = ".json"
+SESSION_EXTENSIONS = (FILE_EXTENSION, EXPORT_EXTENSION)
+
+
+def _percentile(histogram, q):
+    """Percentil ``q`` (0-100) de un histograma de valores enteros"""
+    total = histogram.sum()
+    if not total:
+        return None
+    return int(np.searchsorted(np.cumsum(histogram), total * q / 100.0))
+
+
+class SessionSummary:
+    """Estadísticas acumuladas bloque a bloque"""
+
+    def __init__(self):
+        self.rows = 0
+        self.start = None
+        self.end = None
+        self.rpm_histogram = np.zeros(RPM_BINS, dtype=np.int64)
+        self.status_seconds = np.zeros(len(STATUSES) + 1)
+        self.noise_sum = 0.0
+        self.noise_max = 0.0
+        self.delta_sum = 0.0
+        self.delta_sumsq = 0.0
+
+        # Intervalos entre respiraciones
+        self.breaths = 0
+        self.intervals = 0
+        self.interval_sum = 0.0
+        self.interval_sumsq = 0.0
+        self.successive_sumsq = 0.0
+        self.successive = 0
+
+        self._last_time = None
+        self._last_status = None
+        self._last_count = None
+        self._last_breath = None
+        self._last_interval = None
+
+    def update(self, chunk):
+        t = chunk["timestamp"].astype(np.float64)
+        if not len(t):
+            return
+        status = chunk["status"]
+        count = chunk["breathCount"]
+        rpm = chunk["rpm"]
+        self.rows += len(t)
+        if self.start is None:
+            self.start = float(t[0])
+        self.end = float(t[-1])
+
+        # RPM (solo valores válidos)
+        valid = rpm[rpm > 0]
+        self.rpm_histogram += np.bincount(np.minimum(valid, RPM_BINS - 1), minlength=RPM_BINS)
+
+        # Tiempo en cada estado: cada intervalo se asigna al estado de su inicio
+        if self._last_time is not None:
+            t = np.concatenate(([self._last_time], t))
+            status = np.concatenate(([self._last_status], status))
+            count = np.concatenate(([self._last_count], count))
+        dt = np.diff(t)
+        dt[dt > MAX_GAP] = 0.0
+        codes = np.minimum(status[:-1], len(STATUSES))
+        self.status_seconds += np.bincount(codes, weights=dt, minlength=len(STATUSES) + 1)
+
+        # Respiraciones: muestras donde aumenta breathCount
+        breath_times = t[1:][np.diff(count.astype(np.int64)) > 0]
+        self.breaths += len(breath_times)
+        if len(breath_times):
+            if self._last_breath is not None:
+                breath_times = np.concatenate(([self._last_breath], breath_times))
+            intervals = np.diff(breath_times)
+            if len(intervals):
+                self.intervals += len(intervals)
+                self.interval_sum += float(intervals.sum())
+                self.interval_sumsq += float((intervals ** 2).sum())
+                if self._last_interval is not None:
+                    intervals = np.concatenate(([self._last_interval], intervals))
+                successive = np.diff(intervals)
+                self.successive += len(successive)
+                self.successive_sumsq += float((successive ** 2).sum())
+                self._last_interval = float(intervals[-1])
+            self._last_breath = float(breath_times[-1])
+
+        noise = chunk["noise"]
+        delta = chunk["delta"].astype(np.float64)
+        self.noise_sum += float(noise.sum(dtype=np.float64))
+        self.noise_max = max(self.noise_max, float(noise.max()))
+        self.delta_sum += float(delta.sum())
+        self.delta_sumsq += float((delta ** 2).sum())
+
+        self._last_time = float(t[-1])
+        self._last_status = status[-1]
+        self._last_count = count[-1]
+
+    def result(self):
+        n = self.intervals
+        mean = self.interval_sum / n if n else None
+        std = float(np.sqrt(max(self.interval_sumsq / n - mean ** 2, 0.0))) if n else None
+        rpm_total = int(self.rpm_histogram.sum())
+        delta_mean = self.delta_sum / self.rows if self.rows else 0.0
+        return {
+            "rows": self.rows,
+            "start": self.start,
+            "end": self.end,
+            "duration_s": (self.end - self.start) if self.rows else 0.0,
+            "rpm": {
+                "samples": rpm_total,
+                "mean": float(np.dot(np.arange(RPM_BINS), self.rpm_histogram) / rpm_total) if rpm_total else None,
+                "p5": _percentile(self.rpm_histogram, 5),
+                "p50": _percentile(self.rpm_histogram, 50),
+                "p95": _percentile(self.rpm_histogram, 95),
+                "histogram": self.rpm_histogram.tolist(),
+            },
+            "status_seconds": {name: float(seconds) for name, seconds
+                               in zip(STATUSES + ("DESCONOCIDO",), self.status_seconds)},
+            "breaths": self.breaths,
+            "breath_interval": {
+                "mean_s": mean,
+                "std_s": std,
+                "cv": std / mean if n and mean else None,
+                "rmssd_s": float(np.sqrt(self.successive_sumsq / self.successive)) if self.successive else None,
+            },
+            "noise": {
+                "mean": self.noise_sum / self.rows if self.rows else None,
+                "max": self.noise_max,
+                "delta_std": float(np.sqrt(max(self.delta_sumsq / self.rows - delta_mean ** 2, 0.0)))
+                if self.rows else None,
+            },
+        }
+
+
+def export_chunk(path):
+    """Tramas de una exportación JSON como un bloque de columnas"""
+    with open(path) as f:
+        records = json.load(f)
+    if not isinstance(records, list):
+        raise ValueError(f"{path} no es una exportación de Respira")
+    rows = []
+    for index, record in enumerate(records):
+        frame = TelemetryFrame(**{key: record[key] for key in TelemetryFrame._fields if key in record})
+        if not frame.timestamp:
+            frame = frame._replace(timestamp=index * DEFAULT_FRAME_INTERVAL)
+        rows.append(frame.as_row())
+    table = np.array(rows, dtype=list(FRAME_CHANNELS))
+    return {name: table[name] for name, _ in FRAME_CHANNELS}
+
+
+def summarize_session(path):
+    """Resumen de un archivo de sesión (se ejecuta en un proceso del pool)"""
+    summary = SessionSummary()
+    if path.lower().endswith(EXPORT_EXTENSION):
+        summary.update(export_chunk(path))
+        device = None
+    else:
+        reader = SessionReader(path)
+        for chunk in reader.iter_chunks():
+            summary.update(chunk)
+        device = reader.meta.get("port")
+    result = summary.result()
+    result["device"] = device
+    return result
+
+
+def _file_key(path):
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_size, stat.st_mtime
+
+
+def load_state(path):
+    """Resúmenes ya calculados, por (ruta, tamaño, mtime)"""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue   # Última línea cortada por una interrupción
+            done[(record["path"], record["size"], record["mtime"])] = record
+    return done
+
+
+def find_sessions(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(SESSION_EXTENSIONS):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+
+def consolidate(records):
+    """Totales del conjunto de sesiones"""
+    histogram = np.zeros(RPM_BINS, dtype=np.int64)
+    status_seconds = dict.fromkeys(STATUSES + ("DESCONOCIDO",), 0.0)
+    total_seconds = 0.0
+    breaths = 0
+    for record in records:
+        histogram += np.asarray(record["rpm"]["histogram"], dtype=np.int64)
+        for name, seconds in record["status_seconds"].items():
+            status_seconds[name] += seconds
+        total_seconds += record["duration_s"]
+        breaths += record["breaths"]
+    measured = sum(status_seconds.values())
+    return {
+        "sessions": len(records),
+        "hours": total_seconds / 3600,
+        "breaths": breaths,
+        "rpm_p5": _percentile(histogram, 5),
+        "rpm_p50": _percentile(histogram, 50),
+        "rpm_p95": _percentile(histogram, 95),
+        "status_fraction": {name: (seconds / measured if measured else 0.0)
+                            for name, seconds in status_seconds.items()},
+    }
+
+
+def write_report(path, records):
+    if path.lower().endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["path", "device", "start", "duration_s", "rows", "breaths",
+                             "rpm_mean", "rpm_p5", "rpm_p50", "rpm_p95",
+                             *(f"{name}_s" for name in STATUSES),
+                             "interval_mean_s", "interval_cv", "rmssd_s", "noise_mean", "noise_max"])
+            for r in records:
+                writer.writerow([r["path"], r["device"], r["start"], r["duration_s"], r["rows"], r["breaths"],
+                                 r["rpm"]["mean"], r["rpm"]["p5"], r["rpm"]["p50"], r["rpm"]["p95"],
+                                 *(r["status_seconds"][name] for name in STATUSES),
+                                 r["breath_interval"]["mean_s"], r["breath_interval"]["cv"],
+                                 r["breath_interval"]["rmssd_s"], r["noise"]["mean"], r["noise"]["max"]])
+    else:
+        with open(path, "w") as f:
+            json.dump({"totals": consolidate(records), "sessions": records}, f, indent=1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resumen en paralelo de las sesiones grabadas")
+    parser.add_argument("paths", nargs="*", default=[SESSION_DIR], help="Archivos .resp o .json, o carpetas")
+    parser.add_argument("--output", default="informe_sesiones.json", help="Informe (.json o .csv)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="Procesos en paralelo")
+    parser.add_argument("--state", default=STATE_FILE,
+                        help="Archivo de progreso para continuar tras una interrupción")
+    parser.add_argument("--restart", action="store_true", help="Ignorar el progreso anterior")
+    args = parser.parse_args(argv)
+
+    done = {} if args.restart else load_state(args.state)
+    keys = [_file_key(path) for path in find_sessions(args.paths)]
+    pending = [key for key in keys if key not in done]
+    print(f"{len(keys)} sesiones, {len(keys) - len(pending)} ya resumidas, {len(pending)} pendientes")
+
+    started = time.monotonic()
+    errors = 0
+    with open(args.state, "w" if args.restart else "a") as state, \
+            ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = {pool.submit(summarize_session, key[0]): key for key in pending}
+        try:
+            for finished, future in enumerate(as_completed(futures), 1):
+                path, size, mtime = futures[future]
+                try:
+                    record = dict(future.result(), path=path, size=size, mtime=mtime)
+                except (OSError, ValueError) as e:
+                    errors += 1
+                    print(f"Error en {path}: {e}", file=sys.stderr)
+                    continue
+                done[(path, size, mtime)] = record
+                state.write(json.dumps(record) + "\n")
+                state.flush()
+                if finished % 100 == 0:
+                    print(f"  {finished}/{len(pending)}")
+        except KeyboardInterrupt:
+            pool.shutdown(cancel_futures=True)
+            print("Interrumpido; el progreso quedó guardado en", args.state)
+            return 130
+
+    records = [done[key] for key in keys if key in done]
+    write_report(args.output, records)
+    print(f"{len(records)} sesiones en {args.output} ({time.monotonic() - started:.1f} s, {errors} errores)")
+    return 0 if not errors else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
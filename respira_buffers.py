@@ -0,0 +1,250 @@
+import numpy as np
+
+
+class RingBuffer:
+    """Buffer circular de capacidad fija respaldado por un array de NumPy.
+
+    Cada muestra se escribe dos veces (en ``i`` y en ``i + capacity``), de modo
+    que las últimas ``n`` muestras siempre forman un bloque contiguo y
+    ``view()`` puede devolverlas en orden sin copiar. ``append`` es O(1) y la
+    memoria es fija sin importar cuántas muestras se agreguen.
+    """
+
+    def __init__(self, capacity, dtype=np.float64):
+        if capacity < 1:
+            raise ValueError("La capacidad debe ser al menos 1")
+        self.capacity = int(capacity)
+        self.dtype = np.dtype(dtype)
+        self._data = np.zeros(2 * self.capacity, dtype=self.dtype)
+        self._head = 0   # Próxima posición de escritura en [0, capacity)
+        self._count = 0
+        self.total = 0   # Muestras agregadas desde la creación
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes
+
+    def clear(self):
+        """Vaciar el buffer sin liberar memoria"""
+        self._head = 0
+        self._count = 0
+
+    def append(self, value):
+        """Agregar una muestra (O(1))"""
+        i = self._head
+        self._data[i] = value
+        self._data[i + self.capacity] = value
+        self._head = i + 1 if i + 1 < self.capacity else 0
+        if self._count < self.capacity:
+            self._count += 1
+        self.total += 1
+
+    def extend(self, values):
+        """Agregar varias muestras de una vez"""
+        values = np.asarray(values, dtype=self.dtype).ravel()
+        n = len(values)
+        if n == 0:
+            return
+        cap = self.capacity
+        self.total += n
+        if n >= cap:
+            values = values[-cap:]
+            self._data[:cap] = values
+            self._data[cap:] = values
+            self._head = 0
+            self._count = cap
+            return
+
+        first = min(n, cap - self._head)
+        for offset in (0, cap):
+            start = self._head + offset
+            self._data[start:start + first] = values[:first]
+            self._data[offset:offset + n - first] = values[first:]
+        self._head = (self._head + n) % cap
+        self._count = min(self._count + n, cap)
+
+    def view(self, n=None):
+        """Últimas ``n`` muestras en orden cronológico, sin copiar.
+
+        La vista comparte memoria con el buffer: se mantiene válida, pero su
+        contenido cambia con los siguientes ``append``.
+        """
+        count = self._count if n is None else min(n, self._count)
+        end = self._head + self.capacity
+        view = self._data[end - count:end]
+        view.flags.writeable = False
+        return view
+
+    def last(self, default=None):
+        """Muestra más reciente"""
+        if not self._count:
+            return default
+        return self._data[self._head + self.capacity - 1]
+
+
+class HistoryBuffer:
+    """Conjunto de canales sincronizados, cada uno con su propio dtype.
+
+    ``channels`` es una secuencia de pares ``(nombre, dtype)``; ``append``
+    recibe un valor por canal en ese mismo orden.
+    """
+
+    def __init__(self, capacity, channels):
+        self.capacity = int(capacity)
+        self.names = tuple(name for name, _ in channels)
+        self._buffers = tuple(RingBuffer(capacity, dtype) for _, dtype in channels)
+        self._by_name = dict(zip(self.names, self._buffers))
+
+    def __len__(self):
+        return len(self._buffers[0])
+
+    def __getitem__(self, name):
+        return self._by_name[name]
+
+    @property
+    def total(self):
+        return self._buffers[0].total
+
+    @property
+    def nbytes(self):
+        return sum(buf.nbytes for buf in self._buffers)
+
+    def clear(self):
+        for buf in self._buffers:
+            buf.clear()
+
+    def append(self, *values):
+        """Agregar una fila (un valor por canal)"""
+        for buf, value in zip(self._buffers, values):
+            buf.append(value)
+
+    def view(self, name, n=None):
+        """Vista ordenada de las últimas ``n`` muestras de un canal"""
+        return self._by_name[name].view(n)
+
+    def rows(self, n=None):
+        """Iterar las últimas ``n`` filas como diccionarios (para exportar)"""
+        views = [buf.view(n) for buf in self._buffers]
+        converters = [_python_scalar(buf.dtype) for buf in self._buffers]
+        for values in zip(*views):
+            yield {name: convert(value)
+                   for name, convert, value in zip(self.names, converters, values)}
+
+
+def _python_scalar(dtype):
+    """Conversión de un escalar de NumPy al tipo nativo de Python"""
+    if dtype.kind == "f" and dtype.itemsize < 8:
+        # float32 -> representación corta ("9.81" y no 9.8100004196)
+        return lambda value: float(str(value))
+    return lambda value: value.item()
+
+
+# Resoluciones del resumen de tendencias (segundos por cubeta) y cubetas por nivel
+TREND_WIDTHS = (1, 5, 30, 120, 600)
+TREND_CAPACITY = 4096
+TREND_CHANNELS = (("timestamp", "f8"), ("min", "f4"), ("max", "f4"), ("mean", "f4"))
+
+
+class MinMaxPyramid:
+    """Resumen mín/máx/media de una serie a varias resoluciones de tiempo.
+
+    Cada nivel agrupa las muestras en cubetas de ``widths[i]`` segundos y
+    guarda las últimas ``capacity`` en un ``HistoryBuffer``. Al cerrarse una
+    cubeta se combina con la cubeta en curso del nivel siguiente, así que
+    ``append`` cuesta O(niveles) y la memoria es fija. Para dibujar un rango
+    de tiempo se elige el nivel más fino que lo cubre con ``max_points``
+    cubetas como máximo: el costo depende de los píxeles, no de la duración.
+    """
+
+    def __init__(self, widths=TREND_WIDTHS, capacity=TREND_CAPACITY):
+        if any(b <= a for a, b in zip(widths, widths[1:])):
+            raise ValueError("Las resoluciones deben ser crecientes")
+        self.widths = tuple(widths)
+        self.capacity = int(capacity)
+        self.levels = tuple(HistoryBuffer(capacity, TREND_CHANNELS) for _ in self.widths)
+        # Cubeta en curso por nivel: [id, cantidad, suma, mín, máx]
+        self._open = [None] * len(self.widths)
+        self.last_time = None
+        self.total = 0
+
+    def __len__(self):
+        return self.total
+
+    @property
+    def nbytes(self):
+        return sum(level.nbytes for level in self.levels)
+
+    @property
+    def span(self):
+        """Duración máxima que se puede consultar (la del nivel más grueso)"""
+        return self.widths[-1] * self.capacity
+
+    def clear(self):
+        for level in self.levels:
+            level.clear()
+        self._open = [None] * len(self.widths)
+        self.last_time = None
+        self.total = 0
+
+    def append(self, t, value):
+        """Agregar una muestra con su hora (segundos, creciente)"""
+        value = float(value)
+        self._merge(0, t, 1, value, value, value)
+        self.last_time = t
+        self.total += 1
+
+    def _merge(self, index, t, count, total, lo, hi):
+        bucket = int(t // self.widths[index])
+        current = self._open[index]
+        if current is not None and current[0] == bucket:
+            current[1] += count
+            current[2] += total
+            if lo < current[3]:
+                current[3] = lo
+            if hi > current[4]:
+                current[4] = hi
+            return
+        if current is not None:
+            self._close(index, current)
+        self._open[index] = [bucket, count, total, lo, hi]
+
+    def _close(self, index, bucket):
+        """Guardar una cubeta terminada y pasarla al nivel siguiente"""
+        ident, count, total, lo, hi = bucket
+        start = ident * self.widths[index]
+        self.levels[index].append(start, lo, hi, total / count)
+        if index + 1 < len(self.widths):
+            self._merge(index + 1, start, count, total, lo, hi)
+
+    def level_for(self, span, max_points):
+        """Índice del nivel más fino que cubre ``span`` con ``max_points`` cubetas"""
+        for index, width in enumerate(self.widths):
+            if span <= width * max_points and span <= width * self.capacity:
+                return index
+        return len(self.widths) - 1
+
+    def series(self, start, end, max_points):
+        """Cubetas entre ``start`` y ``end``: (nivel, t, mín, máx, media).
+
+        ``t`` es el centro de cada cubeta; incluye la cubeta en curso.
+        """
+        index = self.level_for(end - start, max_points)
+        level = self.levels[index]
+        width = self.widths[index]
+        times = level.view("timestamp")
+        lo = np.searchsorted(times, start - width, side="right")
+        hi = np.searchsorted(times, end, side="right")
+        columns = [level.view(name)[lo:hi] for name in ("timestamp", "min", "max", "mean")]
+
+        current = self._open[index]
+        if current is not None:
+            ident, count, total, b_lo, b_hi = current
+            t = ident * width
+            if start - width < t <= end:
+                extra = (t, b_lo, b_hi, total / count)
+                columns = [np.append(column, value) for column, value in zip(columns, extra)]
+        t, lo_values, hi_values, mean = columns
+        return index, t + width / 2, lo_values, hi_values, mean
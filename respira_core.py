@@ -0,0 +1,368 @@
+"""Núcleo del monitor: lectura, decodificación, históricos, grabación y detección.
+
+No importa Tk ni matplotlib; lo usan tanto la GUI (``respira_gui.py``) como
+el modo sin interfaz (``respira_headless.py``). Todo lo que cambia se avisa
+con ``publish(campo=valor, ...)``:
+
+    rpm, breath_count, status   en cada trama
+    spectral                    RPM espectral y confianza (``SpectralEstimate``)
+    message                     mensajes del firmware y avisos
+    alert, alerts               evento de alerta del host y alertas activas
+    recording_error             (ruta, error) si la grabación se detuvo
+    link                        rendimiento del enlace (una vez por segundo)
+    finished                    la fuente que terminó (reproducción o simulación)
+
+Las métricas por etapa están desactivadas por defecto (``metrics`` es
+``None`` y el camino crítico no mide nada); ``enable_metrics()`` las activa.
+"""
+import sqlite3
+import threading
+import time
+
+from respira_alerts import AlertEngine
+from respira_archive import SessionArchive
+from respira_analysis import BreathDetector, CrossCheck
+from respira_buffers import TREND_CAPACITY, HistoryBuffer, MinMaxPyramid
+from respira_decoder import FRAME_CHANNELS
+from respira_metrics import Registry
+from respira_protocol import AutoDecoder
+from respira_recorder import SESSION_DIR, SessionRecorder, session_filename
+from respira_spectral import SpectralEstimate, SpectralRPM
+
+# Capacidad del histórico de tramas (memoria fija, independiente de la duración)
+SIGNAL_HISTORY_CAPACITY = 20 * 60 * 60 * 3   # 3 horas de tramas a 20 Hz
+
+# Periodo de publicación del rendimiento del enlace (s)
+LINK_REPORT_INTERVAL = 1.0
+
+# Tramas por segundo mínimas para contrastar el conteo en vivo: el detector
+# del host supone las lecturas del firmware (~20 Hz, protocolo binario); con
+# el protocolo JSON (1 trama/s) no detecta nada y el contraste queda en
+# ``respira_analysis.py`` sobre sesiones grabadas
+CROSS_CHECK_MIN_HZ = 10.0
+
+
+def _ignore(**values):
+    pass
+
+
+class MonitorCore:
+    """Canal completo de una fuente de datos, sin interfaz.
+
+    ``start(source)`` abre la fuente en el hilo que llama (así recibe el
+    error) y lanza el hilo lector; ``stop()`` lo detiene, cierra la fuente y
+    termina la grabación. Con ``archive`` (un ``SessionArchive``) la sesión
+    grabada se indexa al terminar, en un hilo aparte con su propia conexión
+    a SQLite (``stop()`` no espera a que termine). ``alerts`` permite compartir un ``AlertEngine``
+    (con reglas por paciente) entre varios núcleos. Con ``hub`` (un
+    ``TelemetryHub``) las tramas, mensajes y alertas se reparten además a
+    los suscriptores locales.
+    """
+
+    def __init__(self, publish=None, history_capacity=SIGNAL_HISTORY_CAPACITY,
+                 trend_capacity=TREND_CAPACITY, session_dir=SESSION_DIR, record=True,
+                 archive=None, alerts=None, hub=None):
+        self.publish = publish or _ignore
+        self.session_dir = session_dir
+        self.record = record
+        self.archive = archive
+        self.hub = hub
+
+        # Históricos en buffers circulares (append O(1))
+        self.history = HistoryBuffer(history_capacity, FRAME_CHANNELS)
+        # Tendencias a varias resoluciones (mín/máx/media por cubeta)
+        self.rpm_trend = MinMaxPyramid(capacity=trend_capacity)
+        self.signal_trend = MinMaxPyramid(capacity=trend_capacity)
+
+        # Detecta automáticamente si el dispositivo envía JSON o binario
+        self.decoder = AutoDecoder(on_log=self.handle_log_line)
+
+        # Detección en el host para contrastar el conteo del firmware
+        self.breath_detector = BreathDetector()
+        self.cross_check = CrossCheck()
+        self.cross_checking = False   # Solo con frecuencia de tramas suficiente
+        # RPM espectral de la señal filtrada (disponible antes que la del firmware)
+        self.spectral = SpectralRPM()
+
+        # Alertas del host; el paciente es el nombre de la fuente
+        self.alerts = alerts if alerts is not None else AlertEngine()
+        self.patient = "local"
+
+        # Grabación continua de la sesión (archivo .resp en datos_respiracion/)
+        self.recorder = None
+        self.session_path = None
+
+        # Métricas (None = desactivadas)
+        self.metrics = None
+        self._decode_time = None
+        self._store_time = None
+        self._ingest_latency = None
+
+        self.source = None
+        self.last_frame = None
+        self.finished = threading.Event()
+        self.stop_event = threading.Event()
+        self._thread = None
+
+    def enable_metrics(self, registry=None):
+        """Activar las métricas por etapa; devuelve el ``Registry``"""
+        if self.metrics is not None:
+            return self.metrics
+        registry = registry or Registry()
+        stage = "respira_stage_seconds"
+        doc = "Duración de cada etapa del canal de datos"
+        self._decode_time = registry.histogram(stage, doc, stage="decode")
+        self._store_time = registry.histogram(stage, doc, stage="store")
+        self._ingest_latency = registry.histogram(
+            "respira_ingest_latency_seconds", "Desde la llegada de los bytes hasta la trama almacenada")
+
+        def link(name):
+            return lambda: getattr(self.source.stats, name) if self.source is not None else 0
+
+        def decoder(name):
+            return lambda: getattr(self.decoder, name)
+
+        registry.counter("respira_bytes_total", "Bytes recibidos", link("bytes"))
+        registry.counter("respira_reads_total", "Llamadas de lectura a la fuente", link("reads"))
+        registry.gauge("respira_max_backlog_bytes", "Mayor backlog observado en el puerto", link("max_backlog"))
+        registry.counter("respira_frames_total", "Tramas decodificadas", decoder("frames"))
+        registry.counter("respira_malformed_total", "Tramas JSON mal formadas o con CRC inválido", decoder("malformed"))
+        registry.counter("respira_log_lines_total", "Líneas de texto que no son tramas", decoder("logs"))
+        registry.counter("respira_dropped_frames_total", "Tramas perdidas según la secuencia", decoder("lost"))
+        registry.counter("respira_alert_events_total", "Eventos de alerta del host",
+                         lambda: self.alerts.events)
+        registry.counter("respira_recorded_rows_total", "Filas escritas en la grabación",
+                         lambda: self.recorder.rows_written if self.recorder is not None else 0)
+        self.metrics = registry
+        return registry
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, source):
+        """Abrir ``source`` y empezar a leer en segundo plano"""
+        if source.decoded:
+            source.on_log = self.handle_log_line
+        self.source = source.open()
+        self.patient = source.name
+        self.alerts.reset(self.patient)
+        # Una reproducción (o lo que llega de un hub) ya está grabada
+        if self.record and not source.recorded:
+            self.start_recording(source.name)
+
+        self.stop_event.clear()
+        self.finished.clear()
+        self._thread = threading.Thread(target=self.run, name="respira-reader", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        """Detener la lectura, cerrar la fuente y terminar la grabación"""
+        self.stop_event.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout)
+        self._thread = None
+
+        if self.source is not None:
+            self.source.close()
+
+        # Escribe el último bloque
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+            if self.archive is not None:
+                # Recorre el archivo completo: no bloquear al que llama (la GUI)
+                self._index_thread = threading.Thread(target=self.index_session, args=(self.session_path,),
+                                                      name="respira-index")
+                self._index_thread.start()
+
+    def index_session(self, path):
+        """Agregar una sesión grabada al índice de sesiones (desde cualquier hilo)"""
+        try:
+            archive = SessionArchive(self.archive.path, self.archive.directory)
+            try:
+                archive.index_session(path)
+            finally:
+                archive.close()
+        except (OSError, ValueError, sqlite3.Error) as e:
+            print(f"Error indexando la sesión: {e}")
+
+    def start_recording(self, name):
+        """Empezar a grabar la sesión en segundo plano"""
+        try:
+            path = session_filename(self.session_dir)
+            self.recorder = SessionRecorder(path, meta={"port": name},
+                                            on_error=self.handle_recording_error).start()
+            self.session_path = self.recorder.path
+        except OSError as e:
+            self.recorder = None
+            print(f"Error iniciando grabación: {e}")
+
+    def handle_recording_error(self, error):
+        """La grabación se detuvo por un error (se llama desde el hilo escritor)"""
+        # Con la ruta, el mismo error en otra sesión también se avisa
+        self.publish(message=f"Aviso: la grabación se detuvo ({error})",
+                     recording_error=(self.session_path, error))
+
+    def run(self):
+        """Bucle del hilo lector"""
+        self.decoder.reset()
+        self.breath_detector.reset()
+        self.cross_check = CrossCheck()
+        self.cross_checking = False
+        self.spectral.reset()
+
+        source = self.source
+        stats = source.stats
+        stats.rates()
+        next_report = time.monotonic() + LINK_REPORT_INTERVAL
+
+        while not self.stop_event.is_set():
+            try:
+                # Leer datos disponibles (la fuente se bloquea hasta que los haya)
+                data = source.read_timed() if source.timed else source.read()
+
+                if data:
+                    # Todas las tramas del bloque llevan la hora de llegada al
+                    # puerto (o la de la propia fuente en reproducción y simulación)
+                    if source.decoded:
+                        stats.frames += self.feed_frames(data)
+                    elif source.timed:
+                        stats.frames += self.feed_timed(data, source.last_arrival)
+                    elif self.metrics is None:
+                        stats.frames += self.feed(data, source.last_arrival)
+                    else:
+                        stats.frames += self._feed_measured(data, source.last_arrival)
+                elif source.finished:
+                    self.finished.set()
+                    self.publish(message="Reproducción terminada", finished=source)
+                    break
+
+                if time.monotonic() >= next_report:
+                    next_report += LINK_REPORT_INTERVAL
+                    self.publish_link_stats(stats)
+
+            except Exception as e:
+                print(f"Error leyendo datos: {e}")
+                # Si hay un error, pausa breve antes de reintentar
+                time.sleep(0.1)
+
+    def feed(self, data, timestamp=None):
+        """Decodificar bytes recibidos; devuelve cuántas tramas contenían"""
+        frames = self.decoder.feed(data, timestamp)
+        for frame in frames:
+            self.handle_frame(frame)
+        if frames and self.hub is not None:
+            self.hub.publish(self.patient, frames)
+        return len(frames)
+
+    def feed_timed(self, lines, arrival=None):
+        """Decodificar pares ``(hora, bytes)`` de una fuente con reloj propio"""
+        count = 0
+        for timestamp, data in lines:
+            if self.metrics is None:
+                count += self.feed(data, timestamp)
+            else:
+                count += self._feed_measured(data, timestamp, arrival)
+        return count
+
+    def feed_frames(self, frames):
+        """Procesar tramas ya decodificadas (p. ej. de un hub)"""
+        for frame in frames:
+            self.handle_frame(frame)
+        return len(frames)
+
+    def _feed_measured(self, data, timestamp, arrival=None):
+        """``feed()`` midiendo cada etapa (la latencia se mide desde ``arrival``)"""
+        start = time.perf_counter()
+        frames = self.decoder.feed(data, timestamp)
+        decoded = time.perf_counter()
+        for frame in frames:
+            self.handle_frame(frame)
+        stored = time.perf_counter()
+        if frames and self.hub is not None:
+            self.hub.publish(self.patient, frames)
+
+        self._decode_time.observe(decoded - start)
+        if frames:
+            self._store_time.observe((stored - decoded) / len(frames))
+            arrival = timestamp if arrival is None else arrival
+            if arrival is not None:
+                self._ingest_latency.observe(max(0.0, time.time() - arrival))
+        return len(frames)
+
+    def process_line(self, line):
+        """Procesar una línea de datos recibida"""
+        if not line:
+            return
+
+        frame = self.decoder.decode_line(line)
+        if frame is not None:
+            self.handle_frame(frame)
+
+    def handle_log_line(self, line):
+        """Mensajes de texto del firmware (calibración, ciclos)"""
+        self.publish(message=line)
+        if self.hub is not None:
+            self.hub.publish_log(self.patient, line)
+
+    def handle_frame(self, frame):
+        """Actualizar buffers, grabación y detección con una trama decodificada"""
+        try:
+            # Almacenar la trama completa en el histórico y en la grabación
+            self.history.append(*frame.as_row())
+            if self.recorder is not None:
+                self.recorder.record_frame(frame)
+            self.last_frame = frame
+
+            # Actualizar tendencias (RPM solo si hay un valor válido)
+            self.signal_trend.append(frame.timestamp, frame.filtered)
+            rpm = frame.rpm
+            if rpm > 0:
+                self.rpm_trend.append(frame.timestamp, rpm)
+
+            self.spectral.update(frame.filtered, frame.timestamp)
+            estimate = self.spectral.estimate()
+            self.publish(rpm=rpm, breath_count=frame.breathCount, status=frame.status,
+                         spectral=SpectralEstimate(round(estimate.rpm, 1), round(estimate.confidence, 2)))
+
+            events = self.alerts.update(self.patient, frame)
+            if events:
+                self.handle_alerts(events)
+
+            # Contrastar con la detección del host (frecuencia medida por el estimador espectral)
+            rate = self.spectral.rate
+            if rate and rate >= CROSS_CHECK_MIN_HZ:
+                self.cross_checking = True
+                self.breath_detector.update(frame.delta, int(frame.timestamp * 1000),
+                                            frame.threshold, frame.noise)
+                if self.cross_check.update(self.breath_detector.breath_count, frame.breathCount):
+                    self.publish(message=f"Aviso: el host cuenta {self.breath_detector.breath_count} "
+                                         f"respiraciones y el firmware {frame.breathCount}")
+            elif self.cross_checking:
+                # La frecuencia bajó o se está midiendo de nuevo: empezar de cero
+                self.cross_checking = False
+                self.breath_detector.reset()
+                self.cross_check = CrossCheck()
+
+        except Exception as e:
+            print(f"Error procesando datos: {e}")
+
+    def handle_alerts(self, events):
+        """Grabar y publicar los eventos de alerta del host"""
+        for event in events:
+            if self.recorder is not None:
+                self.recorder.record_event(event.as_dict())
+            if self.hub is not None:
+                self.hub.publish_event(self.patient, event.as_dict())
+            text = f"ALERTA {event.kind}: {event.message}" if event.active else event.message
+            self.publish(alert=event, alerts=self.alerts.active(self.patient), message=text)
+
+    def publish_link_stats(self, stats):
+        """Publicar el rendimiento del enlace"""
+        bytes_rate, frames_rate = stats.rates()
+        self.publish(link=(
+            f"Enlace: {bytes_rate / 1024:.1f} KB/s · {frames_rate:.0f} tramas/s"
+            f" · {stats.reads} lecturas · backlog máx. {stats.max_backlog} B"
+        ))
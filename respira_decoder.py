@@ -0,0 +1,260 @@
+import json
+import re
+import time
+from collections import deque
+from typing import NamedTuple
+
+# Orden fijo de campos que imprime el firmware en cada trama JSON
+FIELDS = ("acceleration", "delta", "filtered", "threshold", "noise", "rpm", "breathCount", "status")
+
+# Estados que puede reportar el firmware
+STATUSES = ("ESPERANDO", "NORMAL", "ALTO", "BAJO")
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+STATUS_UNKNOWN = 255
+
+# Rango saludable usado por el firmware (ALERT_LOW / ALERT_HIGH)
+ALERT_LOW = 12
+ALERT_HIGH = 25
+
+# Canales numéricos de una trama (nombre, dtype) para buffers y archivos
+FRAME_CHANNELS = (
+    ("timestamp", "f8"),
+    ("acceleration", "f4"),
+    ("delta", "f4"),
+    ("filtered", "f4"),
+    ("threshold", "f4"),
+    ("noise", "f4"),
+    ("rpm", "i2"),
+    ("breathCount", "i4"),
+    ("status", "u1"),
+)
+
+# Ruta rápida: la trama exacta que genera Respira_code.ino
+_NUM = rb"(-?[0-9]+(?:\.[0-9]*)?)"
+_INT = rb"(-?[0-9]+)"
+FAST_FRAME = re.compile(
+    rb'\{"acceleration":' + _NUM +
+    rb',"delta":' + _NUM +
+    rb',"filtered":' + _NUM +
+    rb',"threshold":' + _NUM +
+    rb',"noise":' + _NUM +
+    rb',"rpm":' + _INT +
+    rb',"breathCount":' + _INT +
+    rb',"status":"([A-Z]*)"\}'
+)
+# La misma trama con su fin de línea, para recorrer el buffer sin buscar '\n'
+FAST_LINE = re.compile(FAST_FRAME.pattern + rb"[ \t\r]*\n")
+
+# Cadenas de estado ya decodificadas (evita crear un str nuevo por trama)
+_STATUS_CACHE = {s.encode(): s for s in STATUSES}
+
+_WHITESPACE = b" \t\r"
+
+
+class TelemetryFrame(NamedTuple):
+    """Trama de telemetría decodificada"""
+    acceleration: float = 0.0
+    delta: float = 0.0
+    filtered: float = 0.0
+    threshold: float = 0.0
+    noise: float = 0.0
+    rpm: int = 0
+    breathCount: int = 0
+    status: str = ""
+    timestamp: float = 0.0  # Hora de llegada en el host (time.time())
+
+    def as_dict(self):
+        """Diccionario con las mismas claves que envía el firmware"""
+        return {name: getattr(self, name) for name in FIELDS}
+
+    def as_row(self):
+        """Valores en el orden de FRAME_CHANNELS (estado como código)"""
+        return (self.timestamp, self.acceleration, self.delta, self.filtered,
+                self.threshold, self.noise, self.rpm, self.breathCount,
+                STATUS_CODES.get(self.status, STATUS_UNKNOWN))
+
+
+def firmware_status(rpm, low=ALERT_LOW, high=ALERT_HIGH):
+    """Estado que reporta el firmware para un valor de RPM"""
+    if rpm > high:
+        return "ALTO"
+    if 0 < rpm < low:
+        return "BAJO"
+    if rpm > 0:
+        return "NORMAL"
+    return "ESPERANDO"
+
+
+def encode_frame(frame):
+    """Línea JSON idéntica a la que imprime el firmware (floats con 2 decimales)"""
+    return (
+        f'{{"acceleration":{frame.acceleration:.2f},"delta":{frame.delta:.2f},'
+        f'"filtered":{frame.filtered:.2f},"threshold":{frame.threshold:.2f},'
+        f'"noise":{frame.noise:.2f},"rpm":{frame.rpm},"breathCount":{frame.breathCount},'
+        f'"status":"{frame.status}"}}\r\n'
+    ).encode("ascii")
+
+
+def frame_from_row(row):
+    """Reconstruir una trama a partir de un diccionario de canales"""
+    code = row["status"]
+    return TelemetryFrame(
+        row["acceleration"], row["delta"], row["filtered"], row["threshold"],
+        row["noise"], row["rpm"], row["breathCount"],
+        STATUSES[code] if code < len(STATUSES) else "",
+        row["timestamp"],
+    )
+
+
+class FrameDecoder:
+    """Decodificador incremental del flujo serial.
+
+    Acumula los bytes en un ``bytearray`` y solo busca ``\\n`` en la parte
+    recién llegada. Las tramas JSON se convierten en ``TelemetryFrame`` y las
+    líneas de registro del firmware ("Calibrando...", "Respiración #...")
+    se envían al canal de registro en lugar de descartarse.
+    """
+
+    def __init__(self, on_log=None, log_capacity=200, max_line=4096):
+        self.on_log = on_log
+        self.log_lines = deque(maxlen=log_capacity)
+        self.max_line = max_line
+        self._buffer = bytearray()
+        self._scan_from = 0
+
+        # Contadores
+        self.frames = 0
+        self.fast_frames = 0
+        self.logs = 0
+        self.malformed = 0
+
+    def reset(self):
+        """Descartar cualquier línea incompleta pendiente"""
+        self._buffer.clear()
+        self._scan_from = 0
+
+    def discard_partial(self):
+        """Descartar la línea incompleta pendiente (se cuenta como malformada)"""
+        if self._buffer:
+            self.malformed += 1
+            self.reset()
+
+    def feed(self, data, timestamp=None):
+        """Agregar bytes recibidos y devolver las tramas completas"""
+        if timestamp is None:
+            timestamp = time.time()
+
+        buf = self._buffer
+        buf += data
+        frames = []
+        append = frames.append
+        match = FAST_LINE.match
+        find = buf.find
+        start = 0
+        scan_from = self._scan_from
+        fast = 0
+
+        while True:
+            m = match(buf, start)
+            if m is not None:
+                acc, delta, filt, thr, noise, rpm, count, status = m.groups()
+                append(TelemetryFrame(
+                    float(acc), float(delta), float(filt), float(thr), float(noise),
+                    int(rpm), int(count),
+                    _STATUS_CACHE.get(status) or status.decode("ascii"),
+                    timestamp,
+                ))
+                fast += 1
+                start = m.end()
+                continue
+
+            # Línea que no es la trama estándar (o aún incompleta)
+            newline = find(b"\n", max(start, scan_from))
+            if newline < 0:
+                break
+            frame = self._decode_span(buf, start, newline, timestamp)
+            if frame is not None:
+                append(frame)
+            start = newline + 1
+
+        self.frames += fast
+        self.fast_frames += fast
+
+        if start:
+            del buf[:start]
+        self._scan_from = len(buf)
+
+        # Una "línea" sin fin demasiado larga es basura: descartarla
+        if self._scan_from > self.max_line:
+            self.malformed += 1
+            self.reset()
+
+        return frames
+
+    def decode_line(self, line, timestamp=None):
+        """Decodificar una línea completa (str o bytes) sin buffer"""
+        if isinstance(line, str):
+            line = line.encode("utf-8", errors="ignore")
+        if timestamp is None:
+            timestamp = time.time()
+        return self._decode_span(line, 0, len(line), timestamp)
+
+    def _decode_span(self, buf, start, end, timestamp):
+        """Decodificar buf[start:end] sin copiar en la ruta rápida"""
+        # Recortar espacios y el '\r' de Serial.println
+        while end > start and buf[end - 1] in _WHITESPACE:
+            end -= 1
+        while start < end and buf[start] in _WHITESPACE:
+            start += 1
+        if start == end:
+            return None
+
+        if buf[start] != 0x7B:  # '{'
+            self._emit_log(buf, start, end)
+            return None
+
+        match = FAST_FRAME.fullmatch(buf, start, end)
+        if match is not None:
+            acc, delta, filt, thr, noise, rpm, count, status = match.groups()
+            self.frames += 1
+            self.fast_frames += 1
+            return TelemetryFrame(
+                float(acc), float(delta), float(filt), float(thr), float(noise),
+                int(rpm), int(count),
+                _STATUS_CACHE.get(status) or status.decode("ascii"),
+                timestamp,
+            )
+
+        return self._decode_json(bytes(buf[start:end]), timestamp)
+
+    def _decode_json(self, raw, timestamp):
+        """Ruta lenta: orden de claves distinto o campos adicionales"""
+        try:
+            data = json.loads(raw)
+            if not isinstance(data, dict):
+                raise ValueError("no es un objeto JSON")
+            frame = TelemetryFrame(
+                float(data.get("acceleration", 0.0)),
+                float(data.get("delta", 0.0)),
+                float(data.get("filtered", 0.0)),
+                float(data.get("threshold", 0.0)),
+                float(data.get("noise", 0.0)),
+                int(data.get("rpm", 0)),
+                int(data.get("breathCount", 0)),
+                str(data.get("status", "")),
+                timestamp,
+            )
+        except (ValueError, TypeError):
+            self.malformed += 1
+            return None
+
+        self.frames += 1
+        return frame
+
+    def _emit_log(self, buf, start, end):
+        """Enviar una línea de texto del firmware al canal de registro"""
+        text = bytes(buf[start:end]).decode("utf-8", errors="replace")
+        self.logs += 1
+        self.log_lines.append(text)
+        if self.on_log is not None:
+            self.on_log(text)
@@ -0,0 +1,326 @@
+import os
+import selectors
+import threading
+import time
+from collections import deque
+
+import serial
+import serial.tools.list_ports
+
+from respira_buffers import HistoryBuffer
+from respira_decoder import FRAME_CHANNELS
+from respira_protocol import AutoDecoder
+from respira_sources import ReadStats
+from respira_spectral import SpectralRPM
+
+# Historial por dispositivo: 10 minutos a 20 Hz (memoria fija)
+DEVICE_HISTORY_CAPACITY = 20 * 60 * 10
+
+# En Windows los puertos COM no admiten select(): se sondean en el mismo hilo
+USE_SELECT = os.name != "nt"
+POLL_INTERVAL = 0.005
+
+# Periodo de la enumeración de puertos en segundo plano (s)
+PORT_SCAN_INTERVAL = 2.0
+
+
+class Device:
+    """Un sensor Respira: puerto, decodificador e históricos propios"""
+
+    def __init__(self, port, baudrate=115200, history_capacity=DEVICE_HISTORY_CAPACITY):
+        self.port = port
+        self.baudrate = baudrate
+        self.serial_conn = None
+        self.decoder = AutoDecoder()
+        self.history = HistoryBuffer(history_capacity, FRAME_CHANNELS)
+        # RPM espectral (spectral.estimate() cuando se necesite mostrarla)
+        self.spectral = SpectralRPM()
+        self.last_frame = None
+        self.last_error = None
+
+        # Contadores
+        self.stats = ReadStats()
+        self.errors = 0
+
+    @property
+    def is_connected(self):
+        return self.serial_conn is not None and self.serial_conn.is_open
+
+    def attach(self, conn):
+        """Usar una conexión ya abierta (no bloqueante)"""
+        self.serial_conn = conn
+        self.decoder.reset()
+        self.spectral.reset()
+        self.last_error = None
+
+    def close(self):
+        if self.serial_conn is not None:
+            try:
+                self.serial_conn.close()
+            except (OSError, serial.SerialException):
+                pass
+        self.serial_conn = None
+
+    def read_available(self):
+        """Leer todo lo pendiente y devolver las tramas completas"""
+        conn = self.serial_conn
+        backlog = conn.in_waiting
+        data = conn.read(backlog or 1)
+        self.stats.record_read(len(data), backlog, calls=2)
+        if not data:
+            return []
+        frames = self.decoder.feed(data, time.time())
+        self.stats.frames += len(frames)
+        for frame in frames:
+            self.history.append(*frame.as_row())
+            self.spectral.update(frame.filtered, frame.timestamp)
+        if frames:
+            self.last_frame = frames[-1]
+        return frames
+
+
+class DeviceManager:
+    """Multiplexa la lectura de N puertos seriales en un solo hilo.
+
+    En POSIX espera con ``selectors`` sobre los descriptores de los puertos
+    (sin dormir entre lecturas); un fallo del puerto desconecta a ese
+    dispositivo solo y se notifica con ``on_error``, igual que un error al
+    procesar sus tramas (que no lo desconecta). ``on_frames(device, frames)`` se
+    invoca desde el hilo del gestor con cada lote de tramas decodificadas.
+    Con ``alerts`` (un ``AlertEngine``) cada trama se evalúa además con las
+    reglas del paciente de ese puerto; los eventos llegan por su ``on_event``.
+    Con ``hub`` (un ``TelemetryHub``) las tramas de cada puerto se reparten
+    a los suscriptores locales.
+    """
+
+    def __init__(self, on_frames=None, on_error=None, opener=serial.Serial,
+                 history_capacity=DEVICE_HISTORY_CAPACITY, alerts=None, hub=None):
+        self.on_frames = on_frames
+        self.on_error = on_error
+        self.alerts = alerts
+        self.hub = hub
+        self.opener = opener
+        self.history_capacity = history_capacity
+        self.devices = {}
+
+        self._lock = threading.Lock()
+        self._pending = deque()   # Órdenes para el hilo del gestor
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._selector = selectors.DefaultSelector() if USE_SELECT else None
+        if self._selector is not None:
+            # Tubería para despertar al select() cuando llegan órdenes
+            self._wake_r, self._wake_w = os.pipe()
+            os.set_blocking(self._wake_r, False)
+            self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+
+    # -- API pública (segura desde cualquier hilo) --
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="respira-devices", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self._stop_event.set()
+        self._wake()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        for device in list(self.devices.values()):
+            self._close_device(device)
+        if self._selector is not None:
+            self._selector.close()
+            os.close(self._wake_r)
+            os.close(self._wake_w)
+            self._selector = None
+
+    def connect(self, port, baudrate=115200):
+        """Abrir un puerto (o reabrirlo) y empezar a leerlo"""
+        with self._lock:
+            device = self.devices.get(port)
+            if device is None:
+                device = Device(port, baudrate, self.history_capacity)
+                self.devices[port] = device
+        # Abrir aquí para que el llamador reciba el error de conexión
+        conn = self.opener(port, baudrate, timeout=0)
+        self._pending.append(("add", device, conn))
+        self._wake()
+        return device
+
+    def disconnect(self, port):
+        """Cerrar un puerto sin afectar a los demás"""
+        device = self.devices.get(port)
+        if device is not None:
+            self._pending.append(("remove", device, None))
+            self._wake()
+
+    def remove(self, port):
+        """Desconectar y olvidar un dispositivo"""
+        self.disconnect(port)
+        with self._lock:
+            self.devices.pop(port, None)
+
+    def snapshot(self):
+        """Copia de ``devices`` (segura desde cualquier hilo)"""
+        with self._lock:
+            return dict(self.devices)
+
+    def stats(self):
+        """Contadores por dispositivo"""
+        return {
+            port: {
+                "connected": device.is_connected,
+                "bytes": device.stats.bytes,
+                "reads": device.stats.reads,
+                "max_backlog": device.stats.max_backlog,
+                "frames": device.decoder.frames,
+                "malformed": device.decoder.malformed,
+                "lost": device.decoder.lost,
+                "protocol": device.decoder.protocol,
+                "errors": device.errors,
+                "last_error": device.last_error,
+            }
+            for port, device in list(self.devices.items())
+        }
+
+    # -- Hilo del gestor --
+
+    def _wake(self):
+        if self._selector is not None:
+            try:
+                os.write(self._wake_w, b"\0")
+            except OSError:
+                pass
+
+    def _apply_pending(self, polled):
+        while self._pending:
+            action, device, conn = self._pending.popleft()
+            # Una reconexión reemplaza la conexión anterior
+            self._close_device(device)
+            polled.discard(device)
+            if action == "add":
+                device.attach(conn)
+                if self._selector is not None:
+                    self._selector.register(conn.fileno(), selectors.EVENT_READ, device)
+                else:
+                    polled.add(device)
+
+    def _close_device(self, device):
+        if self._selector is not None:
+            for key in list(self._selector.get_map().values()):
+                if key.data is device:
+                    self._selector.unregister(key.fileobj)
+        device.close()
+
+    def _read_device(self, device):
+        """Leer un dispositivo aislando sus errores"""
+        if not device.is_connected:
+            return
+        try:
+            frames = device.read_available()
+        except (OSError, serial.SerialException) as e:
+            # El puerto falló: cerrar solo este dispositivo
+            self._close_device(device)
+            self._report(device, e)
+            return
+        except Exception as e:
+            self._report(device, e)
+            return
+        if not frames:
+            return
+        # Un error en las alertas, el hub o on_frames no detiene a los demás
+        try:
+            if self.alerts is not None:
+                update = self.alerts.update
+                for frame in frames:
+                    update(device.port, frame)
+            if self.hub is not None:
+                self.hub.publish(device.port, frames)
+            if self.on_frames is not None:
+                self.on_frames(device, frames)
+        except Exception as e:
+            self._report(device, e)
+
+    def _report(self, device, error):
+        device.errors += 1
+        device.last_error = str(error)
+        if self.on_error is not None:
+            self.on_error(device, error)
+
+    def _run(self):
+        polled = set()
+        while not self._stop_event.is_set():
+            try:
+                self._apply_pending(polled)
+
+                if self._selector is not None:
+                    for key, _ in self._selector.select(timeout=1.0):
+                        if key.data is None:
+                            # Despertador: vaciar la tubería
+                            try:
+                                os.read(self._wake_r, 4096)
+                            except BlockingIOError:
+                                pass
+                            continue
+                        self._read_device(key.data)
+                else:
+                    for device in list(polled):
+                        if device.is_connected:
+                            self._read_device(device)
+                    time.sleep(POLL_INTERVAL)
+            except Exception as e:
+                # Ningún error (ni de on_error) detiene la lectura de los demás
+                print(f"Error en el gestor de dispositivos: {e}")
+                time.sleep(0.1)
+
+
+class PortScanner:
+    """Enumeración periódica de puertos seriales en un hilo propio.
+
+    ``comports()`` puede tardar con muchos puertos USB/Bluetooth, así que no
+    se llama desde la interfaz. ``on_change(puertos)`` recibe la tupla de
+    nombres la primera vez y cada vez que cambia (conexión en caliente), desde
+    el hilo del escáner; ``rescan()`` pide una enumeración inmediata.
+    """
+
+    def __init__(self, on_change, interval=PORT_SCAN_INTERVAL, lister=serial.tools.list_ports.comports):
+        self.on_change = on_change
+        self.interval = interval
+        self.lister = lister
+        self.ports = None
+        self.scans = 0
+        self.last_scan_ms = 0.0
+        self._rescan = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="respira-ports", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        self._rescan.set()
+
+    def rescan(self):
+        self._rescan.set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            start = time.perf_counter()
+            try:
+                ports = tuple(sorted(port.device for port in self.lister()))
+            except Exception as e:
+                print(f"Error enumerando puertos: {e}")
+                ports = self.ports
+            self.scans += 1
+            self.last_scan_ms = (time.perf_counter() - start) * 1000
+            if ports is not None and ports != self.ports:
+                self.ports = ports
+                self.on_change(ports)
+            self._rescan.wait(self.interval)
+            self._rescan.clear()
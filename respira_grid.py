@@ -0,0 +1,446 @@
+"""Vista de cuadrícula para muchos pacientes en un solo lienzo.
+
+Cada paciente es un mosaico con su nombre, la RPM actual, el estado (color
+de fondo) y una línea con los últimos segundos de la señal filtrada. Todo se
+dibuja en un único ``tk.Canvas`` con un único temporizador, moviendo ítems
+ya creados (``coords``/``itemconfigure``) en lugar de redibujar:
+
+- solo se actualizan los mosaicos cuyos datos cambiaron desde el último cuadro;
+- cada cuadro tiene un presupuesto de tiempo (``budget_ms``); los mosaicos
+  que no alcanzan quedan pendientes y el siguiente cuadro empieza por ellos;
+- si los cuadros se pasan del presupuesto, el intervalo de refresco crece
+  (hasta ``GRID_MAX_REFRESH_MS``) y vuelve a bajar cuando sobra tiempo.
+
+Los datos llegan de un hub local, de un ``DeviceManager`` o del simulador:
+
+    python respira_grid.py --hub
+    python respira_grid.py --ports COM3 COM4 COM5
+    python respira_grid.py --simulate 32
+"""
+import argparse
+import random
+import threading
+import time
+import tkinter as tk
+
+import numpy as np
+
+from respira_buffers import HistoryBuffer
+from respira_decoder import FRAME_CHANNELS
+from respira_devices import DeviceManager
+from respira_hub import DEFAULT_ADDRESS, KIND_EVENT, KIND_FRAMES, HubClient, rows_to_frames
+from respira_protocol import AutoDecoder
+from respira_render import decimate_minmax
+from respira_sources import SyntheticSource
+
+GRID_REFRESH_MS = 100
+GRID_MAX_REFRESH_MS = 1000
+FRAME_BUDGET_MS = 12.0
+
+# Historial por paciente en la cuadrícula: 2 minutos a 20 Hz
+STREAM_CAPACITY = 20 * 60 * 2
+SPARKLINE_POINTS = 300    # ~15 s a 20 Hz
+
+# Sin tramas durante este tiempo, el mosaico se muestra como desconectado
+STALE_SECONDS = 5.0
+
+TILE_MIN_WIDTH = 180
+TILE_HEIGHT = 110
+TILE_PAD = 4
+
+TILE_COLORS = {
+    "NORMAL": "#8FD694",
+    "ALTO": "#FF7E6B",
+    "BAJO": "#FF7E6B",
+    "ESPERANDO": "#D8E1E9",
+}
+STALE_COLOR = "#B0B7BF"
+ALERT_OUTLINE = "#C0392B"
+TEXT_COLOR = "#003459"
+BACKGROUND = "#E8F4F8"
+
+
+class PatientStream:
+    """Historial reciente de un paciente para la cuadrícula"""
+
+    def __init__(self, name, capacity=STREAM_CAPACITY):
+        self.name = name
+        self.history = HistoryBuffer(capacity, FRAME_CHANNELS)
+        self.last_frame = None
+        # Inmutable: el hilo de la fuente la reemplaza y Tk la lee sin lock
+        self.alerts = frozenset()
+
+    def add(self, frames):
+        for frame in frames:
+            self.history.append(*frame.as_row())
+        if frames:
+            self.last_frame = frames[-1]
+
+
+class HubFeed:
+    """Suscripción a todos los dispositivos de un hub local, en un hilo"""
+
+    def __init__(self, address=DEFAULT_ADDRESS):
+        self.client = HubClient(address)
+        self.streams = {}
+        self.error = None
+        self._lock = threading.Lock()   # Protege ``streams`` (se agregan pacientes)
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.client.connect()
+        self._thread = threading.Thread(target=self._run, name="respira-grid-hub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(1.0)
+        self.client.close()
+
+    def snapshot(self):
+        """Copia de ``streams`` para leer desde otro hilo"""
+        with self._lock:
+            return dict(self.streams)
+
+    def _stream(self, name):
+        stream = self.streams.get(name)
+        if stream is None:
+            with self._lock:
+                stream = self.streams[name] = PatientStream(name)
+        return stream
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                messages = self.client.receive(0.5)
+            except (ConnectionError, OSError) as e:
+                self.error = str(e)
+                return
+            for kind, device, value in messages:
+                if kind == KIND_FRAMES:
+                    self._stream(device).add(rows_to_frames(value))
+                elif kind == KIND_EVENT and "kind" in value:
+                    stream = self._stream(device)
+                    if value.get("active"):
+                        stream.alerts = stream.alerts | {value["kind"]}
+                    else:
+                        stream.alerts = stream.alerts - {value["kind"]}
+
+
+class SimulatedFeed:
+    """N pacientes simulados con RPM distintas (demostración y pruebas de carga)"""
+
+    def __init__(self, count, rate_hz=20, seed=0):
+        rng = random.Random(seed)
+        self.streams = {}
+        self._sources = []
+        for index in range(count):
+            name = f"Sim {index + 1:02d}"
+            rpm = rng.choice((6, 10, 14, 16, 18, 22, 30))
+            source = SyntheticSource(rpm=rpm, rate_hz=rate_hz, seed=seed + index, binary=True)
+            self.streams[name] = PatientStream(name)
+            self._sources.append((self.streams[name], source, AutoDecoder()))
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def snapshot(self):
+        # Los pacientes se crean todos al inicio: el diccionario no cambia
+        return dict(self.streams)
+
+    def start(self):
+        for _, source, _ in self._sources:
+            source.open()
+        self._thread = threading.Thread(target=self._run, name="respira-grid-sim", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(1.0)
+
+    def _run(self):
+        while not self._stop_event.wait(0.02):
+            for stream, source, decoder in self._sources:
+                for timestamp, data in source.read_timed(0):
+                    stream.add(decoder.feed(data, timestamp))
+
+
+class DeviceFeed:
+    """Dispositivos de un ``DeviceManager`` (cada ``Device`` ya guarda su historial)"""
+
+    def __init__(self, ports, baudrate=115200):
+        self.manager = DeviceManager()
+        self.ports = ports
+        self.baudrate = baudrate
+
+    @property
+    def streams(self):
+        return self.manager.devices
+
+    def snapshot(self):
+        return self.manager.snapshot()
+
+    def start(self):
+        for port in self.ports:
+            self.manager.connect(port, self.baudrate)
+        self.manager.start()
+        return self
+
+    def stop(self):
+        self.manager.stop()
+
+
+class _Tile:
+    __slots__ = ("name", "box", "background", "title", "rpm", "status", "line",
+                 "drawn_total", "stale", "fill", "outline", "rpm_text", "status_text")
+
+    def __init__(self, name):
+        self.name = name
+        self.drawn_total = -1
+        self.stale = None
+        self.fill = self.outline = self.rpm_text = self.status_text = None
+
+
+class GridDashboard:
+    """Cuadrícula de pacientes en un único ``tk.Canvas`` con un único temporizador.
+
+    ``streams`` es un diccionario (o una fuente con ``snapshot()``) de nombre
+    a objeto con ``history`` (``HistoryBuffer``) y ``last_frame``; se vuelve a
+    leer en cada cuadro, así que los pacientes nuevos aparecen solos. Las
+    fuentes agregan pacientes desde su propio hilo, así que cada cuadro
+    trabaja sobre una copia tomada con su lock.
+    """
+
+    def __init__(self, parent, streams, columns=None, interval_ms=GRID_REFRESH_MS,
+                 budget_ms=FRAME_BUDGET_MS):
+        self.parent = parent
+        self.streams = streams
+        self.columns = columns
+        self.base_interval = interval_ms
+        self.interval = interval_ms
+        self.budget = budget_ms / 1000.0
+
+        self.canvas = tk.Canvas(parent, bg=BACKGROUND, highlightthickness=0)
+        self.canvas.pack(fill=tk.BOTH, expand=True)
+        self.info_var = tk.StringVar(value="")
+        tk.Label(parent, textvariable=self.info_var, bg=BACKGROUND, fg=TEXT_COLOR,
+                 anchor=tk.W).pack(fill=tk.X)
+        self.canvas.bind("<Configure>", lambda event: self.relayout())
+        self.canvas.bind("<MouseWheel>",
+                         lambda event: self.canvas.yview_scroll(-1 if event.delta > 0 else 1, "units"))
+        # En X11 la rueda llega como botones 4 y 5
+        self.canvas.bind("<Button-4>", lambda event: self.canvas.yview_scroll(-1, "units"))
+        self.canvas.bind("<Button-5>", lambda event: self.canvas.yview_scroll(1, "units"))
+
+        self.tiles = {}
+        self._order = []
+        self._cursor = 0
+        self._layout_size = None
+        self._after_id = None
+
+        # Contadores
+        self.frames = 0
+        self.tiles_drawn = 0
+        self.overruns = 0
+        self.deferred = 0
+        self.last_frame_ms = 0.0
+
+    def _streams(self):
+        streams = self.streams
+        return dict(streams) if isinstance(streams, dict) else streams.snapshot()
+
+    def start(self):
+        if self._after_id is None:
+            self._after_id = self.parent.after(self.interval, self._tick)
+
+    def stop(self):
+        if self._after_id is not None:
+            self.parent.after_cancel(self._after_id)
+            self._after_id = None
+
+    def relayout(self):
+        """Recalcular la posición de los mosaicos (tamaño o cantidad de pacientes)"""
+        width = max(self.canvas.winfo_width(), TILE_MIN_WIDTH)
+        count = len(self._order)
+        columns = self.columns or max(1, width // TILE_MIN_WIDTH)
+        tile_width = width / columns
+        for index, name in enumerate(self._order):
+            tile = self.tiles[name]
+            row, column = divmod(index, columns)
+            x0 = column * tile_width + TILE_PAD
+            y0 = row * TILE_HEIGHT + TILE_PAD
+            x1 = (column + 1) * tile_width - TILE_PAD
+            y1 = (row + 1) * TILE_HEIGHT - TILE_PAD
+            tile.box = (x0, y0, x1, y1)
+            self.canvas.coords(tile.background, x0, y0, x1, y1)
+            self.canvas.coords(tile.title, x0 + 6, y0 + 4)
+            self.canvas.coords(tile.rpm, x1 - 6, y0 + 2)
+            self.canvas.coords(tile.status, x0 + 6, y0 + 24)
+            tile.drawn_total = -1   # Redibujar la línea con la nueva geometría
+        rows = -(-count // columns) if count else 0
+        self.canvas.configure(scrollregion=(0, 0, width, rows * TILE_HEIGHT))
+        self._layout_size = (width, count)
+
+    def _add_tile(self, name):
+        canvas = self.canvas
+        tile = _Tile(name)
+        tile.background = canvas.create_rectangle(0, 0, 0, 0, fill=TILE_COLORS["ESPERANDO"],
+                                                  outline="", width=3)
+        tile.title = canvas.create_text(0, 0, text=name, anchor=tk.NW, fill=TEXT_COLOR,
+                                        font=("Segoe UI", 10, "bold"))
+        tile.rpm = canvas.create_text(0, 0, text="--", anchor=tk.NE, fill=TEXT_COLOR,
+                                      font=("Segoe UI", 22, "bold"))
+        tile.status = canvas.create_text(0, 0, text="", anchor=tk.NW, fill=TEXT_COLOR,
+                                         font=("Segoe UI", 9))
+        tile.line = canvas.create_line(0, 0, 0, 0, fill=TEXT_COLOR, width=1)
+        self.tiles[name] = tile
+        self._order.append(name)
+
+    def _tick(self):
+        start = time.perf_counter()
+        try:
+            self.draw_frame(start)
+        except Exception as e:
+            print(f"Error actualizando la cuadrícula: {e}")
+        elapsed = time.perf_counter() - start
+        self.last_frame_ms = elapsed * 1000
+
+        # Degradar el refresco si no alcanza el presupuesto; recuperarlo si sobra
+        if elapsed > self.budget:
+            self.overruns += 1
+            self.interval = min(GRID_MAX_REFRESH_MS, int(self.interval * 1.5))
+        elif elapsed < self.budget / 2 and self.interval > self.base_interval:
+            self.interval = max(self.base_interval, int(self.interval * 0.8))
+        self._after_id = self.parent.after(self.interval, self._tick)
+
+    def draw_frame(self, start=None):
+        """Actualizar los mosaicos con datos nuevos dentro del presupuesto"""
+        start = time.perf_counter() if start is None else start
+        streams = self._streams()
+        for name in list(streams):
+            if name not in self.tiles:
+                self._add_tile(name)
+        if self._layout_size != (max(self.canvas.winfo_width(), TILE_MIN_WIDTH), len(self._order)):
+            self.relayout()
+
+        now = time.time()
+        order = self._order
+        count = len(order)
+        drawn = 0
+        for step in range(count):
+            index = (self._cursor + step) % count
+            tile = self.tiles[order[index]]
+            stream = streams.get(tile.name)
+            if stream is None:
+                continue
+            frame = stream.last_frame
+            stale = frame is None or now - frame.timestamp > STALE_SECONDS
+            if stream.history.total == tile.drawn_total and stale == tile.stale:
+                continue
+            if drawn and time.perf_counter() - start > self.budget:
+                # Sin tiempo: el próximo cuadro empieza por este mosaico
+                self._cursor = index
+                self.deferred += 1
+                break
+            self._draw_tile(tile, stream, stale)
+            drawn += 1
+        else:
+            self._cursor = 0
+
+        self.frames += 1
+        self.tiles_drawn += drawn
+        self.info_var.set(f"{count} pacientes · {drawn} mosaicos · {self.last_frame_ms:.1f} ms/cuadro"
+                          f" · cada {self.interval} ms")
+
+    def _draw_tile(self, tile, stream, stale):
+        canvas = self.canvas
+        frame = stream.last_frame
+        tile.drawn_total = stream.history.total
+        tile.stale = stale
+
+        if stale:
+            fill, rpm_text, status_text = STALE_COLOR, "--", "Sin datos"
+        else:
+            fill = TILE_COLORS.get(frame.status, TILE_COLORS["ESPERANDO"])
+            rpm_text = str(frame.rpm) if frame.rpm > 0 else "--"
+            status_text = frame.status
+        alerts = getattr(stream, "alerts", None)
+        if alerts:
+            status_text = f"{status_text} · {', '.join(sorted(alerts))}"
+        outline = ALERT_OUTLINE if alerts else ""
+
+        # Cambiar solo lo que cambió (cada itemconfigure es una llamada a Tcl)
+        if fill != tile.fill or outline != tile.outline:
+            canvas.itemconfigure(tile.background, fill=fill, outline=outline)
+            tile.fill, tile.outline = fill, outline
+        if rpm_text != tile.rpm_text:
+            canvas.itemconfigure(tile.rpm, text=rpm_text)
+            tile.rpm_text = rpm_text
+        if status_text != tile.status_text:
+            canvas.itemconfigure(tile.status, text=status_text)
+            tile.status_text = status_text
+
+        # Línea de la señal: mín/máx por cada 2 píxeles, escalada al mosaico
+        values = stream.history["filtered"].view(SPARKLINE_POINTS)
+        x0, y0, x1, y1 = tile.box
+        top, bottom = y0 + 44, y1 - 6
+        if len(values) < 2:
+            canvas.coords(tile.line, x0, bottom, x0, bottom)
+            return
+        xs, ys = decimate_minmax(np.arange(len(values)), values, max(1, int(x1 - x0) // 2))
+        lo, hi = float(ys.min()), float(ys.max())
+        scale_y = (bottom - top) / (hi - lo) if hi > lo else 0.0
+        points = np.empty(2 * len(xs))
+        points[0::2] = x0 + 4 + xs * ((x1 - x0 - 8) / max(1, SPARKLINE_POINTS - 1))
+        points[1::2] = bottom - (ys - lo) * scale_y
+        canvas.coords(tile.line, points.tolist())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cuadrícula de pacientes")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--hub", nargs="?", const=DEFAULT_ADDRESS, metavar="DIRECCIÓN",
+                       help="Suscribirse a todos los dispositivos de un hub local")
+    group.add_argument("--ports", nargs="+", metavar="PUERTO", help="Abrir estos puertos seriales")
+    group.add_argument("--simulate", type=int, metavar="N", help="N pacientes simulados")
+    parser.add_argument("--columns", type=int, default=None, help="Columnas (por defecto según el ancho)")
+    parser.add_argument("--interval", type=int, default=GRID_REFRESH_MS, help="Refresco deseado (ms)")
+    parser.add_argument("--budget-ms", type=float, default=FRAME_BUDGET_MS,
+                        help="Tiempo máximo de dibujo por cuadro (ms)")
+    args = parser.parse_args(argv)
+
+    if args.hub:
+        feed = HubFeed(args.hub)
+    elif args.ports:
+        feed = DeviceFeed(args.ports)
+    else:
+        feed = SimulatedFeed(args.simulate)
+    try:
+        feed.start()
+    except OSError as e:
+        print(f"No se pudo iniciar la fuente de datos: {e}")
+        return 1
+
+    root = tk.Tk()
+    root.title("Monitor de Respiración - Pacientes")
+    root.geometry("1200x800")
+    dashboard = GridDashboard(root, feed, columns=args.columns, interval_ms=args.interval,
+                              budget_ms=args.budget_ms)
+    dashboard.start()
+
+    def on_closing():
+        dashboard.stop()
+        feed.stop()
+        root.destroy()
+
+    root.protocol("WM_DELETE_WINDOW", on_closing)
+    root.mainloop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,17 +1,30 @@
+import time
+
+# Referencia de los tiempos de arranque (--startup-timing)
+_START = time.perf_counter()
+
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
+from tkinter import ttk, messagebox, simpledialog, filedialog
 import serial
-import serial.tools.list_ports
-import json
 import threading
-import time
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
-import matplotlib.animation as animation
 import numpy as np
 from datetime import datetime
 import os
+import sqlite3
+import sys
+import argparse
+
+from respira_archive import SessionArchive
+from respira_buffers import TREND_CAPACITY
+from respira_core import SIGNAL_HISTORY_CAPACITY, MonitorCore
+from respira_devices import PortScanner
+from respira_grid import GridDashboard, HubFeed
+from respira_hub import DEFAULT_ADDRESS, HubSource, TelemetryHub
+from respira_metrics import DEFAULT_PORT, MetricsServer
+from respira_recorder import SESSION_DIR, SessionReader
+from respira_render import BlitRenderer
+from respira_sources import MAX_SPEED, ReplaySource, SerialSource, SyntheticSource
+from respira_viewmodel import ViewModel
 
 # Colores de tema calmante
 COLORS = {
@@ -24,8 +37,71 @@ COLORS = {
     "neutral": "#D8E1E9"     # Gris neutro
 }
 
+# Ventanas del gráfico de la señal (segundos); las largas se diezman por píxel
+SIGNAL_SPANS = {"10 s": 10, "30 s": 30, "2 min": 120, "10 min": 600, "1 h": 3600}
+SIGNAL_WINDOW_S = 30
+
+# Ventanas del gráfico de tendencia de RPM (segundos)
+RPM_SPANS = {"1 min": 60, "10 min": 600, "1 h": 3600, "4 h": 4 * 3600, "12 h": 12 * 3600}
+RPM_MIN_SPAN = 30
+RPM_MAX_SPAN = 24 * 3600
+
+# Intervalos de refresco de los gráficos (ms)
+RESP_REFRESH_MS = 50
+RPM_REFRESH_MS = 1000
+
+# Refresco de la ventana de diagnóstico (ms)
+DIAGNOSTICS_REFRESH_MS = 1000
+
+# Fuentes de datos sin hardware que se ofrecen junto a los puertos
+SIMULATOR_ENTRY = "Simulador"
+REPLAY_ENTRY = "Reproducir sesión..."
+HUB_ENTRY = "Hub local..."
+
+
+def _plotting():
+    """Importar matplotlib al conectar por primera vez (es lo más lento del arranque)"""
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+    from matplotlib.figure import Figure
+    return Figure, FigureCanvasTkAgg
+
+
+class StartupTimer:
+    """Tiempos de arranque desde que empezó a cargarse este módulo.
+
+    ``mark()`` guarda solo la primera vez de cada hito; con ``verbose``
+    (``--startup-timing``) además lo imprime.
+    """
+
+    def __init__(self, start):
+        self.start = start
+        self.marks = {}
+        self.verbose = False
+        self.until = None      # Hito que termina la medición (llama a on_done)
+        self.on_done = None
+
+    def mark(self, name):
+        if name in self.marks:
+            return
+        self.marks[name] = (time.perf_counter() - self.start) * 1000
+        if self.verbose:
+            print(f"{name}: {self.marks[name]:.0f} ms", flush=True)
+        if name == self.until and self.on_done is not None:
+            self.on_done()
+
+    def enable(self):
+        """Imprimir los hitos ya alcanzados y los siguientes"""
+        self.verbose = True
+        for name, ms in self.marks.items():
+            print(f"{name}: {ms:.0f} ms", flush=True)
+
+
+STARTUP = StartupTimer(_START)
+STARTUP.mark("importaciones")
+
 class RespiraMonitorApp:
-    def __init__(self, root):
+    def __init__(self, root, history_capacity=SIGNAL_HISTORY_CAPACITY,
+                 trend_capacity=TREND_CAPACITY, signal_window=SIGNAL_WINDOW_S):
         self.root = root
         self.root.title("Monitor de Respiración - Respira")
         self.root.geometry("900x700")
@@ -34,36 +110,70 @@ class RespiraMonitorApp:
         
         # Configuración predeterminada
         self.com_port = None
-        self.serial_conn = None
         self.is_connected = False
-        self.data_buffer = []
-        self.breath_data = []
-        self.rpm_history = []
-        self.timestamps = []
-        self.stop_event = threading.Event()
+        
+        # Los hilos de fondo publican aquí; solo el hilo de Tk toca los widgets
+        self.view = ViewModel(self.root)
+        
+        # Lectura, históricos, grabación y detección (sin dependencias de la GUI);
+        # cada sesión grabada se agrega al índice al desconectar
+        self.core = MonitorCore(publish=self.view.publish, history_capacity=history_capacity,
+                                trend_capacity=trend_capacity, archive=self.open_archive())
+        self.history = self.core.history
+        self.rpm_trend = self.core.rpm_trend
+        
+        # Métricas (se activan con la ventana de diagnóstico o --metrics-port)
+        self.metrics = None
+        self.metrics_server = None
+        self.render_overruns = 0
+        self.diagnostics = None
         
         # Valores de referencia
         self.ALERT_LOW = 12
         self.ALERT_HIGH = 25
         
         # Variables para gráficos
-        self.data_points = 100  # Puntos a mostrar en las gráficas
-        self.acceleration_history = [0] * self.data_points
-        self.delta_history = [0] * self.data_points
-        self.filtered_history = [0] * self.data_points
-        self.threshold_history = [0] * self.data_points
+        self.signal_window = signal_window   # Segundos visibles de la señal
+        self.rpm_span = 60      # Segundos visibles en la tendencia de RPM
+        self.rpm_view_end = None  # Fin de la ventana (None = en vivo)
+        self._pan_anchor = None
         
         # Inicializar variables Tkinter
         self.status_var = tk.StringVar(value="Desconectado")
         self.rpm_var = tk.StringVar(value="--")
         self.breath_count_var = tk.StringVar(value="0")
         self.state_var = tk.StringVar(value="ESPERANDO")
+        self.render_var = tk.StringVar(value="")
+        self.link_var = tk.StringVar(value="")
+        self.alerts_var = tk.StringVar(value="")
+        self.spectral_var = tk.StringVar(value="Espectral: --")
+        self.active_alerts = ()
+        self._port_chosen = False
+        self.auto_connect = None   # Entrada a conectar al abrir (--connect)
+        self.exports = 0           # Exportaciones lanzadas (identifica cada resultado)
         
         # Crear la interfaz
         self.create_widgets()
         
-        # Cargar puertos disponibles
-        self.load_ports()
+        self.view.bind("rpm", lambda rpm: self.rpm_var.set(str(rpm) if rpm > 0 else "--"))
+        self.view.bind("breath_count", lambda count: self.breath_count_var.set(str(count)))
+        self.view.bind("status", self.apply_status)
+        self.view.bind("message", self.status_var.set)
+        self.view.bind("link", self.link_var.set)
+        self.view.bind("alerts", self.apply_alerts)
+        self.view.bind("spectral", lambda estimate: self.spectral_var.set(f"Espectral: {estimate.format()}"))
+        self.view.bind("ports", self.apply_ports)
+        self.view.bind("export", self.apply_export)
+        self.view.bind("finished", self.apply_finished)
+        self.view.bind("recording_error",
+                       lambda failure: messagebox.showerror("Error", f"La grabación se detuvo: {failure[1]}"))
+        self.view.start()
+        
+        # Enumerar puertos en segundo plano (y volver a hacerlo por si se conecta uno)
+        self.port_scanner = PortScanner(lambda ports: self.view.publish(ports=ports)).start()
+        
+        STARTUP.mark("ventana creada")
+        self.root.bind("<Expose>", self.on_first_paint)
 
     def create_widgets(self):
         # Frame principal
@@ -101,7 +211,11 @@ class RespiraMonitorApp:
         control_frame = ttk.Frame(top_frame)
         control_frame.pack(side=tk.RIGHT)
         
-        self.port_combo = ttk.Combobox(control_frame, width=15)
+        # Las fuentes sin hardware están disponibles antes de enumerar los puertos
+        self.port_combo = ttk.Combobox(control_frame, width=15,
+                                       values=[SIMULATOR_ENTRY, REPLAY_ENTRY, HUB_ENTRY])
+        self.port_combo.current(0)
+        self.port_combo.bind("<<ComboboxSelected>>", lambda event: setattr(self, "_port_chosen", True))
         self.port_combo.pack(side=tk.LEFT, padx=5)
         
         refresh_btn = ttk.Button(control_frame, text="↻", width=2, command=self.load_ports)
@@ -125,6 +239,9 @@ class RespiraMonitorApp:
         
         ttk.Label(rpm_frame, text="respiraciones/min", style="TLabel").pack()
         
+        # Estimación espectral del host (aparece antes que la del firmware)
+        ttk.Label(rpm_frame, textvariable=self.spectral_var, style="TLabel").pack(pady=(5, 0))
+        
         # Panel de estado
         status_frame = ttk.Frame(info_frame)
         status_frame.pack(side=tk.LEFT, padx=20, fill=tk.Y)
@@ -137,6 +254,11 @@ class RespiraMonitorApp:
         self.status_label = ttk.Label(status_frame, textvariable=self.status_var, style="TLabel")
         self.status_label.pack(pady=(5, 0))
         
+        # Alertas activas del host (sostenidas, apnea, cambios bruscos)
+        self.alerts_label = ttk.Label(status_frame, textvariable=self.alerts_var,
+                                      foreground=COLORS["warning"], style="TLabel")
+        self.alerts_label.pack(pady=(5, 0))
+        
         # Acumulado de respiraciones
         breath_frame = ttk.Frame(info_frame)
         breath_frame.pack(side=tk.LEFT, padx=20, fill=tk.Y)
@@ -146,15 +268,12 @@ class RespiraMonitorApp:
         self.breath_count_label = ttk.Label(breath_frame, textvariable=self.breath_count_var, style="Value.TLabel")
         self.breath_count_label.pack()
         
-        # Contenedor para los gráficos
-        graph_container = ttk.Frame(main_frame)
-        graph_container.pack(fill=tk.BOTH, expand=True, pady=10)
-        
-        # Gráfico de señal de respiración
-        self.create_respiration_graph(graph_container)
-        
-        # Gráfico histórico de RPM
-        self.create_rpm_history_graph(graph_container)
+        # Contenedor para los gráficos (se crean al conectar por primera vez)
+        self.graph_container = ttk.Frame(main_frame)
+        self.graph_container.pack(fill=tk.BOTH, expand=True, pady=10)
+        self.graph_placeholder = ttk.Label(self.graph_container, style="Subtitle.TLabel",
+                                           text="Los gráficos aparecen al conectar un dispositivo")
+        self.graph_placeholder.pack(expand=True)
         
         # Panel inferior con información y acciones
         bottom_frame = ttk.Frame(main_frame)
@@ -166,6 +285,14 @@ class RespiraMonitorApp:
                               style="TLabel")
         info_label.pack(side=tk.LEFT)
         
+        # Rendimiento del gráfico en tiempo real
+        render_label = ttk.Label(bottom_frame, textvariable=self.render_var, style="TLabel")
+        render_label.pack(side=tk.LEFT, padx=20)
+        
+        # Rendimiento del enlace serial
+        link_label = ttk.Label(bottom_frame, textvariable=self.link_var, style="TLabel")
+        link_label.pack(side=tk.LEFT)
+        
         # Botones adicionales
         save_btn = ttk.Button(bottom_frame, text="Guardar Datos", command=self.save_data)
         save_btn.pack(side=tk.RIGHT, padx=5)
@@ -173,11 +300,32 @@ class RespiraMonitorApp:
         help_btn = ttk.Button(bottom_frame, text="Ayuda", command=self.show_help)
         help_btn.pack(side=tk.RIGHT, padx=5)
         
+        diag_btn = ttk.Button(bottom_frame, text="Diagnóstico", command=self.show_diagnostics)
+        diag_btn.pack(side=tk.RIGHT, padx=5)
+        
+        grid_btn = ttk.Button(bottom_frame, text="Pacientes", command=self.show_patients)
+        grid_btn.pack(side=tk.RIGHT, padx=5)
+        
         # Etiqueta de estado de conexión
         self.connection_status = ttk.Label(self.root, text="Desconectado", foreground="red")
         self.connection_status.pack(anchor=tk.SE, padx=10, pady=5)
 
+    def ensure_graphs(self):
+        """Crear los gráficos (y cargar matplotlib) la primera vez que se necesitan"""
+        if hasattr(self, "resp_renderer"):
+            return
+        self.graph_placeholder.destroy()
+        
+        # Gráfico de señal de respiración
+        self.create_respiration_graph(self.graph_container)
+        
+        # Gráfico histórico de RPM
+        self.create_rpm_history_graph(self.graph_container)
+        STARTUP.mark("gráficos creados")
+
     def create_respiration_graph(self, parent):
+        Figure, FigureCanvasTkAgg = _plotting()
+        
         # Frame para gráfico de respiración
         resp_frame = ttk.LabelFrame(parent, text="Señal de Respiración en Tiempo Real")
         resp_frame.pack(fill=tk.BOTH, expand=True, side=tk.TOP)
@@ -190,18 +338,16 @@ class RespiraMonitorApp:
         self.resp_ax.set_facecolor(COLORS["bg"])
         self.resp_ax.grid(True, linestyle='--', alpha=0.7)
         self.resp_ax.set_ylabel('Aceleración')
-        self.resp_ax.set_xlabel('Tiempo')
+        self.resp_ax.set_xlabel('Tiempo (s)')
         self.resp_ax.set_title('Señal Respiratoria')
         
         # Configurar líneas para los diferentes datos
-        self.line_filtered, = self.resp_ax.plot(np.arange(self.data_points), 
-                                         self.filtered_history, 
+        self.line_filtered, = self.resp_ax.plot([], [], 
                                          label='Señal Filtrada', 
                                          color=COLORS["highlight"],
                                          linewidth=2)
         
-        self.line_threshold, = self.resp_ax.plot(np.arange(self.data_points), 
-                                          self.threshold_history, 
+        self.line_threshold, = self.resp_ax.plot([], [], 
                                           label='Umbral', 
                                           color=COLORS["warning"],
                                           linestyle='--')
@@ -209,12 +355,31 @@ class RespiraMonitorApp:
         # Añadir leyenda
         self.resp_ax.legend(loc='upper right')
         
+        # Ventana de tiempo visible
+        window_frame = ttk.Frame(resp_frame)
+        window_frame.pack(fill=tk.X)
+        ttk.Label(window_frame, text="Ventana:", style="TLabel").pack(side=tk.LEFT)
+        self.signal_combo = ttk.Combobox(window_frame, values=list(SIGNAL_SPANS), width=8, state="readonly")
+        labels = [label for label, span in SIGNAL_SPANS.items() if span == self.signal_window]
+        self.signal_combo.set(labels[0] if labels else f"{self.signal_window:g} s")
+        self.signal_combo.bind("<<ComboboxSelected>>",
+                               lambda event: self.set_signal_window(SIGNAL_SPANS[self.signal_combo.get()]))
+        self.signal_combo.pack(side=tk.LEFT, padx=5)
+        
         # Crear canvas para la figura
         self.resp_canvas = FigureCanvasTkAgg(self.resp_fig, resp_frame)
-        self.resp_canvas.draw()
         self.resp_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        
+        # Solo las líneas se redibujan; el resto de la figura queda en caché
+        self.resp_renderer = BlitRenderer(self.resp_canvas, self.resp_ax,
+                                          (self.line_filtered, self.line_threshold),
+                                          y_floor=0)
+        self.set_signal_window(self.signal_window)
+        self.resp_canvas.draw()
 
     def create_rpm_history_graph(self, parent):
+        Figure, FigureCanvasTkAgg = _plotting()
+        
         # Frame para gráfico de historia de RPM
         rpm_frame = ttk.LabelFrame(parent, text="Histórico de Respiraciones por Minuto")
         rpm_frame.pack(fill=tk.BOTH, expand=True, side=tk.TOP, pady=(10, 0))
@@ -230,13 +395,13 @@ class RespiraMonitorApp:
         self.rpm_ax.set_xlabel('Tiempo (s)')
         self.rpm_ax.set_title('Histórico de RPM')
         
-        # Configurar línea para RPM
+        # Configurar línea para RPM (media por cubeta) y su envolvente mín/máx
         self.line_rpm, = self.rpm_ax.plot([], [], 
                                     label='RPM', 
                                     color=COLORS["accent"],
-                                    marker='o',
-                                    markersize=3,
                                     linewidth=2)
+        self.line_rpm_min, = self.rpm_ax.plot([], [], color=COLORS["accent"], linewidth=1, alpha=0.4)
+        self.line_rpm_max, = self.rpm_ax.plot([], [], color=COLORS["accent"], linewidth=1, alpha=0.4)
         
         # Añadir líneas para los límites
         self.rpm_ax.axhline(y=self.ALERT_LOW, color=COLORS["warning"], linestyle='--', alpha=0.7, label=f'Mín ({self.ALERT_LOW})')
@@ -248,22 +413,65 @@ class RespiraMonitorApp:
         # Añadir leyenda
         self.rpm_ax.legend(loc='upper right')
         
+        # Controles de la ventana de tiempo
+        span_frame = ttk.Frame(rpm_frame)
+        span_frame.pack(fill=tk.X)
+        ttk.Label(span_frame, text="Ventana:", style="TLabel").pack(side=tk.LEFT)
+        self.span_combo = ttk.Combobox(span_frame, values=list(RPM_SPANS), width=8, state="readonly")
+        self.span_combo.set("1 min")
+        self.span_combo.bind("<<ComboboxSelected>>",
+                             lambda event: self.set_rpm_span(RPM_SPANS[self.span_combo.get()]))
+        self.span_combo.pack(side=tk.LEFT, padx=5)
+        ttk.Button(span_frame, text="En vivo", command=self.follow_rpm_live).pack(side=tk.LEFT)
+        ttk.Label(span_frame, text="Rueda: zoom · Arrastrar: desplazar", style="TLabel").pack(side=tk.RIGHT)
+        
         # Crear canvas para la figura
         self.rpm_canvas = FigureCanvasTkAgg(self.rpm_fig, rpm_frame)
-        self.rpm_canvas.draw()
         self.rpm_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.rpm_canvas.mpl_connect("scroll_event", self.on_rpm_scroll)
+        self.rpm_canvas.mpl_connect("button_press_event", self.on_rpm_press)
+        self.rpm_canvas.mpl_connect("motion_notify_event", self.on_rpm_drag)
+        self.rpm_canvas.mpl_connect("button_release_event", self.on_rpm_release)
+        
+        # Eje Y fijo (0-40); el eje X lo fijan la ventana y el desplazamiento
+        self.rpm_renderer = BlitRenderer(self.rpm_canvas, self.rpm_ax,
+                                         (self.line_rpm, self.line_rpm_min, self.line_rpm_max),
+                                         autoscale_y=False)
+        self.set_rpm_span(self.rpm_span)
+        self.rpm_canvas.draw()
+
+    def open_archive(self):
+        """Índice de sesiones (None si no se puede crear)"""
+        try:
+            return SessionArchive()
+        except (OSError, sqlite3.Error) as e:
+            print(f"No se pudo abrir el índice de sesiones: {e}")
+            return None
 
     def load_ports(self):
-        """Cargar los puertos seriales disponibles en el Combobox"""
-        ports = serial.tools.list_ports.comports()
-        port_list = [port.device for port in ports]
-        
-        if port_list:
-            self.port_combo['values'] = port_list
+        """Volver a enumerar los puertos ahora (la lista llega por ``apply_ports``)"""
+        self.port_scanner.rescan()
+
+    def apply_ports(self, ports):
+        """Actualizar el Combobox con los puertos encontrados (hilo de Tk)"""
+        if not ports:
+            self.view.publish(message="No se encontraron puertos seriales")
+        
+        # Las fuentes sin hardware siempre están disponibles
+        selected = self.port_combo.get()
+        self.port_combo['values'] = list(ports) + [SIMULATOR_ENTRY, REPLAY_ENTRY, HUB_ENTRY]
+        if ports and not self._port_chosen and not self.is_connected:
+            # Mientras el usuario no elija otra cosa, proponer el primer puerto
             self.port_combo.current(0)
         else:
-            self.port_combo['values'] = ["No hay puertos disponibles"]
-            self.status_var.set("No se encontraron puertos seriales")
+            self.port_combo.set(selected)
+
+    def on_first_paint(self, event=None):
+        """La ventana ya se dibujó: a partir de aquí solo interesa --connect"""
+        self.root.unbind("<Expose>")
+        STARTUP.mark("primera pintura")
+        if self.auto_connect:
+            self.root.after(0, self.connect_to_device, self.auto_connect)
 
     def toggle_connection(self):
         """Alternar entre conectar y desconectar"""
@@ -272,237 +480,372 @@ class RespiraMonitorApp:
         else:
             self.disconnect_from_device()
 
-    def connect_to_device(self):
-        """Conectar al dispositivo en el puerto seleccionado"""
-        selected_port = self.port_combo.get()
+    def create_source(self, selection, interactive=True):
+        """Crear la fuente de datos para la opción elegida en el Combobox.
+
+        Sin ``interactive`` (``--connect``) no se abren diálogos: el simulador
+        y las sesiones van a tiempo real y el hub usa el primer dispositivo.
+        """
+        if not interactive:
+            if selection == SIMULATOR_ENTRY:
+                return SyntheticSource(speed=1.0)
+            if selection == HUB_ENTRY:
+                return HubSource(None)
+            if os.path.isfile(selection):
+                return ReplaySource(selection, speed=1.0)
+            return SerialSource(selection, 115200)
+        
+        if selection == SIMULATOR_ENTRY:
+            speed = self.ask_speed()
+            return None if speed is False else SyntheticSource(speed=speed)
+        
+        if selection == REPLAY_ENTRY:
+            path = filedialog.askopenfilename(
+                initialdir=SESSION_DIR,
+                filetypes=[("Sesiones", "*.resp *.json"), ("Todos", "*.*")],
+            )
+            if not path:
+                return None
+            speed = self.ask_speed()
+            return None if speed is False else ReplaySource(path, speed=speed)
+        
+        if selection == HUB_ENTRY:
+            # Otro proceso es dueño del puerto: suscribirse a sus tramas
+            device = simpledialog.askstring(
+                "Hub local", "Dispositivo (vacío = el primero que publique el hub):", parent=self.root)
+            if device is None:
+                return None
+            return HubSource(device.strip() or None)
+        
+        return SerialSource(selection, 115200)
+
+    def ask_speed(self):
+        """Preguntar la velocidad de reproducción (False si se cancela)"""
+        speed = simpledialog.askfloat(
+            "Velocidad",
+            "Velocidad de reproducción (1 = tiempo real, 0 = lo más rápido posible):",
+            initialvalue=1.0, minvalue=0.0, parent=self.root,
+        )
+        if speed is None:
+            return False
+        return speed or MAX_SPEED
+
+    def connect_to_device(self, selection=None):
+        """Conectar al dispositivo en el puerto seleccionado (o a ``selection``)"""
+        interactive = selection is None
+        selected_port = self.port_combo.get() if interactive else selection
         
-        if selected_port == "No hay puertos disponibles":
-            messagebox.showerror("Error", "No hay puertos disponibles para conectar")
+        source = self.create_source(selected_port, interactive)
+        if source is None:
             return
         
+        # Primera conexión: crear los gráficos antes de abrir la fuente
+        self.ensure_graphs()
+        
         try:
-            # Intentar conectar al puerto serial
-            self.serial_conn = serial.Serial(selected_port, 115200, timeout=1)
+            # Abrir la fuente (puerto serial, archivo o simulador), empezar a
+            # grabar y lanzar el hilo lector
+            self.core.start(source)
             self.is_connected = True
             self.com_port = selected_port
             
             # Actualizar interfaz
             self.connect_btn.config(text="Desconectar")
-            self.status_var.set("Conectado a " + selected_port)
+            self.view.publish(message="Conectado a " + source.name)
             self.connection_status.config(text="Conectado", foreground="green")
             
-            # Iniciar hilo para leer datos
-            self.stop_event.clear()
-            self.data_thread = threading.Thread(target=self.read_serial_data)
-            self.data_thread.daemon = True
-            self.data_thread.start()
-            
-            # Iniciar animación de gráficos
-            self.ani_resp = animation.FuncAnimation(
-                self.resp_fig, self.update_respiration_graph, 
-                interval=100, blit=False
-            )
+            # Iniciar refresco de gráficos (sin redibujar la figura completa)
+            self.resp_timer = self.resp_canvas.new_timer(interval=RESP_REFRESH_MS)
+            self.resp_timer.add_callback(self.update_respiration_graph)
+            self.resp_timer.start()
             
-            self.ani_rpm = animation.FuncAnimation(
-                self.rpm_fig, self.update_rpm_graph, 
-                interval=1000, blit=False
-            )
+            self.rpm_timer = self.rpm_canvas.new_timer(interval=RPM_REFRESH_MS)
+            self.rpm_timer.add_callback(self.update_rpm_graph)
+            self.rpm_timer.start()
             
-        except (OSError, serial.SerialException) as e:
+        except (OSError, ValueError, serial.SerialException) as e:
             messagebox.showerror("Error de conexión", f"No se pudo conectar al puerto {selected_port}.\nError: {str(e)}")
-            self.status_var.set(f"Error: {str(e)}")
+            self.view.publish(message=f"Error: {str(e)}")
 
     def disconnect_from_device(self):
         """Desconectar del dispositivo"""
-        # Detener el hilo de lectura
-        self.stop_event.set()
-        if hasattr(self, 'data_thread') and self.data_thread.is_alive():
-            self.data_thread.join(1.0)
-        
-        # Detener animaciones
-        if hasattr(self, 'ani_resp'):
-            self.ani_resp.event_source.stop()
+        # Detener refresco de gráficos
+        if hasattr(self, 'resp_timer'):
+            self.resp_timer.stop()
         
-        if hasattr(self, 'ani_rpm'):
-            self.ani_rpm.event_source.stop()
+        if hasattr(self, 'rpm_timer'):
+            self.rpm_timer.stop()
         
-        # Cerrar conexión serial
-        if self.serial_conn and self.serial_conn.is_open:
-            self.serial_conn.close()
+        # Detener el hilo de lectura, cerrar la fuente y terminar la grabación
+        self.core.stop()
         
         # Actualizar interfaz
         self.is_connected = False
         self.connect_btn.config(text="Conectar")
-        self.status_var.set("Desconectado")
+        self.view.publish(message="Desconectado")
         self.connection_status.config(text="Desconectado", foreground="red")
 
-    def read_serial_data(self):
-        """Leer datos del puerto serial en segundo plano"""
-        buffer = ""
-        
-        while not self.stop_event.is_set():
-            try:
-                if self.serial_conn and self.serial_conn.is_open:
-                    # Leer datos disponibles
-                    data = self.serial_conn.read(self.serial_conn.in_waiting or 1)
-                    
-                    if data:
-                        # Decodificar y agregar al buffer
-                        buffer += data.decode('utf-8', errors='ignore')
-                        
-                        # Buscar líneas completas en el buffer
-                        lines = buffer.split('\n')
-                        
-                        # Procesar todas las líneas completas
-                        if len(lines) > 1:
-                            for line in lines[:-1]:
-                                self.process_line(line.strip())
-                            
-                            # Conservar la última línea (posiblemente incompleta)
-                            buffer = lines[-1]
-                
-                # Pequeño retraso para no sobrecargar la CPU
-                time.sleep(0.01)
-                
-            except Exception as e:
-                print(f"Error leyendo datos: {e}")
-                # Si hay un error, pausa breve antes de reintentar
-                time.sleep(0.1)
-
-    def process_line(self, line):
-        """Procesar una línea de datos recibida"""
-        if not line:
-            return
-            
-        try:
-            # Intentar parsear JSON
-            if line.startswith('{') and line.endswith('}'):
-                data = json.loads(line)
-                
-                # Almacenar datos en el buffer
-                self.data_buffer.append(data)
-                if len(self.data_buffer) > 100:
-                    self.data_buffer.pop(0)
-                
-                # Actualizar variables de la UI
-                if 'rpm' in data:
-                    rpm = data['rpm']
-                    self.rpm_var.set(str(rpm) if rpm > 0 else "--")
-                    
-                    # Actualizar histórico de RPM si hay un valor válido
-                    if rpm > 0:
-                        self.rpm_history.append(rpm)
-                        self.timestamps.append(time.time())
-                        
-                        # Mantener solo los últimos 60 valores (1 minuto)
-                        if len(self.rpm_history) > 60:
-                            self.rpm_history.pop(0)
-                            self.timestamps.pop(0)
-                
-                if 'breathCount' in data:
-                    self.breath_count_var.set(str(data['breathCount']))
-                
-                if 'status' in data:
-                    status = data['status']
-                    self.state_var.set(status)
-                    
-                    # Actualizar estilo según el estado
-                    if status == "ALTO":
-                        self.rpm_label.configure(style="High.RPM.TLabel")
-                        self.state_label.configure(foreground=COLORS["warning"])
-                    elif status == "BAJO":
-                        self.rpm_label.configure(style="Low.RPM.TLabel")
-                        self.state_label.configure(foreground=COLORS["warning"])
-                    elif status == "NORMAL":
-                        self.rpm_label.configure(style="Normal.RPM.TLabel")
-                        self.state_label.configure(foreground=COLORS["success"])
-                    else:
-                        self.rpm_label.configure(style="RPM.TLabel")
-                        self.state_label.configure(foreground=COLORS["text"])
-                
-                # Actualizar datos para gráficos
-                if 'filtered' in data:
-                    self.filtered_history.append(data['filtered'])
-                    if len(self.filtered_history) > self.data_points:
-                        self.filtered_history.pop(0)
-                
-                if 'threshold' in data:
-                    # Crear un array con el valor del umbral repetido
-                    self.threshold_history = [data['threshold']] * self.data_points
-                
-        except json.JSONDecodeError:
-            # Si no es JSON, ignorar
-            pass
-        except Exception as e:
-            print(f"Error procesando datos: {e}")
+    def apply_finished(self, source):
+        """La reproducción o la simulación terminó: desconectar como con el botón"""
+        if self.is_connected and source is self.core.source:
+            self.disconnect_from_device()
+            self.view.publish(message="Reproducción terminada")
 
-    def update_respiration_graph(self, frame):
+    def apply_status(self, status):
+        """Mostrar el estado y su color (hilo de Tk, solo cuando cambia)"""
+        self.state_var.set(status)
+        
+        # Actualizar estilo según el estado
+        if status == "ALTO":
+            self.rpm_label.configure(style="High.RPM.TLabel")
+            self.state_label.configure(foreground=COLORS["warning"])
+        elif status == "BAJO":
+            self.rpm_label.configure(style="Low.RPM.TLabel")
+            self.state_label.configure(foreground=COLORS["warning"])
+        elif status == "NORMAL":
+            self.rpm_label.configure(style="Normal.RPM.TLabel")
+            self.state_label.configure(foreground=COLORS["success"])
+        else:
+            self.rpm_label.configure(style="RPM.TLabel")
+            self.state_label.configure(foreground=COLORS["text"])
+
+    def apply_alerts(self, alerts):
+        """Mostrar las alertas activas del host; sonar cuando aparece una nueva"""
+        if set(alerts) - set(self.active_alerts):
+            self.root.bell()
+        self.active_alerts = alerts
+        self.alerts_var.set(f"Alertas: {', '.join(alerts)}" if alerts else "")
+
+    def update_respiration_graph(self, frame=None):
         """Actualizar el gráfico de respiración"""
         if not self.is_connected:
             return
             
         try:
-            # Actualizar datos de las líneas
-            self.line_filtered.set_ydata(self.filtered_history)
-            self.line_threshold.set_ydata(self.threshold_history)
+            # Histórico completo (vistas sin copia del buffer circular), recortado
+            # a la ventana de tiempo sea cual sea la frecuencia de tramas; las
+            # ventanas largas se diezman al dibujar
+            times = self.history.view("timestamp")
+            if not len(times):
+                return
+            first = int(np.searchsorted(times, times[-1] - self.signal_window))
+            count = len(times) - first
+            times = times[first:]
+            filtered = self.history.view("filtered", count)
+            threshold = self.history.view("threshold", count)
             
-            # Ajustar los límites del eje Y si es necesario
-            if self.filtered_history:
-                max_val = max(max(self.filtered_history), max(self.threshold_history)) * 1.2
-                min_val = min(min(self.filtered_history), 0) * 1.2
-                self.resp_ax.set_ylim(min_val, max_val)
+            # Redibujar solo las líneas (el eje Y se reescala con histéresis)
+            scale, _ = _time_unit(self.signal_window)
+            x = (times - times[-1]) / scale
+            self.resp_renderer.update(((x, filtered), (x, threshold)))
+            STARTUP.mark("primer cuadro")
             
-            # Redibujar
-            self.resp_canvas.draw_idle()
+            if self.metrics is not None:
+                self.observe_render(self.resp_render_time, self.resp_renderer, RESP_REFRESH_MS)
+                # Hora de llegada (en reproducción la trama lleva la hora grabada)
+                arrival = self.core.source.last_arrival
+                if arrival is not None:
+                    self.display_latency.observe(max(0.0, time.time() - arrival))
             
         except Exception as e:
             print(f"Error actualizando gráfico de respiración: {e}")
 
-    def update_rpm_graph(self, frame):
-        """Actualizar el gráfico histórico de RPM"""
-        if not self.is_connected or not self.rpm_history:
+    def set_signal_window(self, seconds):
+        """Cambiar los segundos visibles de la señal"""
+        self.signal_window = seconds
+        scale, unit = _time_unit(seconds)
+        self.resp_renderer.set_xlim(-seconds / scale, 0, f"Tiempo ({unit})")
+        self.update_respiration_graph()
+
+    def set_rpm_span(self, span):
+        """Cambiar la ventana visible de la tendencia de RPM (segundos)"""
+        self.rpm_span = min(max(span, RPM_MIN_SPAN), RPM_MAX_SPAN)
+        scale, unit = _time_unit(self.rpm_span)
+        self.rpm_renderer.set_xlim(-self.rpm_span / scale, 0, f"Tiempo ({unit})")
+        self.update_rpm_graph()
+
+    def follow_rpm_live(self):
+        self.rpm_view_end = None
+        self.update_rpm_graph()
+
+    def on_rpm_scroll(self, event):
+        """Rueda del ratón: acercar o alejar la ventana de tiempo"""
+        self.set_rpm_span(self.rpm_span / 2 if event.button == "up" else self.rpm_span * 2)
+
+    def on_rpm_press(self, event):
+        if event.inaxes is not self.rpm_ax or self.rpm_trend.last_time is None:
+            return
+        if event.dblclick:
+            self.follow_rpm_live()
+            return
+        end = self.rpm_view_end if self.rpm_view_end is not None else self.rpm_trend.last_time
+        self._pan_anchor = (event.x, end)
+
+    def on_rpm_drag(self, event):
+        """Arrastrar: desplazar la ventana hacia el pasado o el presente"""
+        if self._pan_anchor is None:
+            return
+        x0, end = self._pan_anchor
+        seconds_per_pixel = self.rpm_span / max(self.rpm_ax.bbox.width, 1)
+        end -= (event.x - x0) * seconds_per_pixel
+        last = self.rpm_trend.last_time
+        self.rpm_view_end = None if end >= last else end
+        self.update_rpm_graph()
+
+    def on_rpm_release(self, event):
+        self._pan_anchor = None
+
+    def update_rpm_graph(self, frame=None):
+        """Actualizar el gráfico de tendencia de RPM"""
+        if self.rpm_trend.last_time is None:
             return
             
         try:
-            # Convertir timestamps a segundos relativos
-            if self.timestamps:
-                relative_time = [t - self.timestamps[0] for t in self.timestamps]
-                
-                # Actualizar datos
-                self.line_rpm.set_data(relative_time, self.rpm_history)
-                
-                # Ajustar límites del eje X
-                self.rpm_ax.set_xlim(0, max(relative_time) + 1)
-                
-                # Redibujar
-                self.rpm_canvas.draw_idle()
+            # Cubetas del nivel que corresponde a la ventana (≈ una por píxel)
+            end = self.rpm_view_end if self.rpm_view_end is not None else self.rpm_trend.last_time
+            max_points = int(self.rpm_ax.bbox.width) or 1
+            _, t, rpm_min, rpm_max, rpm_mean = self.rpm_trend.series(end - self.rpm_span, end, max_points)
+            scale, _ = _time_unit(self.rpm_span)
+            x = (t - end) / scale
+            
+            # Solo cambian los datos; el eje X cambia únicamente con zoom
+            self.rpm_renderer.update(((x, rpm_mean), (x, rpm_min), (x, rpm_max)))
+            if self.metrics is not None:
+                self.observe_render(self.rpm_render_time, self.rpm_renderer, RPM_REFRESH_MS)
+            
+            # Mostrar rendimiento del gráfico en tiempo real
+            self.render_var.set(f"Gráfico: {self.resp_renderer.fps:.0f} fps · "
+                                f"{self.resp_renderer.render_ms:.1f} ms/cuadro")
                 
         except Exception as e:
             print(f"Error actualizando gráfico RPM: {e}")
 
+    def enable_metrics(self):
+        """Activar las métricas del núcleo y las del dibujo"""
+        if self.metrics is not None:
+            return self.metrics
+        registry = self.core.enable_metrics()
+        stage = "respira_stage_seconds"
+        doc = "Duración de cada etapa del canal de datos"
+        self.resp_render_time = registry.histogram(stage, doc, stage="render_signal")
+        self.rpm_render_time = registry.histogram(stage, doc, stage="render_rpm")
+        self.display_latency = registry.histogram(
+            "respira_display_latency_seconds", "Desde la llegada de la última trama hasta su dibujo")
+        registry.counter("respira_render_overruns_total",
+                         "Cuadros que tardaron más que el intervalo de refresco",
+                         lambda: self.render_overruns)
+        registry.counter("respira_ui_updates_total", "Cambios aplicados a los indicadores",
+                         lambda: self.view.applied)
+        self.metrics = registry
+        return registry
+
+    def start_metrics_server(self, port=DEFAULT_PORT):
+        """Publicar las métricas en http://127.0.0.1:<port>/metrics"""
+        self.metrics_server = MetricsServer(self.enable_metrics(), port).start()
+        return self.metrics_server
+
+    def observe_render(self, histogram, renderer, interval_ms):
+        histogram.observe(renderer.last_render)
+        if renderer.last_render * 1000 > interval_ms:
+            self.render_overruns += 1
+
+    def show_diagnostics(self):
+        """Ventana con la duración de cada etapa y los contadores"""
+        self.enable_metrics()
+        if self.diagnostics is not None and self.diagnostics.winfo_exists():
+            self.diagnostics.lift()
+            return
+        
+        window = tk.Toplevel(self.root)
+        window.title("Diagnóstico")
+        window.configure(bg=COLORS["bg"])
+        
+        columns = ("n", "p50", "p95", "p99", "max")
+        stages = ttk.Treeview(window, columns=columns, height=7)
+        stages.heading("#0", text="Etapa")
+        for column, title in zip(columns, ("Cantidad", "p50 (ms)", "p95 (ms)", "p99 (ms)", "Máx (ms)")):
+            stages.heading(column, text=title)
+            stages.column(column, width=80, anchor=tk.E)
+        stages.pack(fill=tk.BOTH, expand=True, padx=10, pady=(10, 5))
+        
+        counters = ttk.Treeview(window, columns=("value",), height=10)
+        counters.heading("#0", text="Contador")
+        counters.heading("value", text="Valor")
+        counters.column("value", width=120, anchor=tk.E)
+        counters.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        
+        address = self.metrics_server.url if self.metrics_server is not None else "desactivado (--metrics-port)"
+        ttk.Label(window, text=f"Prometheus: {address}", style="TLabel").pack(padx=10, pady=(0, 10))
+        
+        self.diagnostics = window
+        self.refresh_diagnostics(stages, counters)
+
+    def refresh_diagnostics(self, stages, counters):
+        if self.diagnostics is None or not self.diagnostics.winfo_exists():
+            return
+        stages.delete(*stages.get_children())
+        for name, labels, histogram in self.metrics.histograms():
+            label = labels.get("stage", name.replace("respira_", "").replace("_seconds", ""))
+            stages.insert("", tk.END, text=label, values=(
+                histogram.count,
+                *(f"{histogram.quantile(q) * 1000:.2f}" for q in (0.5, 0.95, 0.99)),
+                f"{histogram.max * 1000:.2f}",
+            ))
+        counters.delete(*counters.get_children())
+        for name, labels, value in self.metrics.values():
+            counters.insert("", tk.END, text=name.replace("respira_", ""), values=(value,))
+        self.root.after(DIAGNOSTICS_REFRESH_MS, self.refresh_diagnostics, stages, counters)
+
     def save_data(self):
-        """Guardar los datos recopilados en un archivo"""
-        if not self.data_buffer:
+        """Exportar la sesión grabada a JSON o CSV"""
+        session_path = self.core.session_path
+        if session_path is None or not os.path.exists(session_path):
             messagebox.showinfo("Información", "No hay datos para guardar")
             return
-            
+        
+        # Crear nombre de archivo con fecha y hora
+        os.makedirs(SESSION_DIR, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = filedialog.asksaveasfilename(
+            initialdir=SESSION_DIR,
+            initialfile=f"resp_data_{timestamp}.json",
+            defaultextension=".json",
+            filetypes=[("JSON", "*.json"), ("CSV", "*.csv")],
+        )
+        if not filename:
+            return
+        
+        # Escribir lo pendiente y exportar fuera del hilo de la interfaz
+        recorder = self.core.recorder
+        flushed = recorder.flush() if recorder is not None else None
+        self.exports += 1
+        threading.Thread(target=self._export_session, args=(session_path, filename, flushed, self.exports),
+                         daemon=True).start()
+
+    def _export_session(self, session_path, filename, flushed=None, export_id=0):
+        """Exportar un archivo de sesión (se ejecuta en segundo plano).
+
+        El resultado vuelve al hilo de Tk por el ViewModel (``apply_export``).
+        """
+        if flushed is not None:
+            flushed.wait(5.0)
         try:
-            # Crear directorio si no existe
-            save_dir = "datos_respiracion"
-            os.makedirs(save_dir, exist_ok=True)
-            
-            # Crear nombre de archivo con fecha y hora
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = os.path.join(save_dir, f"resp_data_{timestamp}.json")
-            
-            # Guardar datos
-            with open(filename, 'w') as f:
-                json.dump(self.data_buffer, f, indent=2)
-                
-            messagebox.showinfo("Éxito", f"Datos guardados en {filename}")
-            
+            reader = SessionReader(session_path)
+            if filename.lower().endswith(".csv"):
+                reader.to_csv(filename)
+            else:
+                reader.to_json(filename)
+            self.view.publish(export=(export_id, filename, None))
         except Exception as e:
-            messagebox.showerror("Error", f"No se pudieron guardar los datos: {str(e)}")
+            self.view.publish(export=(export_id, filename, str(e)))
+
+    def apply_export(self, result):
+        """Avisar cómo terminó una exportación (hilo de Tk)"""
+        _, filename, error = result
+        if error is None:
+            messagebox.showinfo("Éxito", f"Datos guardados en {filename}")
+        else:
+            messagebox.showerror("Error", f"No se pudieron guardar los datos: {error}")
 
     def show_help(self):
         """Mostrar información de ayuda"""
@@ -526,13 +869,76 @@ Para más información, consulte el manual del dispositivo.
         """
         messagebox.showinfo("Ayuda", help_text)
 
+    def show_patients(self):
+        """Cuadrícula con todos los dispositivos que publica el hub local"""
+        address = self.core.hub.address if self.core.hub is not None else DEFAULT_ADDRESS
+        try:
+            feed = HubFeed(address).start()
+        except OSError as e:
+            messagebox.showerror("Pacientes", f"No hay un hub local en {address}.\n"
+                                              f"Inicie el monitor con --hub.\nError: {e}")
+            return
+        window = tk.Toplevel(self.root)
+        window.title("Pacientes")
+        window.geometry("1000x600")
+        dashboard = GridDashboard(window, feed)
+        dashboard.start()
+        
+        def close():
+            dashboard.stop()
+            feed.stop()
+            window.destroy()
+        window.protocol("WM_DELETE_WINDOW", close)
+
+    def start_hub(self, address=DEFAULT_ADDRESS):
+        """Repartir las tramas de esta ventana a suscriptores locales"""
+        self.core.hub = TelemetryHub(address).start()
+        return self.core.hub
+
     def on_closing(self):
         """Manejar el cierre de la aplicación"""
         if self.is_connected:
             self.disconnect_from_device()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        if self.core.hub is not None:
+            self.core.hub.stop()
+        self.port_scanner.stop()
+        self.view.stop()
         self.root.destroy()
 
+def _time_unit(span):
+    """Escala y unidad del eje de tiempo para una ventana de ``span`` segundos"""
+    if span <= 5 * 60:
+        return 1, "s"
+    if span <= 5 * 3600:
+        return 60, "min"
+    return 3600, "h"
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monitor de respiración")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help=f"Publicar métricas de Prometheus en este puerto local (p. ej. {DEFAULT_PORT})")
+    parser.add_argument("--hub", nargs="?", const=DEFAULT_ADDRESS, metavar="DIRECCIÓN",
+                        help="Repartir las tramas a otros procesos locales")
+    parser.add_argument("--signal-window", type=float, default=SIGNAL_WINDOW_S, metavar="SEGUNDOS",
+                        help=f"Segundos visibles de la señal (por defecto {SIGNAL_WINDOW_S})")
+    parser.add_argument("--connect", metavar="ENTRADA",
+                        help=f"Conectar al abrir: un puerto, \"{SIMULATOR_ENTRY}\" o un archivo de sesión")
+    parser.add_argument("--startup-timing", action="store_true",
+                        help="Imprimir los tiempos de arranque (con --connect, salir tras el primer cuadro)")
+    args = parser.parse_args(sys.argv[1:])
+    
+    if args.startup_timing:
+        STARTUP.enable()
     root = tk.Tk()
-    app = RespiraMonitorApp(root)
+    app = RespiraMonitorApp(root, signal_window=args.signal_window)
+    app.auto_connect = args.connect
+    if args.startup_timing and args.connect:
+        STARTUP.until = "primer cuadro"
+        STARTUP.on_done = lambda: root.after(0, app.on_closing)
+    if args.metrics_port is not None:
+        app.start_metrics_server(args.metrics_port)
+    if args.hub:
+        app.start_hub(args.hub)
     root.mainloop()
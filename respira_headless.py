@@ -0,0 +1,183 @@
+"""Monitor sin interfaz gráfica (para gateways, servidores y CI).
+
+Usa el mismo núcleo que la GUI (``respira_core.py``) sin importar Tk ni
+matplotlib: lee la fuente, graba la sesión y avisa en la consola cuando el
+estado sale del rango saludable.
+
+    python respira_headless.py --port COM3
+    python respira_headless.py --simulate --rpm 30 --duration 120 --speed 0
+    python respira_headless.py --replay datos_respiracion/resp_session_X.resp
+    python respira_headless.py --port COM3 --hub          # compartir con otros procesos
+    python respira_headless.py --from-hub --device COM3   # suscribirse
+"""
+import argparse
+import signal
+import sys
+import threading
+import time
+from datetime import datetime
+
+from respira_alerts import AlertEngine, load_configs
+from respira_archive import SessionArchive
+from respira_core import MonitorCore
+from respira_hub import DEFAULT_ADDRESS, HubSource, TelemetryHub
+from respira_metrics import DEFAULT_PORT, MetricsServer
+from respira_recorder import SESSION_DIR
+from respira_sources import MAX_SPEED, ReplaySource, SerialSource, SyntheticSource
+
+# Estados que se informan como alerta
+ALERT_STATUSES = ("ALTO", "BAJO")
+
+
+class ConsoleReporter:
+    """Recibe lo que publica el núcleo y lo escribe en la consola.
+
+    Solo informa los cambios de estado, las alertas del host y los avisos;
+    con ``verbose`` también los mensajes de texto del firmware.
+    """
+
+    def __init__(self, verbose=False, out=sys.stdout):
+        self.verbose = verbose
+        self.out = out
+        self.values = {}
+        self.alerts = 0
+        self._lock = threading.Lock()
+
+    def log(self, text):
+        with self._lock:
+            self.out.write(f"{datetime.now().strftime('%H:%M:%S')} {text}\n")
+            self.out.flush()
+
+    def __call__(self, **values):
+        previous = self.values.get("status")
+        self.values.update(values)
+
+        status = values.get("status")
+        if status is not None and status != previous:
+            rpm = self.values.get("rpm", 0)
+            if status in ALERT_STATUSES:
+                self.alerts += 1
+                self.log(f"ALERTA: respiración {status} ({rpm} RPM)")
+            else:
+                self.log(f"Estado: {status} ({rpm} RPM)")
+
+        event = values.get("alert")
+        if event is not None:
+            if event.active:
+                self.alerts += 1
+                self.log(f"ALERTA {event.kind}: {event.message}")
+            else:
+                self.log(event.message)
+            return
+
+        message = values.get("message")
+        if message is not None and (self.verbose or message.startswith("Aviso")):
+            self.log(message)
+
+
+def create_source(args):
+    speed = MAX_SPEED if args.speed == 0 else args.speed
+    if args.replay:
+        return ReplaySource(args.replay, speed=speed)
+    if args.from_hub:
+        return HubSource(args.device, args.from_hub)
+    if args.simulate:
+        return SyntheticSource(rpm=args.rpm, duration=args.duration, speed=speed, binary=args.binary)
+    return SerialSource(args.port, args.baudrate)
+
+
+def summary(core, reporter, started):
+    frame = core.last_frame
+    rpm = frame.rpm if frame is not None else 0
+    breaths = frame.breathCount if frame is not None else 0
+    spectral = core.spectral.estimate().format()
+    return (f"{core.history.total} tramas · {breaths} respiraciones · {rpm} RPM "
+            f"(espectral {spectral}) · "
+            f"{reporter.alerts} alertas · {time.monotonic() - started:.0f} s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monitor de respiración sin interfaz gráfica")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--port", help="Puerto serial del ESP32 (p. ej. COM3 o /dev/ttyUSB0)")
+    group.add_argument("--simulate", action="store_true", help="Usar el simulador")
+    group.add_argument("--replay", metavar="ARCHIVO", help="Reproducir una sesión .resp o .json")
+    group.add_argument("--from-hub", nargs="?", const=DEFAULT_ADDRESS, metavar="DIRECCIÓN",
+                       help="Suscribirse a un hub local en lugar de abrir un puerto")
+    parser.add_argument("--baudrate", type=int, default=115200)
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Velocidad de simulación/reproducción (0 = lo más rápido posible)")
+    parser.add_argument("--rpm", type=float, default=15, help="RPM del simulador")
+    parser.add_argument("--duration", type=float, default=None, help="Duración del simulador (s)")
+    parser.add_argument("--binary", action="store_true", help="El simulador usa el protocolo binario")
+    parser.add_argument("--output", default=SESSION_DIR, help="Carpeta de las grabaciones")
+    parser.add_argument("--no-record", action="store_true", help="No grabar la sesión")
+    parser.add_argument("--interval", type=float, default=60.0,
+                        help="Segundos entre resúmenes (0 = sin resúmenes)")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help=f"Publicar métricas de Prometheus en este puerto local (p. ej. {DEFAULT_PORT})")
+    parser.add_argument("--hub", nargs="?", const=DEFAULT_ADDRESS, metavar="DIRECCIÓN",
+                        help=f"Repartir las tramas a suscriptores locales (por defecto {DEFAULT_ADDRESS})")
+    parser.add_argument("--device", help="Dispositivo a seguir con --from-hub (por defecto el primero)")
+    parser.add_argument("--alerts", metavar="ARCHIVO",
+                        help='Reglas de alerta en JSON: {"paciente": {"low": 10, "apnea_s": 15}, "*": {...}}')
+    parser.add_argument("--verbose", action="store_true", help="Mostrar los mensajes del firmware")
+    args = parser.parse_args(argv)
+
+    reporter = ConsoleReporter(verbose=args.verbose)
+    try:
+        alerts = AlertEngine(load_configs(args.alerts) if args.alerts else None)
+    except (OSError, ValueError, TypeError) as e:
+        print(f"No se pudieron leer las reglas de alerta: {e}", file=sys.stderr)
+        return 2
+    archive = None if args.no_record else SessionArchive(directory=args.output)
+    hub = None
+    if args.hub:
+        try:
+            hub = TelemetryHub(args.hub).start()
+        except OSError as e:
+            print(f"No se pudo iniciar el hub en {args.hub}: {e}", file=sys.stderr)
+            return 1
+        reporter.log(f"Hub en {args.hub}")
+    core = MonitorCore(publish=reporter, session_dir=args.output, record=not args.no_record,
+                       archive=archive, alerts=alerts, hub=hub)
+    server = None
+    if args.metrics_port is not None:
+        server = MetricsServer(core.enable_metrics(), args.metrics_port).start()
+        reporter.log(f"Métricas en {server.url}")
+    source = create_source(args)
+    try:
+        core.start(source)
+    except (OSError, ValueError) as e:
+        print(f"No se pudo abrir {source.name}: {e}", file=sys.stderr)
+        if hub is not None:
+            hub.stop()
+        return 1
+
+    started = time.monotonic()
+    reporter.log(f"Leyendo {source.name}" + (f", grabando en {core.session_path}" if core.session_path else ""))
+
+    # SIGTERM (servicio detenido) termina igual que Ctrl+C
+    signal.signal(signal.SIGTERM, lambda signum, frame: core.finished.set())
+    next_summary = started + args.interval
+    try:
+        # Esperas cortas para que Ctrl+C responda también en Windows
+        while not core.finished.wait(0.5):
+            if args.interval and time.monotonic() >= next_summary:
+                next_summary += args.interval
+                reporter.log(summary(core, reporter, started))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        core.stop()
+        if server is not None:
+            server.stop()
+        if hub is not None:
+            hub.stop()
+
+    reporter.log("Fin: " + summary(core, reporter, started))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
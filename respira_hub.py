@@ -0,0 +1,514 @@
+"""Reparto local de la telemetría decodificada a varios suscriptores.
+
+Un solo proceso abre los puertos y publica las tramas en un ``TelemetryHub``;
+cualquier número de procesos locales (otra GUI, un registrador, scripts de
+análisis) se suscriben sin tocar el puerto serial. El transporte es un socket
+Unix (en Windows, TCP en 127.0.0.1).
+
+Cada mensaje lleva una cabecera ``<BHI`` (tipo, largo del nombre del
+dispositivo, largo del contenido), el nombre y el contenido:
+
+    FRAMES    lote de tramas como filas de FRAME_CHANNELS (little-endian, sin relleno)
+    LOG       línea de texto del firmware
+    EVENT     evento en JSON (p. ej. alertas del host)
+    DROPPED   uint32 con las tramas descartadas para ese suscriptor
+    SUBSCRIBE (del suscriptor al hub) JSON con ``devices`` y ``policy``
+
+El hub agrupa las tramas de cada dispositivo cada ``batch_interval``
+segundos, codifica cada lote una sola vez y encola los mismos bytes para
+todos los suscriptores. La publicación nunca se bloquea: cada suscriptor
+tiene una cola de hasta ``queue_bytes``; si se llena, con la política
+``drop`` se descartan los lotes más antiguos (y se le avisa con DROPPED) y
+con ``disconnect`` se lo desconecta.
+"""
+import json
+import os
+import selectors
+import socket
+import struct
+import tempfile
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from respira_decoder import FRAME_CHANNELS, STATUSES, TelemetryFrame
+from respira_sources import DataSource, ReadStats
+
+KIND_FRAMES = 1
+KIND_LOG = 2
+KIND_EVENT = 3
+KIND_DROPPED = 4
+KIND_SUBSCRIBE = 5
+
+MESSAGE_HEADER = struct.Struct("<BHI")
+DROPPED_COUNT = struct.Struct("<I")
+
+# Filas de tramas tal como viajan por el socket
+FRAME_DTYPE = np.dtype([(name, np.dtype(dtype).newbyteorder("<")) for name, dtype in FRAME_CHANNELS])
+
+POLICIES = ("drop", "disconnect")
+
+USE_UNIX_SOCKET = hasattr(socket, "AF_UNIX")
+DEFAULT_ADDRESS = (os.path.join(tempfile.gettempdir(), "respira_hub.sock")
+                   if USE_UNIX_SOCKET else "127.0.0.1:9467")
+
+BATCH_INTERVAL = 0.05
+QUEUE_BYTES = 4 * 2**20
+
+
+def _socket_for(address):
+    """Socket y dirección para ``ruta`` (Unix) o ``host:puerto`` (TCP)"""
+    if USE_UNIX_SOCKET and ":" not in os.path.basename(address):
+        return socket.socket(socket.AF_UNIX, socket.SOCK_STREAM), address
+    host, _, port = address.rpartition(":")
+    return socket.socket(socket.AF_INET, socket.SOCK_STREAM), (host or "127.0.0.1", int(port))
+
+
+def encode_message(kind, device, payload=b""):
+    name = device.encode("utf-8")
+    return MESSAGE_HEADER.pack(kind, len(name), len(payload)) + name + payload
+
+
+def encode_frames(frames):
+    """Filas empaquetadas de un lote de tramas"""
+    return np.array([frame.as_row() for frame in frames], dtype=FRAME_DTYPE).tobytes()
+
+
+def rows_to_frames(rows):
+    """Convertir filas recibidas (arreglo de FRAME_DTYPE) en ``TelemetryFrame``"""
+    frames = []
+    for t, acceleration, delta, filtered, threshold, noise, rpm, count, code in rows.tolist():
+        status = STATUSES[code] if code < len(STATUSES) else ""
+        frames.append(TelemetryFrame(acceleration, delta, filtered, threshold, noise,
+                                     rpm, count, status, t))
+    return frames
+
+
+class _Subscriber:
+    """Conexión de un suscriptor del lado del hub, con su cola de salida"""
+
+    def __init__(self, sock, queue_bytes):
+        self.sock = sock
+        self.queue_bytes = queue_bytes
+        self.devices = None        # None = todos
+        self.policy = "drop"
+        self.subscribed = False
+        self.closed = False
+        self._inbox = bytearray()
+        self._queue = deque()      # [bytes, tramas]
+        self._offset = 0           # Bytes ya enviados del primer mensaje
+        self.queued = 0
+
+        # Contadores
+        self.sent = 0
+        self.dropped = 0
+
+    def wants(self, device):
+        return self.subscribed and (self.devices is None or device in self.devices)
+
+    def receive(self):
+        """Leer la suscripción; False si el suscriptor cerró"""
+        try:
+            data = self.sock.recv(4096)
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+        if not data:
+            return False
+        self._inbox += data
+        while len(self._inbox) >= MESSAGE_HEADER.size:
+            kind, name_len, size = MESSAGE_HEADER.unpack_from(self._inbox)
+            end = MESSAGE_HEADER.size + name_len + size
+            if len(self._inbox) < end:
+                break
+            payload = bytes(self._inbox[MESSAGE_HEADER.size + name_len:end])
+            del self._inbox[:end]
+            if kind == KIND_SUBSCRIBE:
+                try:
+                    request = json.loads(payload or b"{}")
+                    devices = request.get("devices")
+                    self.devices = set(devices) if devices else None
+                    if request.get("policy") in POLICIES:
+                        self.policy = request["policy"]
+                except (ValueError, TypeError, AttributeError):
+                    # Suscripción mal formada: se desconecta solo a este cliente
+                    return False
+                self.subscribed = True
+        return True
+
+    def enqueue(self, message, frames=0):
+        """Encolar un mensaje; False si hay que desconectar al suscriptor"""
+        if self.queued + len(message) > self.queue_bytes:
+            if self.policy == "disconnect":
+                return False
+            # Descartar los lotes más antiguos (no el que se está enviando)
+            dropped = 0
+            index = 1 if self._offset else 0
+            while self.queued + len(message) > self.queue_bytes and index < len(self._queue):
+                data, count = self._queue[index]
+                if not count:
+                    index += 1
+                    continue
+                del self._queue[index]
+                self.queued -= len(data)
+                dropped += count
+            if self.queued + len(message) > self.queue_bytes:
+                # Ni así cabe: se descarta también este lote
+                dropped += frames
+                message = None
+            if dropped:
+                self.dropped += dropped
+                self._notify_dropped(dropped)
+            if message is None:
+                return True
+        self._queue.append([message, frames])
+        self.queued += len(message)
+        return True
+
+    def _notify_dropped(self, dropped):
+        """Avisar los descartes, sumándolos al aviso anterior si aún no salió"""
+        queue = self._queue
+        tail = queue[-1] if queue else None
+        if (tail is not None and not tail[1] and tail[0][0] == KIND_DROPPED
+                and not (len(queue) == 1 and self._offset)):
+            (previous,) = DROPPED_COUNT.unpack_from(tail[0], len(tail[0]) - DROPPED_COUNT.size)
+            tail[0] = encode_message(KIND_DROPPED, "", DROPPED_COUNT.pack(previous + dropped))
+            return
+        notice = encode_message(KIND_DROPPED, "", DROPPED_COUNT.pack(dropped))
+        queue.append([notice, 0])
+        self.queued += len(notice)
+
+    @property
+    def pending(self):
+        return bool(self._queue)
+
+    def flush(self):
+        """Enviar lo que acepte el socket sin bloquear; False si falló"""
+        queue = self._queue
+        while queue:
+            data = queue[0][0]
+            try:
+                sent = self.sock.send(memoryview(data)[self._offset:])
+            except BlockingIOError:
+                return True
+            except OSError:
+                return False
+            self._offset += sent
+            if self._offset < len(data):
+                return True
+            self.queued -= len(data)
+            self.sent += queue[0][1]
+            self._offset = 0
+            queue.popleft()
+        return True
+
+    def close(self):
+        self.closed = True
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class TelemetryHub:
+    """Servidor local que reparte las tramas de todos los dispositivos.
+
+    ``publish(dispositivo, tramas)`` (y ``publish_log``/``publish_event``)
+    solo agregan a una cola y se pueden llamar desde cualquier hilo; el
+    hilo del hub agrupa, codifica y envía.
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, batch_interval=BATCH_INTERVAL,
+                 queue_bytes=QUEUE_BYTES):
+        self.address = address
+        self.batch_interval = batch_interval
+        self.queue_bytes = queue_bytes
+        self.subscribers = []
+
+        self._pending = deque()
+        self._selector = None
+        self._server = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        # Contadores
+        self.frames_in = 0
+        self.batches = 0
+        self.disconnected = 0
+
+    def start(self):
+        server, address = _socket_for(self.address)
+        if server.family == getattr(socket, "AF_UNIX", None) and os.path.exists(address):
+            # Un socket que quedó de un hub anterior: reutilizarlo solo si nadie escucha
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(address)
+                probe.close()
+                server.close()
+                raise OSError(f"Ya hay un hub escuchando en {address}")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(address)
+            finally:
+                probe.close()
+        server.bind(address)
+        server.listen()
+        server.setblocking(False)
+        self._server = server
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(server, selectors.EVENT_READ, None)
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="respira-hub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def publish(self, device, frames):
+        if frames:
+            self._pending.append((KIND_FRAMES, device, frames))
+
+    def publish_log(self, device, line):
+        self._pending.append((KIND_LOG, device, line))
+
+    def publish_event(self, device, event):
+        self._pending.append((KIND_EVENT, device, event))
+
+    def stats(self):
+        return {
+            "frames_in": self.frames_in,
+            "batches": self.batches,
+            "subscribers": len(self.subscribers),
+            "disconnected": self.disconnected,
+            "dropped": sum(sub.dropped for sub in self.subscribers),
+        }
+
+    def _run(self):
+        next_batch = time.monotonic() + self.batch_interval
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    timeout = max(0.0, next_batch - time.monotonic())
+                    for key, mask in self._selector.select(timeout):
+                        if key.data is None:
+                            self._accept()
+                            continue
+                        self._service(key.data, mask)
+
+                    if time.monotonic() >= next_batch:
+                        next_batch = time.monotonic() + self.batch_interval
+                        self._distribute()
+                except Exception as e:
+                    # Ningún error deja al hub sin hilo (y a publish() sin consumidor)
+                    print(f"Error en el hub: {e}")
+                    time.sleep(0.1)
+        finally:
+            for subscriber in list(self.subscribers):
+                self._drop(subscriber)
+            self._selector.close()
+            self._server.close()
+            if self._server.family == getattr(socket, "AF_UNIX", None):
+                try:
+                    os.unlink(self.address)
+                except OSError:
+                    pass
+
+    def _accept(self):
+        try:
+            sock, _ = self._server.accept()
+        except OSError:
+            return
+        sock.setblocking(False)
+        subscriber = _Subscriber(sock, self.queue_bytes)
+        self.subscribers.append(subscriber)
+        self._selector.register(sock, selectors.EVENT_READ, subscriber)
+
+    def _service(self, subscriber, mask):
+        """Atender un suscriptor; un error solo lo desconecta a él"""
+        try:
+            if mask & selectors.EVENT_READ and not subscriber.receive():
+                self._drop(subscriber)
+                return
+            if mask & selectors.EVENT_WRITE:
+                self._send(subscriber)
+        except Exception as e:
+            print(f"Error con un suscriptor del hub: {e}")
+            self._drop(subscriber)
+
+    def _drop(self, subscriber):
+        if subscriber.closed:
+            return
+        self._selector.unregister(subscriber.sock)
+        subscriber.close()
+        self.subscribers.remove(subscriber)
+        self.disconnected += 1
+
+    def _send(self, subscriber):
+        if not subscriber.flush():
+            self._drop(subscriber)
+            return
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if subscriber.pending else 0)
+        self._selector.modify(subscriber.sock, events, subscriber)
+
+    def _distribute(self):
+        """Agrupar lo publicado por dispositivo, codificar una vez y encolar"""
+        pending = self._pending
+        if not pending:
+            return
+        batches = {}
+        messages = []
+        while pending:
+            kind, device, value = pending.popleft()
+            if kind == KIND_FRAMES:
+                batch = batches.get(device)
+                if batch is None:
+                    batch = batches[device] = []
+                    messages.append((KIND_FRAMES, device, batch))
+                batch.extend(value)
+            elif kind == KIND_LOG:
+                messages.append((kind, device, value.encode("utf-8")))
+            else:
+                messages.append((kind, device, json.dumps(value, ensure_ascii=False).encode("utf-8")))
+
+        for kind, device, value in messages:
+            count = 0
+            if kind == KIND_FRAMES:
+                count = len(value)
+                self.frames_in += count
+                self.batches += 1
+                value = encode_frames(value)
+            message = encode_message(kind, device, value)
+            for subscriber in list(self.subscribers):
+                if subscriber.wants(device) and not subscriber.enqueue(message, count):
+                    self._drop(subscriber)
+
+        for subscriber in list(self.subscribers):
+            if subscriber.pending:
+                self._send(subscriber)
+
+
+class HubClient:
+    """Suscripción a un ``TelemetryHub``.
+
+    ``receive()`` devuelve los mensajes completos como tuplas ``(tipo,
+    dispositivo, valor)``: las tramas como arreglo de ``FRAME_DTYPE`` (sobre
+    una copia del mensaje, independiente del búfer de recepción), el texto
+    como ``str``, los eventos como diccionario y los descartes como entero.
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, devices=None, policy="drop"):
+        self.address = address
+        self.devices = list(devices) if devices else None
+        self.policy = policy
+        self.sock = None
+        self._buffer = bytearray()
+        self.dropped = 0
+
+    def connect(self):
+        sock, address = _socket_for(self.address)
+        sock.connect(address)
+        request = json.dumps({"devices": self.devices, "policy": self.policy}).encode("utf-8")
+        sock.sendall(encode_message(KIND_SUBSCRIBE, "", request))
+        self.sock = sock
+        return self
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def receive(self, timeout=0.5):
+        """Mensajes recibidos (lista vacía si no llegó nada antes del timeout).
+
+        Lanza ``ConnectionError`` si el hub cerró la conexión.
+        """
+        self.sock.settimeout(timeout)
+        try:
+            data = self.sock.recv(256 * 1024)
+        except socket.timeout:
+            return []
+        if not data:
+            raise ConnectionError("El hub cerró la conexión")
+        self._buffer += data
+        return self._parse()
+
+    def _parse(self):
+        messages = []
+        buffer = self._buffer
+        start = 0
+        while len(buffer) - start >= MESSAGE_HEADER.size:
+            kind, name_len, size = MESSAGE_HEADER.unpack_from(buffer, start)
+            body = start + MESSAGE_HEADER.size
+            end = body + name_len + size
+            if len(buffer) < end:
+                break
+            device = buffer[body:body + name_len].decode("utf-8")
+            payload = bytes(buffer[body + name_len:end])
+            if kind == KIND_FRAMES:
+                value = np.frombuffer(payload, dtype=FRAME_DTYPE)
+            elif kind == KIND_LOG:
+                value = payload.decode("utf-8")
+            elif kind == KIND_DROPPED:
+                (value,) = DROPPED_COUNT.unpack(payload)
+                self.dropped += value
+            else:
+                value = json.loads(payload)
+            messages.append((kind, device, value))
+            start = end
+        del buffer[:start]
+        return messages
+
+
+class HubSource(DataSource):
+    """Fuente de tramas ya decodificadas desde un hub local.
+
+    ``read()`` devuelve una lista de ``TelemetryFrame`` (``decoded = True``)
+    de ``device``; sin ``device`` se queda con el primer dispositivo que
+    llegue. Las líneas del firmware se entregan a ``on_log``.
+    """
+
+    decoded = True
+    recorded = True   # El proceso dueño del puerto ya graba
+
+    def __init__(self, device=None, address=DEFAULT_ADDRESS, policy="drop", on_log=None):
+        self.device = device
+        self.address = address
+        self.name = f"Hub: {device}" if device else "Hub"
+        self.on_log = on_log
+        self.client = HubClient(address, [device] if device else None, policy)
+        self.stats = ReadStats()
+
+    def open(self):
+        self.client.connect()
+        return self
+
+    def read(self, timeout=0.5):
+        try:
+            messages = self.client.receive(timeout)
+        except (ConnectionError, OSError):
+            self.finished = True
+            return []
+        frames = []
+        for kind, device, value in messages:
+            if self.device is None and kind == KIND_FRAMES:
+                self.device = device
+                self.name = f"Hub: {device}"
+            if device != self.device:
+                continue
+            if kind == KIND_FRAMES:
+                frames.extend(rows_to_frames(value))
+                self.stats.record_read(value.nbytes)
+            elif kind == KIND_LOG and self.on_log is not None:
+                self.on_log(value)
+        if frames:
+            self.last_arrival = time.time()
+        return frames
+
+    def close(self):
+        self.client.close()
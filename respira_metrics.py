@@ -0,0 +1,180 @@
+"""Métricas del canal de datos: histogramas por etapa y contadores.
+
+Los histogramas tienen cubetas fijas (``observe`` es una búsqueda binaria y
+un incremento). Los contadores no se incrementan en el camino crítico: se
+registran como funciones que leen los contadores que ya llevan el
+decodificador, la fuente y el grabador, y solo se evalúan al consultar.
+
+``MetricsServer`` publica todo en ``http://127.0.0.1:<puerto>/metrics`` en
+el formato de texto de Prometheus.
+"""
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Límites de las cubetas (segundos): de 50 µs a 2.5 s
+DEFAULT_BUCKETS = (
+    50e-6, 100e-6, 250e-6, 500e-6,
+    1e-3, 2.5e-3, 5e-3, 10e-3, 25e-3, 50e-3,
+    100e-3, 250e-3, 500e-3, 1.0, 2.5,
+)
+DEFAULT_PORT = 9466
+
+
+class Histogram:
+    """Histograma de cubetas fijas con suma, cantidad y máximo"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # La última es +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Estimación del cuantil ``q`` (interpolando dentro de la cubeta)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+            lower = self.buckets[index] if index < len(self.buckets) else lower
+        return self.max
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in sorted(labels.items())) + "}"
+
+
+class Registry:
+    """Conjunto de métricas con nombre, ayuda y etiquetas"""
+
+    def __init__(self):
+        self._families = {}   # nombre -> [tipo, ayuda, [(etiquetas, métrica)]]
+        self._lock = threading.Lock()
+
+    def _add(self, kind, name, help, labels, metric):
+        with self._lock:
+            family = self._families.setdefault(name, [kind, help, []])
+            family[2].append((labels, metric))
+        return metric
+
+    def histogram(self, name, help, buckets=DEFAULT_BUCKETS, **labels):
+        """Crear y registrar un histograma"""
+        return self._add("histogram", name, help, labels, Histogram(buckets))
+
+    def counter(self, name, help, read, **labels):
+        """Registrar un contador; ``read()`` devuelve su valor actual"""
+        return self._add("counter", name, help, labels, read)
+
+    def gauge(self, name, help, read, **labels):
+        """Registrar un valor instantáneo; ``read()`` devuelve su valor actual"""
+        return self._add("gauge", name, help, labels, read)
+
+    def histograms(self):
+        """Pares (nombre, etiquetas, histograma)"""
+        with self._lock:
+            families = list(self._families.items())
+        for name, (kind, _, metrics) in families:
+            if kind == "histogram":
+                for labels, histogram in metrics:
+                    yield name, labels, histogram
+
+    def values(self):
+        """Ternas (nombre, etiquetas, valor) de contadores y valores instantáneos"""
+        with self._lock:
+            families = list(self._families.items())
+        for name, (kind, _, metrics) in families:
+            if kind != "histogram":
+                for labels, read in metrics:
+                    yield name, labels, _read(read)
+
+    def expose(self):
+        """Todas las métricas en el formato de texto de Prometheus"""
+        with self._lock:
+            families = list(self._families.items())
+        out = []
+        for name, (kind, help, metrics) in families:
+            out.append(f"# HELP {name} {help}")
+            out.append(f"# TYPE {name} {kind}")
+            for labels, metric in metrics:
+                if kind != "histogram":
+                    out.append(f"{name}{_labels(labels)} {_read(metric)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets, metric.counts):
+                    cumulative += count
+                    out.append(f"{name}_bucket{_labels(dict(labels, le=repr(bound)))} {cumulative}")
+                out.append(f"{name}_bucket{_labels(dict(labels, le='+Inf'))} {metric.count}")
+                out.append(f"{name}_sum{_labels(labels)} {metric.sum}")
+                out.append(f"{name}_count{_labels(labels)} {metric.count}")
+        return "\n".join(out) + "\n"
+
+
+def _read(read):
+    try:
+        return read()
+    except Exception:
+        return float("nan")
+
+
+class MetricsServer:
+    """Servidor HTTP local que responde ``/metrics`` en un hilo de fondo"""
+
+    def __init__(self, registry, port=DEFAULT_PORT, host="127.0.0.1"):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/metrics"
+
+    def start(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.expose().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="respira-metrics", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,233 @@
+"""Protocolo binario de telemetría y detección automática del protocolo.
+
+Con ``BINARY_PROTOCOL 1`` el firmware envía en cada lectura una trama fija
+de 38 bytes en lugar del JSON de ~150 bytes (ver ``BinaryFrame`` en
+``Respira_code.ino``). Todo en little-endian:
+
+    offset  tipo      campo
+    0       2 bytes   sincronía 0xA5 0x5A
+    2       uint8     versión (1)
+    3       uint16    secuencia (se incrementa en cada trama)
+    5       uint32    millis() del dispositivo
+    9       5 float   acceleration, delta, filtered, threshold, noise
+    29      uint16    rpm
+    31      uint32    breathCount
+    35      uint8     estado (índice en STATUSES)
+    36      uint16    CRC-16/CCITT-FALSE de los bytes 2..35
+
+Los mensajes de texto del firmware pueden intercalarse entre tramas; se
+envían al canal de registro igual que en modo JSON. El firmware siempre
+termina sus líneas antes de enviar una trama, así que el texto incompleto
+que queda antes de una trama válida son restos de una trama dañada y se
+descarta.
+"""
+import struct
+import time
+from binascii import crc_hqx
+
+from respira_decoder import STATUS_CODES, STATUS_UNKNOWN, STATUSES, FrameDecoder, TelemetryFrame
+
+SYNC = b"\xa5\x5a"
+VERSION = 1
+BINARY_FRAME = struct.Struct("<2sBHI5fHIBH")
+FRAME_SIZE = BINARY_FRAME.size
+_CRC_START = len(SYNC)
+_CRC_END = FRAME_SIZE - 2
+
+# Un salto de secuencia mayor se interpreta como reinicio del dispositivo
+_MAX_GAP = 0x8000
+
+# Bytes sin decidir antes de asumir JSON
+PROBE_LIMIT = 4096
+
+# Contadores que AutoDecoder expone aunque el decodificador elegido no los tenga
+_COUNTERS = ("frames", "malformed", "logs", "lost", "crc_errors", "resets")
+
+
+def crc16(data):
+    """CRC-16/CCITT-FALSE (polinomio 0x1021, valor inicial 0xFFFF)"""
+    return crc_hqx(data, 0xFFFF)
+
+
+def encode_binary_frame(frame, seq, millis=0):
+    """Codificar una trama como lo hace el firmware (para pruebas y simulación)"""
+    status = STATUS_CODES.get(frame.status, STATUS_UNKNOWN)
+    body = BINARY_FRAME.pack(
+        SYNC, VERSION, seq & 0xFFFF, millis & 0xFFFFFFFF,
+        frame.acceleration, frame.delta, frame.filtered, frame.threshold, frame.noise,
+        frame.rpm, frame.breathCount, status, 0,
+    )
+    return body[:_CRC_END] + struct.pack("<H", crc16(body[_CRC_START:_CRC_END]))
+
+
+class BinaryDecoder:
+    """Decodificador de tramas binarias con control de secuencia y CRC.
+
+    El texto entre tramas (registro del firmware o incluso tramas JSON) se
+    pasa a un ``FrameDecoder`` interno.
+    """
+
+    def __init__(self, on_log=None, log_capacity=200):
+        self.text = FrameDecoder(on_log=on_log, log_capacity=log_capacity)
+        self._buffer = bytearray()
+        self._last_seq = None
+        self.last_device_ms = None
+
+        # Contadores
+        self.binary_frames = 0
+        self.crc_errors = 0
+        self.lost = 0      # Tramas perdidas o corruptas según la secuencia
+        self.resets = 0    # Reinicios del dispositivo detectados
+
+    @property
+    def log_lines(self):
+        return self.text.log_lines
+
+    @property
+    def frames(self):
+        return self.binary_frames + self.text.frames
+
+    @property
+    def malformed(self):
+        return self.crc_errors + self.text.malformed
+
+    @property
+    def logs(self):
+        return self.text.logs
+
+    def reset(self):
+        self._buffer.clear()
+        self._last_seq = None
+        self.text.reset()
+
+    def decode_line(self, line, timestamp=None):
+        return self.text.decode_line(line, timestamp)
+
+    def feed(self, data, timestamp=None):
+        """Agregar bytes recibidos y devolver las tramas completas"""
+        if timestamp is None:
+            timestamp = time.time()
+        buf = self._buffer
+        buf += data
+        frames = []
+        pos = 0
+        end = len(buf)
+
+        while True:
+            start = buf.find(SYNC, pos)
+            if start < 0:
+                # Conservar un posible primer byte de sincronía al final
+                keep = end - 1 if end and buf[end - 1] == SYNC[0] else end
+                if keep > pos:
+                    frames.extend(self.text.feed(bytes(buf[pos:keep]), timestamp))
+                pos = keep
+                break
+            if start > pos:
+                frames.extend(self.text.feed(bytes(buf[pos:start]), timestamp))
+            if start + FRAME_SIZE > end:
+                pos = start
+                break
+
+            fields = BINARY_FRAME.unpack_from(buf, start)
+            if fields[1] != VERSION or crc16(buf[start + _CRC_START:start + _CRC_END]) != fields[-1]:
+                # Trama dañada (o falsa sincronía): descartarla sin pasarla al
+                # texto, hasta la siguiente sincronía dentro de su longitud
+                self.crc_errors += 1
+                resync = buf.find(SYNC, start + 1, start + FRAME_SIZE + len(SYNC))
+                pos = resync if resync >= 0 else start + FRAME_SIZE
+                continue
+
+            self.text.discard_partial()
+            frames.append(self._frame(fields, timestamp))
+            pos = start + FRAME_SIZE
+
+        if pos:
+            del buf[:pos]
+        return frames
+
+    def _frame(self, fields, timestamp):
+        _, _, seq, millis, acc, delta, filtered, threshold, noise, rpm, count, status, _ = fields
+        if self._last_seq is not None:
+            gap = (seq - self._last_seq - 1) & 0xFFFF
+            if gap >= _MAX_GAP:
+                self.resets += 1
+            else:
+                self.lost += gap
+        self._last_seq = seq
+        self.last_device_ms = millis
+        self.binary_frames += 1
+        return TelemetryFrame(
+            acc, delta, filtered, threshold, noise, rpm, count,
+            STATUSES[status] if status < len(STATUSES) else "",
+            timestamp,
+        )
+
+
+class AutoDecoder:
+    """Decodificador que detecta si el puerto habla JSON o binario.
+
+    Mientras no hay decisión guarda los bytes recibidos; en cuanto aparece
+    una trama binaria válida o una trama JSON elige el decodificador y le
+    pasa todo lo guardado. Expone la misma interfaz que ``FrameDecoder``.
+    """
+
+    def __init__(self, on_log=None, log_capacity=200):
+        self.on_log = on_log
+        self.log_capacity = log_capacity
+        self.reset()
+
+    def reset(self):
+        self.protocol = None
+        self.decoder = None
+        self._probe = bytearray()
+
+    def __getattr__(self, name):
+        # Contadores y canal de registro del decodificador elegido
+        decoder = self.__dict__.get("decoder")
+        if decoder is not None and hasattr(decoder, name):
+            return getattr(decoder, name)
+        if name in _COUNTERS:
+            return 0
+        if name == "log_lines":
+            return ()
+        raise AttributeError(name)
+
+    def decode_line(self, line, timestamp=None):
+        if self.decoder is None:
+            self._choose("json")
+        return self.decoder.decode_line(line, timestamp)
+
+    def feed(self, data, timestamp=None):
+        if self.decoder is not None:
+            return self.decoder.feed(data, timestamp)
+
+        self._probe += data
+        protocol = self._detect(self._probe)
+        if protocol is None:
+            if len(self._probe) < PROBE_LIMIT:
+                return []
+            protocol = "json"
+        self._choose(protocol)
+        probe = bytes(self._probe)
+        self._probe.clear()
+        return self.decoder.feed(probe, timestamp)
+
+    def _choose(self, protocol):
+        self.protocol = protocol
+        if protocol == "binary":
+            self.decoder = BinaryDecoder(self.on_log, self.log_capacity)
+        else:
+            self.decoder = FrameDecoder(self.on_log, self.log_capacity)
+
+    @staticmethod
+    def _detect(buf):
+        """'binary', 'json' o None si aún no se puede decidir"""
+        start = buf.find(SYNC)
+        while 0 <= start <= len(buf) - FRAME_SIZE:
+            fields = BINARY_FRAME.unpack_from(buf, start)
+            if fields[1] == VERSION and crc16(buf[start + _CRC_START:start + _CRC_END]) == fields[-1]:
+                return "binary"
+            start = buf.find(SYNC, start + 1)
+        if b'\n{"' in buf or buf.startswith(b'{"'):
+            return "json"
+        return None
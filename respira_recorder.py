@@ -0,0 +1,388 @@
+import csv
+import json
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime
+
+import numpy as np
+
+from respira_decoder import FIELDS, FRAME_CHANNELS, STATUSES
+
+# Formato de archivo de sesión (.resp), todo en little-endian:
+#
+#   cabecera:  b"RESPIRA1" | uint32 largo | JSON (canales, inicio, meta) | relleno a 8
+#   bloque:    b"CHNK" | uint32 filas | una columna tras otra (cada una con
+#              relleno a 8 bytes) | b"END!" | uint32 crc32 de las columnas
+#
+# Un bloque sin pie válido o con el CRC incorrecto (p. ej. por un corte de luz)
+# se ignora al leer, así que un archivo interrumpido conserva todos los bloques
+# anteriores.
+FILE_MAGIC = b"RESPIRA1"
+CHUNK_HEADER = struct.Struct("<4sI")
+CHUNK_FOOTER = struct.Struct("<4sI")
+CHUNK_MAGIC = b"CHNK"
+FOOTER_MAGIC = b"END!"
+FILE_EXTENSION = ".resp"
+
+# Eventos de la sesión (alertas del host), una línea JSON por evento
+EVENTS_EXTENSION = ".eventos.jsonl"
+
+SESSION_DIR = "datos_respiracion"
+
+
+def _padded(nbytes):
+    return (nbytes + 7) & ~7
+
+
+def _encode_header(channels, meta):
+    header = json.dumps({
+        "version": 1,
+        "channels": [[name, np.dtype(dtype).newbyteorder("<").str] for name, dtype in channels],
+        "meta": meta,
+    }).encode("utf-8")
+    raw = FILE_MAGIC + struct.pack("<I", len(header)) + header
+    return raw + b"\0" * (_padded(len(raw)) - len(raw))
+
+
+def session_filename(directory=SESSION_DIR, start=None, prefix="resp_session"):
+    """Nombre de archivo con fecha y hora, p. ej. resp_session_20250101_120000.resp"""
+    start = start or datetime.now()
+    return os.path.join(directory, f"{prefix}_{start.strftime('%Y%m%d_%H%M%S')}{FILE_EXTENSION}")
+
+
+def events_filename(path):
+    """Archivo de eventos que acompaña a una sesión"""
+    return os.path.splitext(path)[0] + EVENTS_EXTENSION
+
+
+class SessionRecorder:
+    """Grabación continua de una sesión en un archivo columnar por bloques.
+
+    ``record()`` solo encola la fila; un hilo escritor la agrupa por columnas
+    y escribe un bloque cuando se juntan ``chunk_rows`` filas o cuando la fila
+    más antigua pendiente supera ``max_latency`` segundos. ``record_event()``
+    agrega un evento (diccionario) al archivo de eventos de la sesión.
+
+    Si la escritura falla (disco lleno, etc.) la grabación queda en
+    ``failed``: se deja de encolar y se avisa una vez con ``on_error(texto)``.
+    Un evento que no se puede serializar se descarta sin detener el escritor.
+    """
+
+    def __init__(self, path=None, channels=FRAME_CHANNELS, chunk_rows=1200,
+                 max_latency=1.0, fsync=True, meta=None, on_error=None):
+        self.path = path or session_filename()
+        self.channels = tuple((name, np.dtype(dtype).newbyteorder("<")) for name, dtype in channels)
+        self.chunk_rows = chunk_rows
+        self.max_latency = max_latency
+        self.fsync = fsync
+        self.meta = dict(meta or {})
+        self.meta.setdefault("start", time.time())
+        self.on_error = on_error
+
+        self.rows_written = 0
+        self.chunks_written = 0
+        self.bytes_written = 0
+        self.last_error = None
+        self.failed = False
+
+        self.events_written = 0
+        self.events_dropped = 0
+
+        self._queue = queue.SimpleQueue()
+        self._events_file = None
+        self._closed = False
+        self._thread = None
+
+    def start(self):
+        """Crear el archivo y lanzar el hilo escritor"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "wb")
+        header = _encode_header(self.channels, self.meta)
+        self._file.write(header)
+        self._file.flush()
+        self.bytes_written = len(header)
+        self._thread = threading.Thread(target=self._run, name="respira-recorder", daemon=True)
+        self._thread.start()
+        return self
+
+    def record(self, row):
+        """Encolar una fila (valores en el orden de ``channels``)"""
+        if not self._closed:
+            self._queue.put(row)
+
+    def record_frame(self, frame):
+        self.record(frame.as_row())
+
+    def record_event(self, event):
+        """Encolar un evento (diccionario serializable a JSON)"""
+        if not self._closed:
+            self._queue.put(event)
+
+    def flush(self):
+        """Pedir al escritor que escriba ya lo pendiente.
+
+        Devuelve un ``threading.Event`` que se activa cuando está en disco.
+        """
+        done = threading.Event()
+        if self._closed:
+            done.set()
+        else:
+            self._queue.put(done)
+        return done
+
+    def close(self, timeout=5.0):
+        """Escribir lo pendiente y cerrar el archivo"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        pending = []
+        deadline = None
+        try:
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    row = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    row = ()
+                if row is None:
+                    break
+                if isinstance(row, threading.Event):
+                    # flush(): escribir ya y avisar
+                    if pending:
+                        self._write_chunk(pending)
+                        pending = []
+                        deadline = None
+                    row.set()
+                    continue
+                if isinstance(row, dict):
+                    try:
+                        self._write_event(row)
+                    except (TypeError, ValueError) as e:
+                        self.events_dropped += 1
+                        self.last_error = f"Evento no grabado: {e}"
+                        print(self.last_error)
+                    continue
+                if row:
+                    if not pending:
+                        deadline = time.monotonic() + self.max_latency
+                    pending.append(row)
+                if len(pending) >= self.chunk_rows or (pending and time.monotonic() >= deadline):
+                    self._write_chunk(pending)
+                    pending = []
+                    deadline = None
+            if pending:
+                self._write_chunk(pending)
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._file.close()
+            if self._events_file is not None:
+                self._events_file.close()
+
+    def _fail(self, error):
+        """Dejar de grabar tras un error de escritura y avisar"""
+        self.failed = True
+        self._closed = True
+        self.last_error = str(error)
+        print(f"Error grabando sesión: {error}")
+
+        # Liberar a quien espera un flush() y soltar las filas encoladas
+        while True:
+            try:
+                row = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(row, threading.Event):
+                row.set()
+
+        if self.on_error is not None:
+            try:
+                self.on_error(self.last_error)
+            except Exception as e:
+                print(f"Error avisando del error de grabación: {e}")
+
+    def _write_event(self, event):
+        """Los eventos son pocos: se escriben enseguida"""
+        if self._events_file is None:
+            self._events_file = open(events_filename(self.path), "a", encoding="utf-8")
+        self._events_file.write(json.dumps(event, ensure_ascii=False) + "\n")
+        self._events_file.flush()
+        self.events_written += 1
+
+    def _write_chunk(self, rows):
+        """Escribir un bloque con una columna por canal"""
+        columns = list(zip(*rows))
+        parts = [CHUNK_HEADER.pack(CHUNK_MAGIC, len(rows))]
+        crc = 0
+        for (name, dtype), values in zip(self.channels, columns):
+            raw = np.asarray(values, dtype=dtype).tobytes()
+            raw += b"\0" * (_padded(len(raw)) - len(raw))
+            crc = zlib.crc32(raw, crc)
+            parts.append(raw)
+        parts.append(CHUNK_FOOTER.pack(FOOTER_MAGIC, crc))
+        data = b"".join(parts)
+
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.rows_written += len(rows)
+        self.chunks_written += 1
+        self.bytes_written += len(data)
+
+
+class SessionReader:
+    """Lectura de un archivo de sesión mediante mapeo en memoria.
+
+    Las columnas de cada bloque son vistas sin copia sobre el archivo.
+    ``chunks`` (pares desplazamiento/filas, p. ej. guardados por el archivo
+    de sesiones) evita recorrer las cabeceras de todos los bloques.
+    """
+
+    def __init__(self, path, chunks=None):
+        self.path = path
+        with open(path, "rb") as f:
+            prefix = f.read(len(FILE_MAGIC) + 4)
+            if len(prefix) < len(FILE_MAGIC) + 4 or not prefix.startswith(FILE_MAGIC):
+                raise ValueError(f"{path} no es un archivo de sesión Respira")
+            (header_len,) = struct.unpack_from("<I", prefix, len(FILE_MAGIC))
+            header = json.loads(f.read(header_len))
+        self.channels = tuple((name, np.dtype(dtype)) for name, dtype in header["channels"])
+        self.meta = header.get("meta", {})
+        self._data_offset = _padded(len(FILE_MAGIC) + 4 + header_len)
+        self._mm = np.memmap(path, dtype=np.uint8, mode="r") if os.path.getsize(path) else np.empty(0, np.uint8)
+        self.corrupt = 0   # Bloques completos descartados por CRC
+        self.chunks = list(chunks) if chunks is not None else self._index_chunks()
+
+    def __len__(self):
+        return sum(rows for _, rows in self.chunks)
+
+    @property
+    def names(self):
+        return tuple(name for name, _ in self.channels)
+
+    def _chunk_size(self, rows):
+        body = sum(_padded(rows * dtype.itemsize) for _, dtype in self.channels)
+        return CHUNK_HEADER.size + body + CHUNK_FOOTER.size
+
+    def _index_chunks(self):
+        """Recorrer los bloques comprobando su CRC; parar en el primer bloque incompleto.
+
+        Un bloque completo pero dañado se salta (y se cuenta en ``corrupt``).
+        """
+        chunks = []
+        offset = self._data_offset
+        size = len(self._mm)
+        while offset + CHUNK_HEADER.size <= size:
+            magic, rows = CHUNK_HEADER.unpack_from(self._mm, offset)
+            if magic != CHUNK_MAGIC:
+                break
+            end = offset + self._chunk_size(rows)
+            if end > size:
+                break
+            footer = end - CHUNK_FOOTER.size
+            footer_magic, crc = CHUNK_FOOTER.unpack_from(self._mm, footer)
+            if footer_magic != FOOTER_MAGIC:
+                break
+            if zlib.crc32(self._mm[offset + CHUNK_HEADER.size:footer]) == crc:
+                chunks.append((offset, rows))
+            else:
+                self.corrupt += 1
+            offset = end
+        return chunks
+
+    def chunk(self, index):
+        """Columnas de un bloque como vistas de NumPy (sin copia)"""
+        offset, rows = self.chunks[index]
+        offset += CHUNK_HEADER.size
+        columns = {}
+        for name, dtype in self.channels:
+            columns[name] = np.frombuffer(self._mm, dtype=dtype, count=rows, offset=offset)
+            offset += _padded(rows * dtype.itemsize)
+        return columns
+
+    def iter_chunks(self):
+        for index in range(len(self.chunks)):
+            yield self.chunk(index)
+
+    def events(self):
+        """Eventos grabados junto a la sesión (lista vacía si no hay)"""
+        try:
+            with open(events_filename(self.path), encoding="utf-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return []
+        events = []
+        for line in lines:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                continue   # Última línea cortada
+        return events
+
+    def verify(self):
+        """Comprobar el CRC de todos los bloques; devuelve los índices dañados"""
+        bad = []
+        for index, (offset, rows) in enumerate(self.chunks):
+            start = offset + CHUNK_HEADER.size
+            end = offset + self._chunk_size(rows) - CHUNK_FOOTER.size
+            _, crc = CHUNK_FOOTER.unpack_from(self._mm, end)
+            if zlib.crc32(self._mm[start:end]) != crc:
+                bad.append(index)
+        return bad
+
+    def column(self, name):
+        """Columna completa de la sesión (concatena los bloques)"""
+        parts = [chunk[name] for chunk in self.iter_chunks()]
+        if not parts:
+            return np.empty(0, dtype=dict(self.channels)[name])
+        return np.concatenate(parts)
+
+    def iter_records(self):
+        """Filas con las claves que envía el firmware (más el timestamp)"""
+        for chunk in self.iter_chunks():
+            columns = {name: _to_python(name, values) for name, values in chunk.items()}
+            keys = list(columns)
+            for values in zip(*(columns[key] for key in keys)):
+                yield dict(zip(keys, values))
+
+    def to_json(self, path):
+        """Exportar al formato JSON de siempre (lista de tramas), sin cargar todo"""
+        with open(path, "w") as f:
+            f.write("[")
+            first = True
+            for record in self.iter_records():
+                record = {key: record[key] for key in FIELDS if key in record}
+                f.write("\n  " if first else ",\n  ")
+                f.write(json.dumps(record))
+                first = False
+            f.write("\n]\n")
+
+    def to_csv(self, path):
+        """Exportar a CSV con una columna por campo"""
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(self.names)
+            for record in self.iter_records():
+                writer.writerow(record[name] for name in self.names)
+
+
+def _to_python(name, values):
+    """Convertir una columna a valores nativos con el formato del firmware"""
+    if name == "status":
+        return [STATUSES[code] if code < len(STATUSES) else "" for code in values.tolist()]
+    if values.dtype.kind == "f" and values.dtype.itemsize < 8:
+        # float32 -> 9.81 y no 9.8100004196
+        return np.round(values.astype(np.float64), 6).tolist()
+    return values.tolist()
@@ -0,0 +1,193 @@
+import time
+from collections import deque
+
+import numpy as np
+
+
+def minmax_buckets(x, y, buckets):
+    """(x, mínimos, máximos) por columna de píxeles; None si no hace falta diezmar"""
+    n = len(y)
+    if buckets < 1 or n <= 2 * buckets:
+        return None
+    edges = np.linspace(0, n, buckets + 1).astype(np.intp)[:-1]
+    return np.asarray(x)[edges], np.minimum.reduceat(y, edges), np.maximum.reduceat(y, edges)
+
+
+def decimate_minmax(x, y, buckets):
+    """Reducir una serie a un par mínimo/máximo por columna de píxeles.
+
+    Conserva la envolvente de la señal (los picos no desaparecen) y devuelve
+    como máximo ``2 * buckets`` puntos.
+    """
+    buckets = minmax_buckets(x, y, buckets)
+    if buckets is None:
+        return x, y
+    x_edges, y_min, y_max = buckets
+    xs = np.repeat(x_edges, 2)
+    ys = np.empty(2 * len(x_edges), dtype=y_min.dtype)
+    ys[0::2] = y_min
+    ys[1::2] = y_max
+    return xs, ys
+
+
+class _AxisScale:
+    """Autoescala con histéresis: solo cambia cuando los datos salen del rango"""
+
+    def __init__(self, margin, shrink):
+        self.margin = margin   # Holgura agregada al reescalar (fracción del rango)
+        self.shrink = shrink   # Reducir si los datos ocupan menos de esta fracción
+        self.limits = None
+
+    def update(self, lo, hi, floor=None):
+        """Devolver nuevos límites o None si los actuales siguen sirviendo.
+
+        Si los datos no bajan de ``floor``, el límite inferior queda fijo en
+        ``floor`` sin holgura.
+        """
+        pad_low = floor is None or lo < floor
+        if not pad_low:
+            lo = floor
+        span = hi - lo
+        if self.limits is not None:
+            cur_lo, cur_hi = self.limits
+            inside = cur_lo <= lo and hi <= cur_hi
+            if inside and span >= (cur_hi - cur_lo) * self.shrink:
+                return None
+        pad = (span if span > 0 else abs(hi) or 1.0) * self.margin
+        self.limits = (lo - pad if pad_low else lo, hi + pad)
+        return self.limits
+
+
+class BlitRenderer:
+    """Redibuja solo las líneas de un eje sobre un fondo en caché.
+
+    El fondo (ejes, rejilla, leyenda) se guarda tras cada dibujo completo; en
+    los cuadros siguientes solo se restauran sus píxeles y se pintan las
+    líneas. Un dibujo completo solo ocurre al cambiar los límites o el tamaño.
+
+    Una serie con más muestras que píxeles se dibuja como banda rellena entre
+    el mínimo y el máximo de cada columna: Agg rellena un polígono mucho más
+    rápido que el trazo en zigzag equivalente, cuyos segmentos verticales
+    ocupan toda la altura.
+    """
+
+    def __init__(self, canvas, ax, lines, autoscale_x=False, autoscale_y=True,
+                 margin=0.2, shrink=0.3, y_floor=None, stats_window=50):
+        self.canvas = canvas
+        self.ax = ax
+        self.lines = list(lines)
+        self.y_floor = y_floor
+        self._x_scale = _AxisScale(margin, 0.0) if autoscale_x else None
+        self._y_scale = _AxisScale(margin, shrink) if autoscale_y else None
+        self._background = None
+
+        # Estadísticas de dibujo
+        self._frame_times = deque(maxlen=stats_window)
+        self._render_times = deque(maxlen=stats_window)
+        self.frames = 0
+        self.full_draws = 0
+        self.last_render = 0.0   # Duración del último cuadro (s)
+
+        # matplotlib ya está cargado si hay un canvas (la GUI lo importa al conectar)
+        from matplotlib.patches import Polygon
+        self.bands = []
+        for line in self.lines:
+            line.set_animated(True)
+            band = Polygon(np.zeros((1, 2)), closed=True, facecolor=line.get_color(),
+                           edgecolor=line.get_color(), linewidth=1, alpha=0.6,
+                           visible=False, animated=True)
+            ax.add_patch(band)
+            self.bands.append(band)
+        self._cid = canvas.mpl_connect("draw_event", self._on_draw)
+
+    def disconnect(self):
+        self.canvas.mpl_disconnect(self._cid)
+
+    @property
+    def fps(self):
+        """Cuadros por segundo medidos"""
+        if len(self._frame_times) < 2:
+            return 0.0
+        elapsed = self._frame_times[-1] - self._frame_times[0]
+        return (len(self._frame_times) - 1) / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def render_ms(self):
+        """Tiempo medio de dibujo por cuadro (ms)"""
+        if not self._render_times:
+            return 0.0
+        return 1000.0 * sum(self._render_times) / len(self._render_times)
+
+    def set_xlim(self, lo, hi, label=None):
+        """Fijar el eje X (zoom o desplazamiento); el próximo cuadro es completo"""
+        if (lo, hi) != tuple(self.ax.get_xlim()):
+            self.ax.set_xlim(lo, hi)
+            self._background = None
+        if label is not None and label != self.ax.get_xlabel():
+            self.ax.set_xlabel(label)
+            self._background = None
+
+    def _on_draw(self, event):
+        """Guardar el fondo tras un dibujo completo y pintar las líneas"""
+        self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self._draw_lines()
+
+    def _draw_lines(self):
+        for band in self.bands:
+            if band.get_visible():
+                self.ax.draw_artist(band)
+        for line in self.lines:
+            self.ax.draw_artist(line)
+
+    def update(self, series):
+        """Actualizar las líneas con ``series``: una tupla (x, y) por línea"""
+        start = time.perf_counter()
+
+        # Diezmado mín/máx cuando hay más muestras que píxeles
+        buckets = int(self.ax.bbox.width)
+        x_lo = y_lo = np.inf
+        x_hi = y_hi = -np.inf
+        for line, band, (x, y) in zip(self.lines, self.bands, series):
+            envelope = minmax_buckets(x, y, buckets)
+            if envelope is None:
+                line.set_data(x, y)
+                band.set_visible(False)
+                if len(y):
+                    x_lo, x_hi = min(x_lo, x[0]), max(x_hi, x[-1])
+                    y_lo, y_hi = min(y_lo, y.min()), max(y_hi, y.max())
+                continue
+            # Banda mín/máx: borde superior y luego el inferior de vuelta
+            x, y_min, y_max = envelope
+            line.set_data((), ())
+            band.set_xy(np.column_stack((np.concatenate((x, x[::-1])),
+                                         np.concatenate((y_max, y_min[::-1])))))
+            band.set_visible(True)
+            x_lo, x_hi = min(x_lo, x[0]), max(x_hi, x[-1])
+            y_lo, y_hi = min(y_lo, y_min.min()), max(y_hi, y_max.max())
+
+        full_redraw = self._background is None
+        if np.isfinite(x_lo) and self._x_scale is not None:
+            limits = self._x_scale.update(x_lo, x_hi, floor=x_lo)
+            if limits is not None:
+                self.ax.set_xlim(*limits)
+                full_redraw = True
+        if np.isfinite(y_lo) and self._y_scale is not None:
+            limits = self._y_scale.update(y_lo, y_hi, floor=self.y_floor)
+            if limits is not None:
+                self.ax.set_ylim(*limits)
+                full_redraw = True
+
+        if full_redraw:
+            # Dibujo completo: _on_draw captura el fondo y pinta las líneas
+            self.full_draws += 1
+            self.canvas.draw()
+        else:
+            self.canvas.restore_region(self._background)
+            self._draw_lines()
+        self.canvas.blit(self.ax.bbox)
+
+        now = time.perf_counter()
+        self.last_render = now - start
+        self._render_times.append(self.last_render)
+        self._frame_times.append(now)
+        self.frames += 1
@@ -0,0 +1,310 @@
+import json
+import math
+import os
+import random
+import time
+
+import serial
+
+from respira_analysis import BreathDetector
+from respira_decoder import TelemetryFrame, encode_frame, firmware_status
+from respira_protocol import encode_binary_frame
+from respira_recorder import FILE_EXTENSION, SessionReader
+
+# Velocidad "lo más rápido posible" para reproducción y simulación
+MAX_SPEED = None
+
+# Periodo entre tramas cuando el archivo no guarda la hora de llegada (las
+# exportaciones JSON antiguas guardaban la trama de cada segundo)
+DEFAULT_FRAME_INTERVAL = 1.0
+
+# Pausa mínima tras cada respiración simulada (s): el detector del firmware
+# necesita señal estable para cerrar el ciclo y 1 s de periodo refractario
+BREATH_REST_S = 1.3
+
+
+class ReadStats:
+    """Contadores del enlace: bytes, tramas, lecturas y backlog máximo"""
+
+    def __init__(self):
+        self.bytes = 0
+        self.frames = 0
+        self.reads = 0          # Llamadas de lectura al sistema
+        self.max_backlog = 0    # Mayor cantidad de bytes esperando en el puerto
+        self._mark = (time.monotonic(), 0, 0)
+
+    def record_read(self, nbytes, backlog=0, calls=1):
+        self.reads += calls
+        self.bytes += nbytes
+        if backlog > self.max_backlog:
+            self.max_backlog = backlog
+
+    def rates(self):
+        """(bytes/s, tramas/s) desde la llamada anterior"""
+        now = time.monotonic()
+        then, nbytes, frames = self._mark
+        self._mark = (now, self.bytes, self.frames)
+        elapsed = now - then
+        if elapsed <= 0:
+            return 0.0, 0.0
+        return (self.bytes - nbytes) / elapsed, (self.frames - frames) / elapsed
+
+    def snapshot(self):
+        return {
+            "bytes": self.bytes,
+            "frames": self.frames,
+            "reads": self.reads,
+            "max_backlog": self.max_backlog,
+        }
+
+
+class DataSource:
+    """Fuente de bytes con el mismo formato que envía el firmware.
+
+    ``read()`` devuelve los bytes disponibles (``b""`` si no hay nada antes
+    del ``timeout``); ``finished`` indica que la fuente no producirá más.
+    ``last_arrival`` es la hora (``time.time()``) en que llegaron los
+    últimos bytes leídos. Una fuente con ``decoded`` entrega listas de
+    ``TelemetryFrame`` en lugar de bytes; con ``recorded`` los datos ya
+    están grabados en otra parte y no se vuelven a grabar. Una fuente con
+    ``timed`` tiene su propio reloj: ``read_timed()`` devuelve pares
+    ``(hora, bytes)`` y esa hora es la de las tramas, no la de llegada.
+    """
+
+    name = "fuente"
+    finished = False
+    last_arrival = None
+    decoded = False
+    recorded = False
+    timed = False
+
+    def open(self):
+        return self
+
+    def read(self, timeout=0.1):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SerialSource(DataSource):
+    """Puerto serial real (ESP32).
+
+    ``read()`` no sondea: si no hay bytes pendientes se bloquea en el puerto
+    (select() en POSIX, espera del driver en Windows) hasta que llega el
+    primero o vence el timeout, y luego vacía todo lo disponible de una vez.
+    """
+
+    def __init__(self, port, baudrate=115200, timeout=0.5):
+        self.name = port
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.serial_conn = None
+        self.stats = ReadStats()
+
+    def open(self):
+        self.serial_conn = serial.Serial(self.port, self.baudrate, timeout=self.timeout)
+        return self
+
+    def read(self, timeout=None):
+        conn = self.serial_conn
+        if conn is None or not conn.is_open:
+            return b""
+        stats = self.stats
+
+        backlog = conn.in_waiting
+        if backlog:
+            data = conn.read(backlog)
+            self.last_arrival = time.time()
+            stats.record_read(len(data), backlog, calls=2)
+            return data
+
+        # Esperar el primer byte sin consumir CPU
+        if timeout is not None and timeout != conn.timeout:
+            conn.timeout = timeout
+        first = conn.read(1)
+        if not first:
+            stats.record_read(0, calls=2)
+            return b""
+        self.last_arrival = time.time()
+        backlog = conn.in_waiting
+        data = first + conn.read(backlog) if backlog else first
+        stats.record_read(len(data), backlog, calls=4 if backlog else 3)
+        return data
+
+    def close(self):
+        if self.serial_conn is not None and self.serial_conn.is_open:
+            self.serial_conn.close()
+
+
+class PacedSource(DataSource):
+    """Entrega líneas según su tiempo relativo, escalado por ``speed``.
+
+    Las subclases implementan ``lines()``: un iterador de pares
+    ``(segundos_desde_el_inicio, bytes)``. Con ``speed=MAX_SPEED`` se
+    entregan lotes de ``batch_lines`` líneas sin esperar.
+
+    La hora de cada línea es ``origin + segundos`` (``origin`` es la hora de
+    apertura, o la que fije ``lines()``), así que los detectores, alertas y
+    tendencias ven la línea de tiempo de la fuente a cualquier velocidad.
+    """
+
+    timed = True
+
+    def __init__(self, speed=1.0, batch_lines=512):
+        self.speed = speed
+        self.batch_lines = batch_lines
+        self.finished = False
+        self._lines = None
+        self._next = None
+        self._start = None
+        self.origin = None
+        self.stats = ReadStats()
+
+    def lines(self):
+        raise NotImplementedError
+
+    def open(self):
+        self.origin = time.time()
+        self._lines = iter(self.lines())
+        self._next = next(self._lines, None)
+        self.finished = self._next is None
+        self._start = time.monotonic()
+        return self
+
+    def _advance(self):
+        self._next = next(self._lines, None)
+        if self._next is None:
+            self.finished = True
+
+    def read(self, timeout=0.1):
+        return b"".join(data for _, data in self.read_timed(timeout))
+
+    def read_timed(self, timeout=0.1):
+        """Líneas disponibles como pares ``(hora, bytes)``"""
+        lines = self._read(timeout)
+        if lines:
+            self.last_arrival = time.time()
+        self.stats.record_read(sum(len(data) for _, data in lines))
+        return lines
+
+    def _read(self, timeout):
+        if self.finished:
+            return []
+        origin = self.origin
+        lines = []
+
+        if not self.speed:
+            while self._next is not None and len(lines) < self.batch_lines:
+                lines.append((origin + self._next[0], self._next[1]))
+                self._advance()
+            return lines
+
+        deadline = time.monotonic() + timeout
+        while True:
+            elapsed = (time.monotonic() - self._start) * self.speed
+            while self._next is not None and self._next[0] <= elapsed:
+                lines.append((origin + self._next[0], self._next[1]))
+                self._advance()
+            if lines or self._next is None:
+                return lines
+            # Esperar hasta la próxima línea o hasta el timeout
+            wait = (self._next[0] - elapsed) / self.speed
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+            time.sleep(min(wait, remaining))
+
+
+class ReplaySource(PacedSource):
+    """Reproducción de una sesión grabada (.resp) o exportada (.json)"""
+
+    recorded = True
+
+    def __init__(self, path, speed=1.0, batch_lines=512):
+        super().__init__(speed, batch_lines)
+        self.path = path
+        self.name = os.path.basename(path)
+
+    def lines(self):
+        if self.path.endswith(FILE_EXTENSION):
+            records = SessionReader(self.path).iter_records()
+        else:
+            with open(self.path) as f:
+                records = json.load(f)
+
+        first = None
+        for index, record in enumerate(records):
+            frame = TelemetryFrame(**{key: record[key] for key in TelemetryFrame._fields if key in record})
+            if frame.timestamp:
+                if first is None:
+                    # Reproducir con las horas grabadas
+                    first = self.origin = frame.timestamp
+                offset = frame.timestamp - first
+            else:
+                offset = index * DEFAULT_FRAME_INTERVAL
+            yield offset, encode_frame(frame)
+
+
+class SyntheticSource(PacedSource):
+    """Generador de una señal respiratoria sintética con el formato del firmware.
+
+    Produce tramas a ``rate_hz`` con ``rpm`` respiraciones por minuto y
+    ruido gaussiano. Cada respiración es un pulso (inspiración y espiración)
+    seguido de una pausa, y el conteo y los mensajes "Respiración #..." salen
+    del mismo detector que usa el firmware (``BreathDetector``), así que el
+    contraste del host con el firmware da lo mismo que con un dispositivo
+    real. Hasta unas 20 RPM a 20 Hz el detector cuenta un ciclo por
+    respiración; más rápido, como el firmware, cuenta menos. La RPM
+    reportada es la configurada. Con ``binary=True`` emite tramas del
+    protocolo binario en lugar de JSON.
+    """
+
+    def __init__(self, rpm=15, rate_hz=20, duration=None, amplitude=0.4,
+                 noise=0.03, speed=1.0, batch_lines=512, seed=None, binary=False):
+        super().__init__(speed, batch_lines)
+        self.name = f"Simulador ({rpm} RPM)"
+        self.rpm = rpm
+        self.rate_hz = rate_hz
+        self.duration = duration
+        self.amplitude = amplitude
+        self.noise = noise
+        self.seed = seed
+        self.binary = binary
+
+    def lines(self):
+        rng = random.Random(self.seed)
+        baseline = 9.81
+        threshold = max(0.2, self.amplitude * 0.7)
+        period = 60.0 / self.rpm
+        width = min(0.6 * period, max(period - BREATH_REST_S, 0.5 * period))
+        interval = 1.0 / self.rate_hz
+        detector = BreathDetector()
+        filtered = 0.0
+        rpm = 0
+
+        index = 0
+        while self.duration is None or index * interval < self.duration:
+            t = index * interval
+            phase = t % period
+            delta = self.amplitude * math.sin(math.pi * phase / width) ** 2 if phase < width else 0.0
+            delta += rng.gauss(0, self.noise)
+            filtered += 0.3 * (delta - filtered)
+
+            duration = detector.update(delta, int(t * 1000), threshold, self.noise)
+            if duration is not None:
+                yield t, (f"Respiración #{detector.breath_count} - Duración: {duration}ms"
+                          f" - Max: {detector.max_delta:.2f}\r\n").encode("utf-8")
+                if detector.breath_count >= 2:
+                    rpm = int(round(self.rpm))
+
+            breath_count = detector.breath_count
+            frame = TelemetryFrame(baseline + delta, delta, filtered, threshold, self.noise,
+                                   rpm, breath_count, firmware_status(rpm))
+            if self.binary:
+                yield t, encode_binary_frame(frame, index, int(t * 1000))
+            else:
+                yield t, encode_frame(frame)
+            index += 1
@@ -0,0 +1,166 @@
+"""Estimación espectral de la RPM sobre la señal filtrada.
+
+Complementa la RPM del firmware (que necesita varios ciclos completos antes
+de dar un valor) con la frecuencia dominante de ``filtered`` en los últimos
+``window_s`` segundos, limitada a la banda respiratoria (4-40 RPM).
+
+Se usa una DFT deslizante solo en los bins de esa banda: cada muestra nueva
+actualiza cada bin con una suma y una rotación (``X_k = (X_k + x_n - x_{n-N})
+· e^{j2πk/N}``), sin recalcular una FFT; el costo por muestra depende del
+número de bins y no del largo de la ventana. Cada ``N`` muestras los bins se
+recalculan exactamente para que no se acumule error de redondeo.
+
+La frecuencia de muestreo se mide con los timestamps: en modo JSON el
+firmware envía ~1 trama por segundo y la banda útil se recorta por debajo de
+Nyquist (~28 RPM); con el protocolo binario (~20 Hz) cubre toda la banda.
+"""
+import math
+from typing import NamedTuple
+
+import numpy as np
+
+SPECTRAL_WINDOW_S = 60.0
+SPECTRAL_MIN_S = 10.0       # Datos mínimos antes de dar un valor
+RPM_BAND = (4.0, 40.0)
+# Confianza por debajo de la cual la estimación no se muestra
+MIN_CONFIDENCE = 0.5
+
+# Segundos de datos para medir la frecuencia de muestreo al empezar
+RATE_WARMUP_S = 2.0
+# Fracción de Nyquist utilizable (los bins cercanos a fs/2 no son fiables)
+NYQUIST_MARGIN = 0.9
+# Variación de la frecuencia de muestreo que obliga a reiniciar
+RATE_TOLERANCE = 0.2
+
+
+class SpectralEstimate(NamedTuple):
+    rpm: float = 0.0          # 0 = sin estimación
+    confidence: float = 0.0   # Fracción de la potencia de la banda en el pico (0-1)
+
+    def format(self):
+        if not self.rpm or self.confidence < MIN_CONFIDENCE:
+            return "--"
+        return f"{self.rpm:.1f} ({self.confidence:.0%})"
+
+
+class SpectralRPM:
+    """DFT deslizante de la señal filtrada restringida a la banda respiratoria.
+
+    ``update(valor, t)`` cuesta O(bins); ``estimate()`` devuelve un
+    ``SpectralEstimate`` con la RPM del pico (interpolado entre bins, con
+    ventana de Hann aplicada en frecuencia) y la confianza.
+    """
+
+    def __init__(self, window_s=SPECTRAL_WINDOW_S, band=RPM_BAND, min_s=SPECTRAL_MIN_S,
+                 rate_hz=None):
+        self.window_s = window_s
+        self.band = band
+        self.min_s = min_s
+        self.fixed_rate = rate_hz
+        self.restarts = 0   # Reinicios por cambio de la frecuencia de muestreo
+        self.reset()
+
+    def reset(self):
+        self.rate = self.fixed_rate
+        self.samples = 0
+        self._warmup = []
+        self._bins = None
+        if self.rate:
+            self._setup(self.rate)
+
+    def _setup(self, rate):
+        """Dimensionar la ventana y elegir los bins de la banda"""
+        self.rate = rate
+        n = max(8, int(round(self.window_s * rate)))
+        low_hz = self.band[0] / 60.0
+        high_hz = min(self.band[1] / 60.0, NYQUIST_MARGIN * rate / 2)
+        # Bins extra a cada lado para la ventana de Hann y la interpolación
+        k_low = max(1, int(math.floor(low_hz * n / rate)) - 2)
+        k_high = min(n // 2 - 1, int(math.ceil(high_hz * n / rate)) + 2)
+        self.size = n
+        self._bins = np.arange(k_low, k_high + 1)
+        self._twiddle = np.exp(2j * np.pi * self._bins / n)
+        self._spectrum = np.zeros(len(self._bins), dtype=np.complex128)
+        self._values = np.zeros(n)
+        self._times = np.zeros(n)
+        self._index = 0
+        self._count = 0
+        self._band_low = low_hz
+        self._band_high = high_hz
+
+    def update(self, value, t):
+        """Agregar una muestra de la señal filtrada con su hora de llegada"""
+        self.samples += 1
+        if self._bins is None:
+            self._warmup.append((t, value))
+            span = t - self._warmup[0][0]
+            if len(self._warmup) >= 3 and span >= RATE_WARMUP_S:
+                samples = self._warmup
+                self._warmup = []
+                self._setup((len(samples) - 1) / span)
+                for t0, v0 in samples:
+                    self._push(v0, t0)
+            return
+        self._push(value, t)
+
+    def _push(self, value, t):
+        index = self._index
+        oldest = self._values[index]
+        self._values[index] = value
+        self._times[index] = t
+        self._index = index + 1 if index + 1 < self.size else 0
+        self._count += 1
+
+        if self._index == 0:
+            # Ventana completa: recalcular exacto y revisar la frecuencia medida
+            if not self.fixed_rate and abs(self.measured_rate() / self.rate - 1) > RATE_TOLERANCE:
+                self.restarts += 1
+                self.reset()
+                return
+            self._recompute()
+        else:
+            spectrum = self._spectrum
+            spectrum += value - oldest
+            spectrum *= self._twiddle
+
+    def _recompute(self):
+        """DFT directa de la ventana (de la muestra más antigua a la más nueva)"""
+        n = self.size
+        ordered = np.roll(self._values, -self._index)
+        basis = np.exp(-2j * np.pi * np.outer(np.arange(n), self._bins) / n)
+        self._spectrum = ordered @ basis
+
+    def measured_rate(self):
+        """Frecuencia de muestreo según los timestamps de la ventana"""
+        count = min(self._count, self.size)
+        if count < 2:
+            return self.rate
+        newest = float(self._times[self._index - 1])
+        oldest = float(self._times[self._index if self._count >= self.size else 0])
+        return (count - 1) / (newest - oldest) if newest > oldest else self.rate
+
+    def estimate(self):
+        if self._bins is None or self._count < self.min_s * self.rate:
+            return SpectralEstimate()
+        # Ventana de Hann en frecuencia (0.5·X_k - 0.25·(X_{k-1} + X_{k+1})) y magnitud
+        spectrum = self._spectrum
+        magnitude = np.abs(0.5 * spectrum[1:-1] - 0.25 * (spectrum[:-2] + spectrum[2:]))
+        total = float(np.dot(magnitude, magnitude))
+        if total <= 0:
+            return SpectralEstimate()
+
+        peak = int(magnitude.argmax())
+        power = magnitude[max(0, peak - 1):peak + 2].tolist()
+        power = [m * m for m in power]
+        offset = 0.0
+        if 0 < peak < len(magnitude) - 1:
+            # Interpolación parabólica sobre la potencia logarítmica
+            floor = total * 1e-12
+            a, b, c = (math.log(p + floor) for p in power)
+            denominator = a - 2 * b + c
+            if denominator < 0:
+                offset = 0.5 * (a - c) / denominator
+        hz = (int(self._bins[peak + 1]) + offset) * self.measured_rate() / self.size
+        if not self._band_low <= hz <= self._band_high:
+            return SpectralEstimate()
+        return SpectralEstimate(hz * 60.0, sum(power) / total)
@@ -0,0 +1,77 @@
+import threading
+
+# Refresco de los indicadores de la interfaz (ms)
+UI_REFRESH_MS = 100
+
+
+class ViewModel:
+    """Estado de la interfaz publicado desde otros hilos y aplicado en Tk.
+
+    Los hilos de datos llaman a ``publish(campo=valor, ...)``, que solo
+    guarda el último valor de cada campo en un diccionario pendiente (un
+    ``update`` bajo un lock breve). Un único ``root.after`` en el hilo de Tk
+    toma ese diccionario y solo llama a los enlaces de los campos cuyo valor
+    cambió. Lo pendiente tiene como máximo un valor por campo, así que una
+    ráfaga no puede desplazar ni perder el último valor de ningún campo
+    (``alert``, ``finished``...), y el costo de la interfaz depende de la
+    frecuencia de refresco y no de la de datos.
+    """
+
+    def __init__(self, root, interval_ms=UI_REFRESH_MS):
+        self.root = root
+        self.interval_ms = interval_ms
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._bindings = {}
+        self._current = {}
+        self._after_id = None
+
+        # Contadores
+        self.published = 0
+        self.applied = 0
+        self.ticks = 0
+
+    def bind(self, field, callback):
+        """Llamar a ``callback(valor)`` en el hilo de Tk cuando ``field`` cambie"""
+        self._bindings.setdefault(field, []).append(callback)
+
+    def publish(self, **values):
+        """Publicar valores (seguro desde cualquier hilo)"""
+        with self._lock:
+            self._pending.update(values)
+            self.published += 1
+
+    def get(self, field, default=None):
+        """Último valor aplicado de un campo"""
+        return self._current.get(field, default)
+
+    def start(self):
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval_ms, self._tick)
+
+    def stop(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def flush(self):
+        """Aplicar ya lo pendiente (solo desde el hilo de Tk)"""
+        with self._lock:
+            merged, self._pending = self._pending, {}
+
+        current = self._current
+        for field, value in merged.items():
+            if field in current and current[field] == value:
+                continue
+            current[field] = value
+            for callback in self._bindings.get(field, ()):
+                callback(value)
+            self.applied += 1
+
+    def _tick(self):
+        self.ticks += 1
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Error actualizando la interfaz: {e}")
+        self._after_id = self.root.after(self.interval_ms, self._tick)
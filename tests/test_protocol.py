@@ -0,0 +1,67 @@
+"""Decodificador binario contra ``encode_binary_frame`` (el firmware en Python)"""
+import pytest
+
+from respira_decoder import TelemetryFrame, encode_frame
+from respira_protocol import FRAME_SIZE, AutoDecoder, BinaryDecoder, encode_binary_frame
+
+LOG = b"Respiracion detectada\r\n"
+
+
+def make_frames(count=10):
+    frames = [TelemetryFrame(9.81 + i / 100, i / 10, i / 20, 0.3, 0.03, 15, i, "NORMAL")
+              for i in range(count)]
+    data = b"".join(encode_binary_frame(frame, seq, seq * 50) for seq, frame in enumerate(frames))
+    return frames, bytearray(data)
+
+
+def decode(data, chunk=None):
+    decoder = BinaryDecoder()
+    chunk = chunk or len(data)
+    frames = []
+    for i in range(0, len(data), chunk):
+        frames.extend(decoder.feed(bytes(data[i:i + chunk]), timestamp=1.0))
+    return decoder, frames
+
+
+@pytest.mark.parametrize("chunk", [None, 1, 7])
+def test_round_trip(chunk):
+    sent, data = make_frames()
+    decoder, frames = decode(data + LOG, chunk)
+    assert [f.breathCount for f in frames] == [f.breathCount for f in sent]
+    assert frames[3].acceleration == pytest.approx(sent[3].acceleration)
+    assert frames[3].status == "NORMAL"
+    assert decoder.lost == decoder.crc_errors == 0
+    assert list(decoder.log_lines) == ["Respiracion detectada"]
+
+
+@pytest.mark.parametrize("offset", [0, 1, 2, 10, FRAME_SIZE - 1])
+@pytest.mark.parametrize("chunk", [None, 1, 7])
+def test_corrupted_frame_is_discarded(offset, chunk):
+    _, data = make_frames()
+    data[4 * FRAME_SIZE + offset] ^= 0xFF
+    decoder, frames = decode(data + LOG, chunk)
+    assert [f.breathCount for f in frames] == [0, 1, 2, 3, 5, 6, 7, 8, 9]
+    assert decoder.lost == 1
+    assert list(decoder.log_lines) == ["Respiracion detectada"]
+
+
+def test_sequence_gap_counts_lost_frames():
+    _, data = make_frames()
+    del data[2 * FRAME_SIZE:5 * FRAME_SIZE]
+    decoder, frames = decode(data)
+    assert len(frames) == 7
+    assert decoder.lost == 3
+    assert decoder.crc_errors == 0
+
+
+def test_auto_detects_protocol():
+    sent, data = make_frames(3)
+    binary = AutoDecoder()
+    assert len(binary.feed(b"Calibrando\r\n" + bytes(data))) == 3
+    assert binary.protocol == "binary"
+    assert list(binary.log_lines) == ["Calibrando"]
+
+    text = AutoDecoder()
+    frames = text.feed(b"Calibrando\r\n" + b"".join(encode_frame(f) for f in sent))
+    assert text.protocol == "json"
+    assert [f.breathCount for f in frames] == [0, 1, 2]